@@ -0,0 +1,312 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime, timezone
+
+# Бенчмарки математики и подготовки кадра для lab_2 и lab_2_rework.
+# Результаты пишутся в JSON; --baseline сравнивает с прошлым прогоном.
+#
+#   python benchmarks/run_benchmarks.py -o results.json
+#   python benchmarks/run_benchmarks.py --sizes 2 50 --baseline results.json
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Имена модулей в двух деревьях не пересекаются (кроме main.py,
+# который здесь не нужен), поэтому оба можно подключить сразу
+sys.path[:0] = [os.path.join(ROOT, "lab_2"), os.path.join(ROOT, "lab_2_rework")]
+
+import numpy as np
+from PySide6.QtWidgets import QApplication
+
+import lab2_depth_sort
+import lab2_geometry
+import lab2_letters
+import lab2_math
+import lab2_scene
+import depth_sort as rework_depth_sort
+import face as rework_face
+import instancing as rework_instancing
+import letter3d as rework_letters
+import math_utils as rework_math
+import scene_widget as rework_scene
+
+TREES = ("lab_2", "lab_2_rework")
+FRAME_SIZES = (2, 50, 500, 5000)
+INSTANCE_COUNTS = (1000, 10000)
+SORT_SIZES = (1000, 100000, 1000000)
+FRAME_WIDTH = 800
+FRAME_HEIGHT = 600
+
+
+def measure(fn, min_time=0.2, repeat=5, max_time=30.0):
+    # Как timeit: число вызовов подбирается так, чтобы замер шел не меньше
+    # min_time; для медленных функций число повторов урезается по max_time
+    start = time.perf_counter()
+    fn()
+    once = time.perf_counter() - start
+
+    number = max(1, int(min_time / once)) if once > 0 else 1000
+    repeat = max(1, min(repeat, int(max_time / max(once * number, 1e-9))))
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        times.append((time.perf_counter() - start) / number)
+    return {
+        "best_s": min(times),
+        "mean_s": sum(times) / len(times),
+        "number": number,
+        "repeat": repeat,
+    }
+
+
+def math_cases(tree):
+    if tree == "lab_2":
+        Vector3D, Matrix4x4, Face = (
+            lab2_math.Vector3D,
+            lab2_math.Matrix4x4,
+            lab2_geometry.Face,
+        )
+    else:
+        Vector3D, Matrix4x4, Face = (
+            rework_math.Vector3D,
+            rework_math.Matrix4x4,
+            rework_face.Face,
+        )
+    a = Vector3D(1.5, -2.0, 3.25)
+    b = Vector3D(-0.5, 4.0, 1.0)
+    m1 = Matrix4x4.rotation_x(30) * Matrix4x4.translation(10, 20, 30)
+    m2 = Matrix4x4.rotation_y(45)
+    face = Face(
+        [
+            Vector3D(0, 0, 0),
+            Vector3D(10, 0, 0),
+            Vector3D(10, 10, 5),
+            Vector3D(0, 10, 5),
+        ],
+        None,
+    )
+    return {
+        "vector.add": lambda: a + b,
+        "vector.sub": lambda: a - b,
+        "vector.scale": lambda: a * 1.5,
+        "vector.dot": lambda: a.dot(b),
+        "vector.normalized": a.normalized,
+        "matrix.mul_matrix": lambda: m1 * m2,
+        "matrix.mul_vector": lambda: m1 * a,
+        "face.calculate_normal": face.calculate_normal,
+    }
+
+
+def make_letters(tree, count):
+    # Буквы в ряд, как Д и Б в сцене, с чередованием типов
+    spacing = 120
+    letters = []
+    for i in range(count):
+        offset_x = (i - (count - 1) / 2) * spacing
+        if tree == "lab_2":
+            letter_type = "Д" if i % 2 == 0 else "Б"
+            letters.append(lab2_letters.Letter3D(100, 60, 30, offset_x, letter_type))
+        else:
+            letter_type = "D" if i % 2 == 0 else "B"
+            letters.append(rework_letters.Letter3D(100, 60, 30, offset_x, letter_type))
+    return letters
+
+
+def frame_case(tree, count):
+    if tree == "lab_2":
+        scene = lab2_scene.SceneWidget()
+
+        # Кэши этапов сбрасываются, чтобы замерять полный кадр
+        def prepare():
+            scene.invalidate_cache()
+            scene.prepare_faces_cache()
+
+    else:
+        scene = rework_scene.SceneWidget()
+
+        def prepare():
+            scene.invalidate_frame()
+            scene._prepare_frame()
+
+    scene.resize(FRAME_WIDTH, FRAME_HEIGHT)
+    scene.letters = make_letters(tree, count)
+    return scene, prepare
+
+
+def instance_case(count):
+    # Стена из count экземпляров четырех общих сеток (только lab_2_rework)
+    scene = rework_scene.SceneWidget()
+    scene.resize(FRAME_WIDTH, FRAME_HEIGHT)
+    scene.letters = []
+    side = int(np.ceil(np.sqrt(count)))
+    wall = rework_instancing.signage_wall(
+        rework_instancing.MeshLibrary(), "ДБDB", side, side
+    )
+    scene.set_instances(wall[:count])
+
+    def prepare():
+        scene.invalidate_frame()
+        scene._cached_frame()
+
+    return scene, prepare
+
+
+def sort_cases(tree, count):
+    # Порядок по глубине: заново с пустой памятью и от кадра к кадру, когда
+    # глубины чуть сдвигаются (около 5% соседей меняются местами)
+    if tree == "lab_2":
+        DepthSorter = lab2_depth_sort.DepthSorter
+    else:
+        DepthSorter = rework_depth_sort.DepthSorter
+    rng = np.random.default_rng(0)
+    depths = rng.uniform(0, 1000, count)
+    frames = [depths, depths + rng.normal(0, 100 / count, count)]
+    sorter = DepthSorter()
+    sorter.sort(frames[0])
+    state = [0]
+
+    def coherent():
+        state[0] ^= 1
+        sorter.sort(frames[state[0]])
+
+    return {
+        "depth_sort.full": lambda: DepthSorter().sort(depths),
+        "depth_sort.coherent": coherent,
+    }
+
+
+def run(sizes, trees, min_time, max_time, instance_counts=(), sort_sizes=()):
+    results = []
+
+    def record(name, tree, params, fn):
+        result = {"name": name, "tree": tree, "params": params}
+        result.update(measure(fn, min_time=min_time, max_time=max_time))
+        results.append(result)
+        print(
+            f"{tree:13} {name:24} {json.dumps(params):18} "
+            f"{result['best_s'] * 1e6:14.2f} мкс"
+        )
+
+    for tree in trees:
+        for name, fn in math_cases(tree).items():
+            record(name, tree, {}, fn)
+    for count in sort_sizes:
+        for tree in trees:
+            for name, fn in sort_cases(tree, count).items():
+                record(name, tree, {"keys": count}, fn)
+    for count in sizes:
+        for tree in trees:
+            # Виджет должен жить, пока идет замер
+            scene, prepare = frame_case(tree, count)
+            record("frame.prepare", tree, {"letters": count}, prepare)
+            del scene
+    if "lab_2_rework" in trees:
+        for count in instance_counts:
+            scene, prepare = instance_case(count)
+            record("frame.instances", "lab_2_rework", {"instances": count}, prepare)
+            del scene
+    return results
+
+
+def metadata():
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "frame_size": [FRAME_WIDTH, FRAME_HEIGHT],
+    }
+
+
+def result_key(result):
+    return result["tree"], result["name"], json.dumps(result["params"], sort_keys=True)
+
+
+def print_comparison(results, baseline=None):
+    # Отношение lab_2 к lab_2_rework в текущем прогоне и, если есть,
+    # отношение времени к прошлому прогону (> 1 - стало медленнее)
+    current = {result_key(result): result for result in results}
+    print("\nlab_2 / lab_2_rework:")
+    for (tree, name, params), result in current.items():
+        other = current.get(("lab_2_rework", name, params))
+        if tree == "lab_2" and other is not None:
+            print(f"{name:24} {params:18} x{result['best_s'] / other['best_s']:.2f}")
+
+    if baseline is None:
+        return
+    previous = {result_key(result): result for result in baseline["results"]}
+    print("\nСравнение с базовым прогоном:")
+    for key, result in current.items():
+        if key in previous:
+            ratio = result["best_s"] / previous[key]["best_s"]
+            print(f"{key[0]:13} {key[1]:24} {key[2]:18} x{ratio:.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Бенчмарки математики и кадра для lab_2 и lab_2_rework"
+    )
+    parser.add_argument("-o", "--output", help="JSON-файл для результатов")
+    parser.add_argument("--baseline", help="JSON прошлого прогона для сравнения")
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="*",
+        default=list(FRAME_SIZES),
+        help="число букв в кадре",
+    )
+    parser.add_argument(
+        "--instances",
+        type=int,
+        nargs="*",
+        default=list(INSTANCE_COUNTS),
+        help="число экземпляров общих сеток (lab_2_rework)",
+    )
+    parser.add_argument(
+        "--sort-sizes",
+        type=int,
+        nargs="*",
+        default=list(SORT_SIZES),
+        help="число ключей при сортировке по глубине",
+    )
+    parser.add_argument("--trees", nargs="+", choices=TREES, default=list(TREES))
+    parser.add_argument(
+        "--min-time", type=float, default=0.2, help="минимальная длительность замера"
+    )
+    parser.add_argument(
+        "--max-time", type=float, default=30.0, help="предел времени на один случай"
+    )
+    args = parser.parse_args(argv)
+
+    # Ссылка держит приложение Qt живым до конца замеров
+    _app = QApplication.instance() or QApplication(sys.argv[:1])
+    results = run(
+        args.sizes,
+        args.trees,
+        args.min_time,
+        args.max_time,
+        args.instances,
+        args.sort_sizes,
+    )
+    report = {"meta": metadata(), "results": results}
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2, ensure_ascii=False)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            baseline = json.load(file)
+    print_comparison(results, baseline)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
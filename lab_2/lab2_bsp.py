@@ -0,0 +1,220 @@
+import numpy as np
+
+from lab2_clipping import clip_polygons
+
+# Точка ближе EPSILON к плоскости считается лежащей на ней
+EPSILON = 1e-6
+# Сколько плоскостей-кандидатов оценивается при выборе разреза в узле
+SPLIT_CANDIDATES = 32
+# Цена одной разрезанной грани против перекоса поддеревьев на одну грань
+SPLIT_WEIGHT = 8
+# Сколько порядков обхода хранит дерево
+ORDER_CACHE_SIZE = 256
+# Сколько деревьев разных форм хранится
+TREE_CACHE_SIZE = 64
+
+# Деревья по ключу формы буквы
+_trees = {}
+
+
+def shared_tree(key, positions, face_indices, face_normals):
+    """
+    Дерево для формы key. Буквы одной формы, стоящие в разных местах,
+    строят его один раз: координаты передаются относительно буквы.
+    """
+    tree = _trees.get(key)
+    if tree is None:
+        if len(_trees) >= TREE_CACHE_SIZE:
+            del _trees[next(iter(_trees))]
+        tree = _trees[key] = BSPTree(positions, face_indices, face_normals)
+    return tree
+
+
+class BSPTree:
+    """
+    BSP-дерево граней сетки в ее локальных координатах.
+
+    Строится один раз; грань, пересекающая плоскость узла, режется на куски.
+    Куски хранятся массивами: polygons (M, K, 3), число вершин counts (M,)
+    и номер исходной грани faces (M,), свободные слоты повторяют первую
+    вершину. Куски, лежащие в плоскости узла, идут подряд: сначала
+    смотрящие по нормали узла ([starts, middles)), затем против нее
+    ([middles, ends)).
+    """
+
+    def __init__(self, positions, face_indices, face_normals):
+        self.planes = []
+        self.front = []
+        self.back = []
+        self.starts = []
+        self.middles = []
+        self.ends = []
+        self._polygons = []
+        self._counts = []
+        self._faces = []
+        self._orders = {}
+        self._build(positions, face_indices, face_normals)
+
+        size = max((part.shape[1] for part in self._polygons), default=3)
+        self.polygons = _join(self._polygons, size)
+        self.counts = np.concatenate(self._counts or [np.zeros(0, dtype=np.int64)])
+        self.faces = np.concatenate(self._faces or [np.zeros(0, dtype=np.int64)])
+        self.planes = np.array(self.planes, dtype=np.float64).reshape(-1, 4)
+        for name in ("front", "back", "starts", "middles", "ends"):
+            setattr(self, name, np.array(getattr(self, name), dtype=np.int64))
+        del self._polygons, self._counts, self._faces
+
+    def _build(self, positions, face_indices, face_normals):
+        """Построение в глубину без рекурсии; плоскости узлов - плоскости граней"""
+        vertices = positions[face_indices]
+        # Вырожденные грани (нулевая нормаль) не видны и в дерево не входят
+        faces = np.flatnonzero(np.linalg.norm(face_normals, axis=1) > 0.5)
+        normals = face_normals[faces]
+        offsets = -np.einsum("ij,ij->i", normals, vertices[faces, 0])
+        planes = np.concatenate((normals, offsets[:, None]), axis=1)
+        counts = np.full(len(faces), face_indices.shape[1])
+        if not len(faces):
+            return
+
+        # Записи стека: (родитель, передняя ли сторона, куски поддерева)
+        stack = [(-1, True, (vertices[faces], counts, faces, planes))]
+        while stack:
+            parent, front_side, (vertices, counts, faces, planes) = stack.pop()
+            node = len(self.planes)
+            if parent >= 0:
+                (self.front if front_side else self.back)[parent] = node
+            splitter = _choose_splitter(vertices, counts, planes)
+            plane = planes[splitter]
+            self.planes.append(plane)
+            self.front.append(-1)
+            self.back.append(-1)
+
+            above, below = _sides(vertices, counts, plane[None])
+            above, below = above[0], below[0]
+            # Грань-разрез остается в узле, даже если она чуть неплоская
+            above[splitter] = below[splitter] = False
+            on = np.flatnonzero(~above & ~below)
+            same = planes[on, :3] @ plane[:3] > 0
+            on = np.concatenate((on[same], on[~same]))
+            start = sum(len(part) for part in self._faces)
+            self.starts.append(start)
+            self.middles.append(start + int(np.count_nonzero(same)))
+            self.ends.append(start + len(on))
+            self._polygons.append(vertices[on])
+            self._counts.append(counts[on])
+            self._faces.append(faces[on])
+
+            spanning = np.flatnonzero(above & below)
+            for side, mask, clip in ((False, below, -plane), (True, above, plane)):
+                whole = np.flatnonzero(mask & ~(above & below))
+                if len(spanning):
+                    pieces, piece_counts, kept = clip_polygons(
+                        vertices[spanning], counts[spanning], clip[None]
+                    )
+                else:
+                    pieces, piece_counts, kept = vertices[:0], counts[:0], spanning
+                if not len(whole) and not len(kept):
+                    continue
+                size = max(vertices.shape[1], pieces.shape[1])
+                stack.append(
+                    (
+                        node,
+                        side,
+                        (
+                            _join([vertices[whole], pieces], size),
+                            np.concatenate((counts[whole], piece_counts)),
+                            np.concatenate((faces[whole], faces[spanning][kept])),
+                            np.concatenate((planes[whole], planes[spanning][kept])),
+                        ),
+                    )
+                )
+
+    def back_to_front(self, eye):
+        """
+        Номера кусков от дальних к ближним для точки зрения eye (3,)
+        в координатах дерева. Куски, повернутые к ней спиной, пропускаются.
+        """
+        sides = self.planes[:, :3] @ eye + self.planes[:, 3] > 0
+        # Порядок зависит только от того, по какую сторону каждой плоскости
+        # точка зрения, поэтому при движении камеры он берется из кэша
+        key = np.packbits(sides).tobytes()
+        order = self._orders.get(key)
+        if order is None:
+            if len(self._orders) >= ORDER_CACHE_SIZE:
+                del self._orders[next(iter(self._orders))]
+            order = self._orders[key] = self._traverse(sides.tolist())
+        return order
+
+    def _traverse(self, sides):
+        """
+        Обход за линейное время: поддерево за плоскостью узла (дальнее),
+        куски узла, смотрящие на точку зрения, затем ближнее поддерево.
+        """
+        front, back = self.front.tolist(), self.back.tolist()
+        ranges = []
+        stack = [0] if len(sides) else []
+        while stack:
+            node = stack.pop()
+            if node < 0:
+                ranges.append(~node)
+                continue
+            if sides[node]:
+                near, far = front[node], back[node]
+            else:
+                near, far = back[node], front[node]
+            if near >= 0:
+                stack.append(near)
+            stack.append(~node)
+            if far >= 0:
+                stack.append(far)
+
+        nodes = np.array(ranges, dtype=np.int64)
+        facing = np.array(sides, dtype=bool)[nodes]
+        first = np.where(facing, self.starts[nodes], self.middles[nodes])
+        last = np.where(facing, self.middles[nodes], self.ends[nodes])
+        lengths = last - first
+        return np.repeat(first - np.cumsum(lengths) + lengths, lengths) + np.arange(
+            lengths.sum()
+        )
+
+
+def _sides(vertices, counts, planes):
+    """
+    Для плоскостей (C, 4) и многоугольников (M, K, 3): есть ли у
+    многоугольника вершины перед плоскостью и за ней, маски (C, M).
+    """
+    distances = np.einsum("mkj,cj->cmk", vertices, planes[:, :3])
+    distances += planes[:, 3, None, None]
+    used = np.arange(vertices.shape[1]) < counts[:, None]
+    above = np.any((distances > EPSILON) & used, axis=2)
+    below = np.any((distances < -EPSILON) & used, axis=2)
+    return above, below
+
+
+def _choose_splitter(vertices, counts, planes):
+    """Плоскость грани набора, дающая меньше разрезов и ровные поддеревья"""
+    count = len(planes)
+    if count > SPLIT_CANDIDATES:
+        candidates = np.linspace(0, count - 1, SPLIT_CANDIDATES).astype(np.int64)
+    else:
+        candidates = np.arange(count)
+    above, below = _sides(vertices, counts, planes[candidates])
+    splits = np.count_nonzero(above & below, axis=1)
+    balance = np.abs(
+        np.count_nonzero(above & ~below, axis=1)
+        - np.count_nonzero(below & ~above, axis=1)
+    )
+    return candidates[np.argmin(SPLIT_WEIGHT * splits + balance)]
+
+
+def _join(parts, size):
+    """Склеивает многоугольники (M, K, 3) с разным K, дополняя до size"""
+    padded = []
+    for part in parts:
+        extra = size - part.shape[1]
+        if extra > 0:
+            part = np.concatenate((part, np.repeat(part[:, :1], extra, axis=1)), axis=1)
+        padded.append(part)
+    if not padded:
+        return np.zeros((0, size, 3))
+    return np.concatenate(padded)
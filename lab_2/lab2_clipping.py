@@ -0,0 +1,119 @@
+import numpy as np
+
+
+def clip_polygons(vertices, counts, planes):
+    """
+    Отсечение Сазерленда - Ходжмена сразу для всех многоугольников.
+
+    vertices (F, K, D): первые три столбца - координаты в камере, остальные
+    (если есть) - атрибуты вершин, они интерполируются так же линейно.
+    counts (F,) - число вершин каждого многоугольника, planes (P, 4) -
+    плоскости, точка внутри, если a * x + b * y + c * z + d >= 0.
+    Возвращает обрезанные многоугольники (F', K', D), их counts и номера
+    исходных многоугольников по возрастанию; свободные слоты заполнены
+    первой вершиной.
+    """
+    vertices = np.asarray(vertices, dtype=np.float64)
+    counts = np.asarray(counts)
+    planes = np.asarray(planes, dtype=np.float64)
+    if not len(vertices):
+        return vertices, counts, np.arange(0)
+
+    # Сначала одна проверка всех вершин по всем плоскостям: целиком внутри -
+    # без изменений, все вершины за одной плоскостью - отброшены. Алгоритм
+    # работает только с гранями, которые пересекают границу
+    face_count, size, _ = vertices.shape
+    points = vertices[..., :3].reshape(-1, 3)
+    distances = (points @ planes[:, :3].T + planes[:, 3]).reshape(face_count, size, -1)
+    unused = (np.arange(size) >= counts[:, None])[..., None]
+    accepted = np.all((distances >= 0) | unused, axis=(1, 2))
+    rejected = np.any(np.all((distances < 0) | unused, axis=1), axis=1)
+    partial = np.flatnonzero(~accepted & ~rejected)
+    accepted = np.flatnonzero(accepted)
+    if not len(partial):
+        return vertices[accepted], counts[accepted], accepted
+
+    part_vertices, part_counts, part_index = vertices[partial], counts[partial], partial
+    for plane in planes:
+        part_vertices, part_counts = _clip_plane(part_vertices, part_counts, plane)
+        alive = part_counts >= 3
+        part_vertices = part_vertices[alive]
+        part_counts = part_counts[alive]
+        part_index = part_index[alive]
+
+    size = max(size, part_vertices.shape[1])
+    result = np.concatenate((_pad(vertices[accepted], size), _pad(part_vertices, size)))
+    result_counts = np.concatenate((counts[accepted], part_counts))
+    result_index = np.concatenate((accepted, part_index))
+    order = np.argsort(result_index, kind="stable")
+    result, result_counts = result[order], result_counts[order]
+    # Свободные слоты повторяют первую вершину многоугольника
+    unused = np.arange(size) >= result_counts[:, None]
+    result[unused] = np.broadcast_to(result[:, :1], result.shape)[unused]
+    return result, result_counts, result_index[order]
+
+
+def _pad(vertices, size):
+    """Дополняет слоты вершин (F, K, D) до size"""
+    extra = size - vertices.shape[1]
+    if extra <= 0:
+        return vertices
+    padding = np.zeros((len(vertices), extra, vertices.shape[2]))
+    return np.concatenate((vertices, padding), axis=1)
+
+
+def _clip_plane(vertices, counts, plane):
+    """
+    Один шаг алгоритма: для каждого ребра (i, i + 1) остаются вершина i,
+    если она внутри, и точка пересечения, если ребро пересекает плоскость.
+    Выпуклый многоугольник получает не больше одной новой вершины.
+    """
+    face_count, size, _ = vertices.shape
+    slots = np.arange(size)
+    valid = slots < counts[:, None]
+    following = np.where(slots + 1 < counts[:, None], slots + 1, 0)
+    next_vertices = np.take_along_axis(vertices, following[..., None], axis=1)
+
+    distances = vertices[..., :3] @ plane[:3] + plane[3]
+    next_distances = np.take_along_axis(distances, following, axis=1)
+    inside = distances >= 0
+    crossing = valid & (inside != (next_distances >= 0))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = np.where(crossing, distances / (distances - next_distances), 0)
+    points = vertices + t[..., None] * (next_vertices - vertices)
+
+    # Кандидаты вперемешку: вершина i, точка на ребре i, вершина i + 1, ...
+    # Устойчивая сортировка по маске сдвигает оставшиеся в начало строки
+    candidates = np.stack((vertices, points), axis=2).reshape(face_count, 2 * size, -1)
+    keep = np.stack((valid & inside, crossing), axis=2).reshape(face_count, 2 * size)
+    new_counts = keep.sum(axis=1)
+    capacity = max(3, int(new_counts.max(initial=0)))
+    order = np.argsort(~keep, axis=1, kind="stable")[:, :capacity]
+    return np.take_along_axis(candidates, order[..., None], axis=1), new_counts
+
+
+def points_inside(points, planes):
+    """Маска точек (N, 3), лежащих внутри всех плоскостей"""
+    planes = np.asarray(planes, dtype=np.float64)
+    return np.all(points @ planes[:, :3].T + planes[:, 3] >= 0, axis=1)
+
+
+def clip_segments(starts, ends, planes):
+    """
+    Отсечение отрезков (N, 3) параметрически, как у Лианга - Барски: каждая
+    плоскость сужает допустимый отрезок параметра [t0, t1]. Возвращает
+    обрезанные концы и номера оставшихся отрезков; концы внутри пирамиды
+    не меняются.
+    """
+    planes = np.asarray(planes, dtype=np.float64)
+    d0 = starts @ planes[:, :3].T + planes[:, 3]
+    d1 = ends @ planes[:, :3].T + planes[:, 3]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = d0 / (d0 - d1)
+    t0 = np.where((d0 < 0) & (d1 >= 0), t, 0).max(axis=1, initial=0)
+    t1 = np.where((d0 >= 0) & (d1 < 0), t, 1).min(axis=1, initial=1)
+    keep = ~np.any((d0 < 0) & (d1 < 0), axis=1) & (t0 <= t1)
+    direction = ends - starts
+    new_starts = np.where(t0[:, None] > 0, starts + t0[:, None] * direction, starts)
+    new_ends = np.where(t1[:, None] < 1, starts + t1[:, None] * direction, ends)
+    return new_starts[keep], new_ends[keep], np.flatnonzero(keep)
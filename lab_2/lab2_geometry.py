@@ -1,5 +1,12 @@
+import numpy as np
+
 from lab2_math import Vector3D
 
+# Единичный куб: углы AABB получаются как min + (max - min) * _CUBE
+_CUBE = np.array(
+    [(x, y, z) for x in (0, 1) for y in (0, 1) for z in (0, 1)], dtype=np.float64
+)
+
 
 class Face:
     def __init__(self, vertices, color):
@@ -30,14 +37,86 @@ class Face:
         sz = sum(v.z for v in self.vertices) / count
         return Vector3D(sx, sy, sz, 1)
 
-    def is_visible(self, camera_pos):
-        """Алгоритм отсечения невидимых граней (Back-face culling)"""
-        current_normal = self.calculate_normal()
-        current_center = self.calculate_center()
 
-        # Вектор взгляда от камеры к объекту
-        view_dir = (current_center - camera_pos).normalized()
+def bounding_volumes(positions):
+    """
+    Ограничивающие объемы набора точек (N, 3): AABB (min, max) и описанная
+    сфера с центром в центре AABB и радиусом до самой дальней точки.
+    """
+    if not len(positions):
+        zero = np.zeros(3)
+        return zero, zero, zero, 0.0
+    low = positions.min(axis=0)
+    high = positions.max(axis=0)
+    center = (low + high) / 2
+    radius = float(np.sqrt(np.max(np.sum((positions - center) ** 2, axis=1))))
+    return low, high, center, radius
+
+
+def max_scale(matrices):
+    """
+    Оценка сверху наибольшего растяжения блока 3x3 матрицы (или стопки
+    матриц (N, 4, 4)) по кругам Гершгорина для M^T M: во столько раз может
+    вырасти радиус сферы. Для поворота с масштабом оценка точная.
+    """
+    block = np.asarray(matrices)[..., :3, :3]
+    gram = np.swapaxes(block, -1, -2) @ block
+    return np.sqrt(np.max(np.sum(np.abs(gram), axis=-1), axis=-1))
+
+
+class Frustum:
+    """
+    Пирамида видимости в координатах камеры: плоскости (a, b, c, d),
+    точка внутри, если a * x + b * y + c * z + d >= 0 для всех плоскостей.
+    """
+
+    def __init__(self, planes):
+        planes = np.asarray(planes, dtype=np.float64)
+        self.planes = planes / np.linalg.norm(planes[:, :3], axis=1)[:, None]
+
+    @classmethod
+    def from_slopes(cls, kx, ky, near=1e-6):
+        """Камера смотрит вдоль +Z: видно |x| <= kx * z, |y| <= ky * z, z >= near"""
+        return cls(
+            [
+                (0.0, 0.0, 1.0, -near),
+                (-1.0, 0.0, kx, 0.0),
+                (1.0, 0.0, kx, 0.0),
+                (0.0, -1.0, ky, 0.0),
+                (0.0, 1.0, ky, 0.0),
+            ]
+        )
+
+    def _distances(self, points):
+        return points @ self.planes[:, :3].T + self.planes[:, 3]
+
+    def spheres_outside(self, centers, radii):
+        """Сфера целиком за одной из плоскостей"""
+        distances = self._distances(np.asarray(centers).reshape(-1, 3))
+        return np.any(distances < -np.asarray(radii).reshape(-1, 1), axis=1)
+
+    def boxes_outside(self, corners):
+        """
+        Все 8 углов (N, 8, 3) за одной плоскостью. Проверка консервативна:
+        коробка у ребра пирамиды может остаться, но видимая не отсекается.
+        """
+        distances = self._distances(np.asarray(corners))
+        return np.any(np.all(distances < 0, axis=1), axis=1)
 
-        # Скалярное произведение:
-        # Если < 0, угол между нормалью и взглядом > 90 градусов (грань смотрит на нас)
-        return current_normal.dot(view_dir) < 0
+    def cull(self, matrices, centers, radii, lows, highs):
+        """
+        Маска невидимых объектов по матрицам объект -> камера (N, 4, 4),
+        локальным сферам и AABB. Сначала дешевая проверка сфер, углы AABB
+        переводятся в камеру только для оставшихся объектов.
+        """
+        matrices = np.asarray(matrices)
+        rotation = matrices[:, :3, :3]
+        offset = matrices[:, :3, 3]
+        camera_centers = np.einsum("nij,nj->ni", rotation, centers) + offset
+        outside = self.spheres_outside(camera_centers, radii * max_scale(matrices))
+        rest = np.flatnonzero(~outside)
+        if len(rest):
+            corners = lows[rest, None] + (highs[rest] - lows[rest])[:, None] * _CUBE
+            corners = np.einsum("nij,nkj->nki", rotation[rest], corners)
+            outside[rest] = self.boxes_outside(corners + offset[rest, None])
+        return outside
@@ -0,0 +1,287 @@
+from functools import lru_cache
+
+import numpy as np
+from PySide6.QtGui import QFont, QFontMetricsF, QPainterPath
+
+# Сколько сеток символов держать в памяти (символ, шрифт, размер, глубина)
+GLYPH_CACHE_SIZE = 512
+# Вид грани: крышка (лицевая/задняя сторона) или боковая стенка
+CAP = 0
+SIDE = 1
+
+_EPS = 1e-9
+
+
+class GlyphMesh:
+    """
+    Выдавленный символ в координатах шрифта: x вправо, y вверх, базовая
+    линия y = 0, лицевая крышка в z = -depth / 2, задняя в z = depth / 2.
+    Треугольники крышек хранятся вырожденными четырехугольниками (a, b, c, c),
+    чтобы у всех граней буквы было по 4 индекса. Массивы общие для всех
+    копий символа из кэша, поэтому только для чтения.
+    """
+
+    def __init__(self, positions, faces, kinds, advance):
+        self.positions = positions
+        self.faces = faces
+        self.kinds = kinds
+        self.advance = advance
+        for array in (positions, faces, kinds):
+            array.flags.writeable = False
+
+
+def make_font(family, pixel_size):
+    font = QFont(family) if family else QFont()
+    font.setPixelSize(max(1, int(pixel_size)))
+    return font
+
+
+def pixel_size_for_height(height, family=None):
+    """Размер шрифта, при котором заглавные буквы высотой height"""
+    cap = QFontMetricsF(make_font(family, 100)).capHeight()
+    return max(1, round(height * 100 / cap)) if cap > 0 else max(1, round(height))
+
+
+def text_meshes(text, height, depth, family=None):
+    """
+    Сетки символов строки и их смещения по X (строка начинается в x = 0).
+    Повторяющиеся символы берутся из кэша, а не триангулируются заново
+    """
+    family = family or QFont().defaultFamily()
+    size = pixel_size_for_height(height, family)
+    placed = []
+    x = 0.0
+    for char in text:
+        mesh = glyph_mesh(char, family, size, float(depth))
+        placed.append((mesh, x))
+        x += mesh.advance
+    return placed, x
+
+
+@lru_cache(maxsize=GLYPH_CACHE_SIZE)
+def glyph_mesh(char, family, pixel_size, depth):
+    """
+    Выдавливает один символ шрифта на глубину depth. Результат кэшируется
+    (LRU на GLYPH_CACHE_SIZE записей) по символу, шрифту, размеру и глубине.
+    """
+    font = make_font(family, pixel_size)
+    path = QPainterPath()
+    path.addText(0, 0, font, char)
+    # Кривые контура Qt переводит в ломаные; y в Qt направлен вниз
+    contours = []
+    for polygon in path.toSubpathPolygons():
+        contour = _clean_contour([(p.x(), -p.y()) for p in polygon])
+        if len(contour) >= 3:
+            contours.append(contour)
+    return _extrude(contours, depth, QFontMetricsF(font).horizontalAdvance(char))
+
+
+def _clean_contour(points):
+    """Без замыкающей точки, повторов и точек на прямой между соседями"""
+    points = np.array(points, dtype=np.float64).reshape(-1, 2)
+    if len(points) > 1 and np.all(points[0] == points[-1]):
+        points = points[:-1]
+    changed = True
+    while changed and len(points) >= 3:
+        prev = np.roll(points, 1, axis=0)
+        nxt = np.roll(points, -1, axis=0)
+        cross = _cross(prev, points, nxt)
+        keep = (np.abs(cross) > _EPS) & np.any(points != prev, axis=1)
+        changed = not keep.all()
+        points = points[keep]
+    return points
+
+
+def _cross(a, b, c):
+    """Z-компонента (b - a) x (c - a): > 0, если a -> b -> c против часовой стрелки"""
+    return (b[..., 0] - a[..., 0]) * (c[..., 1] - a[..., 1]) - (
+        b[..., 1] - a[..., 1]
+    ) * (c[..., 0] - a[..., 0])
+
+
+def _signed_area(points):
+    x, y = points[:, 0], points[:, 1]
+    return (np.dot(x, np.roll(y, -1)) - np.dot(y, np.roll(x, -1))) / 2
+
+
+def _point_in_polygon(point, polygon):
+    x, y = point
+    x0, y0 = polygon[:, 0], polygon[:, 1]
+    x1, y1 = np.roll(x0, -1), np.roll(y0, -1)
+    crosses = (y0 > y) != (y1 > y)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        at_x = x0 + (y - y0) * (x1 - x0) / (y1 - y0)
+    return np.count_nonzero(crosses & (x < at_x)) % 2 == 1
+
+
+def _extrude(contours, depth, advance):
+    """
+    Вложенность контуров: четная - внешний контур, нечетная - отверстие.
+    Внешние обходятся против часовой стрелки, отверстия - по часовой,
+    так что тело буквы всегда слева от ребра
+    """
+    nesting = [
+        sum(
+            _point_in_polygon(contour[0], other)
+            for j, other in enumerate(contours)
+            if j != i
+        )
+        for i, contour in enumerate(contours)
+    ]
+    oriented = []
+    for contour, level in zip(contours, nesting):
+        ccw = _signed_area(contour) > 0
+        if ccw != (level % 2 == 0):
+            contour = contour[::-1]
+        oriented.append(contour)
+
+    index_of = {}
+    for contour in oriented:
+        for point in map(tuple, contour.tolist()):
+            index_of.setdefault(point, len(index_of))
+    n = len(index_of)
+    positions = np.zeros((2 * n, 3))
+    points = np.array(list(index_of), dtype=np.float64).reshape(-1, 2)
+    positions[:n, :2] = points
+    positions[n:, :2] = points
+    positions[:n, 2] = -depth / 2
+    positions[n:, 2] = depth / 2
+
+    faces = []
+    kinds = []
+    for i, outer in enumerate(oriented):
+        if nesting[i] % 2:
+            continue
+        # Отверстия, лежащие прямо внутри этого контура
+        holes = [
+            hole
+            for j, hole in enumerate(oriented)
+            if nesting[j] == nesting[i] + 1 and _point_in_polygon(hole[0], outer)
+        ]
+        polygon = _bridge_holes(outer, holes)
+        ids = [index_of[point] for point in map(tuple, polygon.tolist())]
+        for a, b, c in _ear_clip(polygon):
+            a, b, c = ids[a], ids[b], ids[c]
+            # Лицевая крышка смотрит в -Z, задняя - в +Z
+            faces.append((a, c, b, b))
+            faces.append((n + a, n + b, n + c, n + c))
+            kinds += (CAP, CAP)
+
+    for contour in oriented:
+        ids = [index_of[point] for point in map(tuple, contour.tolist())]
+        for a, b in zip(ids, ids[1:] + ids[:1]):
+            faces.append((a, b, n + b, n + a))
+            kinds.append(SIDE)
+
+    return GlyphMesh(
+        positions,
+        np.array(faces, dtype=np.int32).reshape(-1, 4),
+        np.array(kinds, dtype=np.uint8),
+        advance,
+    )
+
+
+def _bridge_holes(outer, holes):
+    """
+    Каждое отверстие соединяется с внешним контуром двойным ребром-мостом,
+    после чего многоугольник без отверстий можно резать на уши. Отверстия
+    берутся по убыванию самой правой точки, как в методе Эберли
+    """
+    polygon = outer
+    holes = sorted(holes, key=lambda hole: -hole[:, 0].max())
+    for number, hole in enumerate(holes):
+        start = int(np.argmax(hole[:, 0]))
+        m = hole[start]
+        edges = _edges([polygon] + holes[number:])
+        distances = np.linalg.norm(polygon - m, axis=1)
+        target = None
+        for j in np.argsort(distances, kind="stable"):
+            if _in_cone(polygon, j, m) and not _crosses_any(m, polygon[j], edges):
+                target = j
+                break
+        if target is None:
+            target = int(np.argmin(distances))
+        ring = np.concatenate((hole[start:], hole[: start + 1]))
+        polygon = np.concatenate((polygon[: target + 1], ring, polygon[target:]))
+    return polygon
+
+
+def _edges(polygons):
+    return np.concatenate(
+        [np.stack((p, np.roll(p, -1, axis=0)), axis=1) for p in polygons]
+    )
+
+
+def _crosses_any(p, q, edges):
+    """
+    Собственное пересечение отрезка pq хотя бы с одним ребром
+    (касание в концах не считается)
+    """
+    a, b = edges[:, 0], edges[:, 1]
+    d1 = _cross(a, b, p)
+    d2 = _cross(a, b, q)
+    d3 = _cross(p, q, a)
+    d4 = _cross(p, q, b)
+    proper = (d1 * d2 < -_EPS) & (d3 * d4 < -_EPS)
+    return bool(proper.any())
+
+
+def _in_cone(polygon, j, point):
+    """Направление из вершины j на point идет внутрь многоугольника"""
+    a0 = polygon[j - 1]
+    a = polygon[j]
+    a1 = polygon[(j + 1) % len(polygon)]
+    if _cross(a, a1, a0) >= 0:
+        return _cross(a, point, a0) > 0 and _cross(point, a, a1) > 0
+    return not (_cross(a, point, a1) >= 0 and _cross(point, a, a0) >= 0)
+
+
+def _ear_clip(polygon):
+    """
+    Триангуляция отсечением ушей простого многоугольника против часовой
+    стрелки. Возвращает тройки номеров вершин polygon
+    """
+    remaining = list(range(len(polygon)))
+    triangles = []
+    while len(remaining) > 3:
+        p = polygon[remaining]
+        prev = np.roll(p, 1, axis=0)
+        nxt = np.roll(p, -1, axis=0)
+        cross = _cross(prev, p, nxt)
+        # Внутри уха может оказаться только вогнутая вершина
+        reflex = p[cross <= _EPS]
+        ear = None
+        for i in np.flatnonzero(cross > _EPS):
+            if not _any_inside(prev[i], p[i], nxt[i], reflex):
+                ear = i
+                break
+        if ear is None:
+            # Вырожденный остаток (погрешность округления): режем самый выпуклый угол
+            ear = int(np.argmax(cross))
+        count = len(remaining)
+        triangles.append(
+            (remaining[ear - 1], remaining[ear], remaining[(ear + 1) % count])
+        )
+        del remaining[ear]
+    triangles.append(tuple(remaining))
+    return triangles
+
+
+def _any_inside(a, b, c, points):
+    """
+    Точки внутри треугольника abc или на его сторонах, кроме самих вершин
+    (дубли вершин появляются на мостах к отверстиям)
+    """
+    if not len(points):
+        return False
+    inside = (
+        (_cross(a, b, points) >= -_EPS)
+        & (_cross(b, c, points) >= -_EPS)
+        & (_cross(c, a, points) >= -_EPS)
+    )
+    corner = (
+        np.all(points == a, axis=1)
+        | np.all(points == b, axis=1)
+        | np.all(points == c, axis=1)
+    )
+    return bool((inside & ~corner).any())
@@ -1,19 +1,51 @@
+import numpy as np
 from PySide6.QtGui import QColor
-from lab2_math import Vector3D, Matrix4x4
-from lab2_geometry import Face
+from lab2_math import Vector3D, Vector3DArray, Matrix4x4, Quaternion
+from lab2_geometry import Face, bounding_volumes
+from lab2_glyphs import CAP, text_meshes
+from lab2_bsp import shared_tree
 
 
 class Letter3D:
-    def __init__(self, height, width, depth, offset_x, letter_type):
+    def __init__(self, height, width, depth, offset_x, letter_type, font_family=None):
         self.height = height
         self.width = width
         self.depth = depth
         self.offset_x = offset_x
+        # "Д" и "Б" строятся вручную, любая другая строка - по контурам шрифта
         self.letter_type = letter_type
+        self.font_family = font_family
 
         self.faces = []  # Список граней в локальных координатах
-        self.transform = Matrix4x4()  # Матрица поворота и положения
+        # Индексированная сетка (заполняется в _build_mesh)
+        self.positions = np.zeros((0, 3))
+        self.face_indices = np.zeros((0, 4), dtype=np.int32)
+        self.face_colors = np.zeros((0, 3), dtype=np.uint8)
+        self.face_normals = np.zeros((0, 3))
+        # Уникальные ребра (E, 2), номер ребра у каждой стороны грани (F, k)
+        # и грани, чей цвет получают ребра и вершины в режимах точек и каркаса
+        self.edges = np.zeros((0, 2), dtype=np.int32)
+        self.face_edges = np.zeros((0, 4), dtype=np.int32)
+        self.edge_faces = np.zeros(0, dtype=np.int32)
+        self.point_faces = np.zeros(0, dtype=np.int32)
+        # Ограничивающие объемы в локальных координатах: AABB и описанная
+        # сфера (пересчитываются вместе с сеткой)
+        self.aabb_min = np.zeros(3)
+        self.aabb_max = np.zeros(3)
+        self.bounding_center = np.zeros(3)
+        self.bounding_radius = 0.0
+        # Положение буквы: перенос, кватернион поворота и знаки осей
+        # (отражения). Матрица transform собирается из них по требованию
+        self.translation = Vector3D(0, 0, 0, 0)
+        self.rotation = Quaternion()
+        self.axis_scale = (1.0, 1.0, 1.0)
+        self._matrix = None
+        self._matrix_key = None
         self.scale = 1.0
+        # Растет при каждой перестройке сетки (ключ кэша сцены)
+        self.geometry_version = 0
+        # BSP-дерево граней, строится при первом запросе
+        self._bsp_tree = None
 
         self.update_geometry()
 
@@ -27,6 +59,106 @@ class Letter3D:
             self.create_letter_D(h, w, d, ox, bar)
         elif self.letter_type == "Б":
             self.create_letter_B(h, w, d, ox, bar)
+        else:
+            self.create_text(h, d, ox)
+        self._build_mesh()
+        self._bsp_tree = None
+        self.geometry_version += 1
+
+    def bsp_tree(self):
+        """
+        BSP-дерево граней в координатах относительно bsp_origin().
+        Общее для букв одной формы, стоящих в разных местах.
+        """
+        if self._bsp_tree is None:
+            key = (
+                self.letter_type,
+                self.height,
+                self.width,
+                self.depth,
+                self.font_family,
+            )
+            self._bsp_tree = shared_tree(
+                key,
+                self.positions - self.bsp_origin(),
+                self.face_indices,
+                self.face_normals,
+            )
+        return self._bsp_tree
+
+    def bsp_origin(self):
+        """Начало координат дерева в локальных координатах буквы"""
+        return np.array([self.offset_x, 0.0, 0.0])
+
+    def _build_mesh(self):
+        """
+        Собирает компактную индексированную сетку:
+        уникальные позиции (N, 3), индексы граней (F, k),
+        цвета (F, 3) и нормали граней (F, 3).
+        """
+        index_of = {}
+        positions = []
+        face_indices = []
+        for face in self.faces:
+            indices = []
+            for v in face.vertices:
+                key = (v.x, v.y, v.z)
+                if key not in index_of:
+                    index_of[key] = len(positions)
+                    positions.append(key)
+                indices.append(index_of[key])
+            face_indices.append(indices)
+
+        self.positions = np.array(positions, dtype=np.float64).reshape(-1, 3)
+        (
+            self.aabb_min,
+            self.aabb_max,
+            self.bounding_center,
+            self.bounding_radius,
+        ) = bounding_volumes(self.positions)
+        self.face_indices = (
+            np.array(face_indices, dtype=np.int32)
+            if face_indices
+            else np.zeros((0, 4), dtype=np.int32)
+        )
+        self.face_colors = np.array(
+            [(f.color.red(), f.color.green(), f.color.blue()) for f in self.faces],
+            dtype=np.uint8,
+        ).reshape(-1, 3)
+
+        p = self.positions[self.face_indices]
+        normals = np.cross(p[:, 1] - p[:, 0], p[:, 2] - p[:, 0])
+        lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+        self.face_normals = np.divide(
+            normals, lengths, out=np.zeros_like(normals), where=lengths > 0
+        )
+        self._build_edges()
+
+    def _build_edges(self):
+        """
+        Список ребер без повторов: общая сторона соседних граней - одно ребро,
+        в порядке первого появления. У вырожденных граней (a, b, c, c)
+        сторона c-c ребром не считается, в face_edges для нее -1.
+        Ребро и вершина получают цвет первой грани, в которую входят.
+        """
+        face_count, k = self.face_indices.shape
+        starts = self.face_indices.ravel()
+        ends = np.roll(self.face_indices, -1, axis=1).ravel()
+        low = np.minimum(starts, ends).astype(np.int64)
+        high = np.maximum(starts, ends).astype(np.int64)
+        keys = np.where(starts != ends, low * len(self.positions) + high, -1)
+        unique, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+        real = unique >= 0
+        order = np.argsort(first[real], kind="stable")
+        first = first[real][order]
+        numbers = np.full(len(unique), -1, dtype=np.int32)
+        numbers[np.flatnonzero(real)[order]] = np.arange(len(first), dtype=np.int32)
+
+        self.edges = np.stack((starts[first], ends[first]), axis=1).astype(np.int32)
+        self.face_edges = numbers[inverse].reshape(face_count, k)
+        self.edge_faces = (first // k).astype(np.int32)
+        self.point_faces = np.full(len(self.positions), face_count, dtype=np.int32)
+        np.minimum.at(self.point_faces, starts, np.arange(len(starts)) // k)
 
     def _create_faces_for_part(self, front, back, colors):
         """
@@ -241,40 +373,104 @@ class Letter3D:
         ]
         self._create_faces_for_part(f_right, b_right, colors)
 
-    def get_transformed_faces(self):
+    def create_text(self, h, d, ox):
+        """
+        Выдавливает строку letter_type из контуров шрифта: высота заглавных
+        букв h, глубина d, центр строки в ox. Ширина буквы не используется -
+        пропорции берутся из шрифта.
+        """
+        placed, total = text_meshes(self.letter_type, h, d, self.font_family)
+        colors = [QColor(0, 102, 204), QColor(0, 72, 143)]
+        start = ox - total / 2
+        for mesh, x in placed:
+            vertices = [
+                Vector3D(start + x + px, py, pz)
+                for px, py, pz in mesh.positions.tolist()
+            ]
+            for face, kind in zip(mesh.faces.tolist(), mesh.kinds.tolist()):
+                color = colors[0 if kind == CAP else 1]
+                self.faces.append(Face([vertices[i] for i in face], color))
+
+    def world_matrix(self):
+        """Модель -> мир: сначала масштаб, потом вращение/перенос"""
+        return Matrix4x4.scaling(self.scale, self.scale, self.scale) * self.transform
+
+    def get_world_positions(self):
+        """Уникальные вершины в мировых координатах одним массивом"""
+        return Vector3DArray(self.positions).transform(self.world_matrix())
+
+    def get_transformed_faces(self, world_positions=None):
         """
         Применяет текущую матрицу трансформации к каждой вершине.
         Возвращает новый список граней, готовых к отрисовке.
         """
-        # Сначала масштабируем, потом применяем вращение/перенос
-        final_mat = (
-            Matrix4x4.scaling(self.scale, self.scale, self.scale) * self.transform
-        )
+        if world_positions is None:
+            world_positions = self.get_world_positions()
+        # Грани собираются по индексам из общих вершин
+        transformed = world_positions.to_vectors()
+        return [
+            Face([transformed[i] for i in indices], face.color)
+            for face, indices in zip(self.faces, self.face_indices.tolist())
+        ]
 
-        transformed_faces = []
-        for face in self.faces:
-            # Умножаем каждую вершину (Vector3D) на матрицу
-            new_verts = [final_mat * v for v in face.vertices]
-            # Создаем временную грань для рендеринга
-            transformed_faces.append(Face(new_verts, face.color))
-        return transformed_faces
+    @property
+    def transform(self):
+        """
+        Матрица поворота и положения T * R * S. Собирается заново только
+        после изменения переноса, поворота или отражения.
+        """
+        t, q = self.translation, self.rotation
+        key = (t.x, t.y, t.z, *q.components(), *self.axis_scale)
+        if key != self._matrix_key:
+            self._matrix = Matrix4x4.from_trs(t, q, self.axis_scale)
+            self._matrix_key = key
+        return self._matrix
+
+    @transform.setter
+    def transform(self, matrix):
+        # Произвольная аффинная матрица раскладывается обратно на части
+        self.translation, self.rotation, self.axis_scale = matrix.decompose()
+
+    def reset_transform(self):
+        self.translation = Vector3D(0, 0, 0, 0)
+        self.rotation = Quaternion()
+        self.axis_scale = (1.0, 1.0, 1.0)
 
     def rotate(self, axis, angle):
-        """Накапливает вращение в матрице трансформации"""
+        """
+        Накапливает вращение в кватернионе. Как и прежнее умножение
+        rot * transform, поворот действует и на перенос.
+        """
         if axis == 0:
-            rot = Matrix4x4.rotation_x(angle)
+            rot = Quaternion.rotation_x(angle)
         elif axis == 1:
-            rot = Matrix4x4.rotation_y(angle)
+            rot = Quaternion.rotation_y(angle)
         else:
-            rot = Matrix4x4.rotation_z(angle)
+            rot = Quaternion.rotation_z(angle)
 
-        # Перемножаем матрицы, чтобы сохранить предыдущие повороты
-        self.transform = rot * self.transform
+        # Нормировка на каждом шаге: при любом числе поворотов
+        # матрица остается ортонормированной
+        self.rotation = (rot * self.rotation).normalized()
+        self.translation = rot.rotate(self.translation)
 
     def translate(self, dx, dy, dz):
         """Смещает букву в пространстве"""
-        move = Matrix4x4.translation(dx, dy, dz)
-        self.transform = move * self.transform
+        t = self.translation
+        self.translation = Vector3D(t.x + dx, t.y + dy, t.z + dz, 0)
+
+    def mirror(self, sx, sy, sz):
+        """
+        Отражает букву по осям со знаками sx, sy, sz (равносильно
+        Matrix4x4.scaling(sx, sy, sz) * transform).
+        """
+        # M (T R S) = (M T M) (M R M) (M S): перенос и масштаб меняют знаки,
+        # а M R M - поворот вокруг отраженной оси (при det M < 0 - в обратную сторону)
+        det = sx * sy * sz
+        q, t = self.rotation, self.translation
+        self.rotation = Quaternion(q.w, det * sx * q.x, det * sy * q.y, det * sz * q.z)
+        self.translation = Vector3D(sx * t.x, sy * t.y, sz * t.z, 0)
+        ax, ay, az = self.axis_scale
+        self.axis_scale = (sx * ax, sy * ay, sz * az)
 
     def set_scale(self, s):
         self.scale = s
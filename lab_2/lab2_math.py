@@ -1,7 +1,12 @@
 import math
 
+import numpy as np
+
 
 class Vector3D:
+    # Без __dict__: меньше памяти и быстрее доступ к полям
+    __slots__ = ("x", "y", "z", "w")
+
     def __init__(self, x=0, y=0, z=0, w=1):
         self.x = x
         self.y = y
@@ -42,45 +47,289 @@ class Vector3D:
             0,  # Результат всегда вектор
         )
 
+    def __repr__(self):
+        return f"Vector3D({self.x}, {self.y}, {self.z}, {self.w})"
+
+
+class Vector3DArray:
+    """
+    Набор векторов в одном массиве (N, 3) с общим w (1 - точки, 0 - векторы).
+    Операции выполняются над всем набором сразу, без объекта на вершину.
+    """
+
+    __slots__ = ("data", "w")
+
+    def __init__(self, data, w=1):
+        self.data = np.asarray(data, dtype=np.float64).reshape(-1, 3)
+        self.w = w
+
+    @classmethod
+    def from_vectors(cls, vectors, w=1):
+        return cls([(v.x, v.y, v.z) for v in vectors], w)
+
+    def to_vectors(self):
+        return [Vector3D(x, y, z, self.w) for x, y, z in self.data.tolist()]
+
+    def __len__(self):
+        return len(self.data)
+
+    def __getitem__(self, index):
+        if isinstance(index, (int, np.integer)):
+            return Vector3D(*self.data[index].tolist(), self.w)
+        return Vector3DArray(self.data[index], self.w)
+
+    def __add__(self, other):
+        return Vector3DArray(self.data + _components(other), self.w)
+
+    def __sub__(self, other):
+        # Как у Vector3D: точка - точка = вектор
+        new_w = 1 if self.w != _w_of(other) else 0
+        return Vector3DArray(self.data - _components(other), new_w)
+
+    def __mul__(self, scalar):
+        # Число или массив (N,) - свой множитель для каждого вектора
+        scalar = np.asarray(scalar)
+        if scalar.ndim == 1:
+            scalar = scalar[:, None]
+        return Vector3DArray(self.data * scalar, self.w)
+
+    def lengths(self):
+        return np.sqrt(np.einsum("ij,ij->i", self.data, self.data))
+
+    def normalized(self):
+        lengths = self.lengths()[:, None]
+        data = np.divide(
+            self.data, lengths, out=np.zeros_like(self.data), where=lengths > 0
+        )
+        return Vector3DArray(data, 0)
+
+    def dot(self, other):
+        return np.einsum(
+            "ij,ij->i", self.data, np.broadcast_to(_components(other), self.data.shape)
+        )
+
+    def cross(self, other):
+        return Vector3DArray(np.cross(self.data, _components(other)), 0)
+
+    def transform(self, matrix):
+        """
+        Умножает матрицу на все векторы. Слагаемые складываются в том же
+        порядке, что и в Matrix4x4 * Vector3D, поэтому результат совпадает
+        с поэлементным умножением до последнего бита.
+        """
+        m = matrix.to_numpy()
+        x, y, z = self.data[:, 0:1], self.data[:, 1:2], self.data[:, 2:3]
+        if matrix.affine and self.w in (0, 1):
+            # w-строка (0, 0, 0, 1) не меняет w, деления нет
+            result = x * m[:3, 0] + y * m[:3, 1] + z * m[:3, 2] + self.w * m[:3, 3]
+            return Vector3DArray(result, self.w)
+        result = x * m[:, 0] + y * m[:, 1] + z * m[:, 2] + self.w * m[:, 3]
+        w = result[:, 3]
+        # Перспективное деление только там, где w не 0 и не 1
+        divide = (w != 0) & (w != 1)
+        if divide.any():
+            result[divide, :3] /= w[divide, None]
+        return Vector3DArray(result[:, :3], self.w)
+
+
+def _components(other):
+    if isinstance(other, Vector3DArray):
+        return other.data
+    if isinstance(other, Vector3D):
+        return np.array([other.x, other.y, other.z])
+    return np.asarray(other, dtype=np.float64)
+
+
+def _w_of(other):
+    return other.w if isinstance(other, (Vector3D, Vector3DArray)) else 0
+
+
+class Quaternion:
+    """
+    Единичный кватернион поворота (w, x, y, z). Накопленный поворот
+    хранится так, а не матрицей: после каждого умножения кватернион
+    нормируется, и ошибки округления не превращаются в сдвиг или масштаб.
+    """
+
+    __slots__ = ("w", "x", "y", "z")
+
+    def __init__(self, w=1.0, x=0.0, y=0.0, z=0.0):
+        self.w = w
+        self.x = x
+        self.y = y
+        self.z = z
+
+    @staticmethod
+    def from_axis_angle(axis, angle):
+        axis = axis.normalized()
+        half = math.radians(angle) / 2
+        s = math.sin(half)
+        return Quaternion(math.cos(half), axis.x * s, axis.y * s, axis.z * s)
+
+    @staticmethod
+    def rotation_x(angle):
+        half = math.radians(angle) / 2
+        return Quaternion(math.cos(half), math.sin(half), 0.0, 0.0)
+
+    @staticmethod
+    def rotation_y(angle):
+        half = math.radians(angle) / 2
+        return Quaternion(math.cos(half), 0.0, math.sin(half), 0.0)
+
+    @staticmethod
+    def rotation_z(angle):
+        half = math.radians(angle) / 2
+        return Quaternion(math.cos(half), 0.0, 0.0, math.sin(half))
+
+    @staticmethod
+    def from_matrix(matrix):
+        """
+        Кватернион по ортонормированному блоку 3x3 матрицы (метод Шеппарда:
+        деление на наибольшую из четырех величин, без потери точности).
+        """
+        v = matrix.values
+        m00, m01, m02 = v[0], v[1], v[2]
+        m10, m11, m12 = v[4], v[5], v[6]
+        m20, m21, m22 = v[8], v[9], v[10]
+        trace = m00 + m11 + m22
+        if trace > 0:
+            s = 2 * math.sqrt(trace + 1)
+            q = Quaternion(s / 4, (m21 - m12) / s, (m02 - m20) / s, (m10 - m01) / s)
+        elif m00 > m11 and m00 > m22:
+            s = 2 * math.sqrt(1 + m00 - m11 - m22)
+            q = Quaternion((m21 - m12) / s, s / 4, (m01 + m10) / s, (m02 + m20) / s)
+        elif m11 > m22:
+            s = 2 * math.sqrt(1 + m11 - m00 - m22)
+            q = Quaternion((m02 - m20) / s, (m01 + m10) / s, s / 4, (m12 + m21) / s)
+        else:
+            s = 2 * math.sqrt(1 + m22 - m00 - m11)
+            q = Quaternion((m10 - m01) / s, (m02 + m20) / s, (m12 + m21) / s, s / 4)
+        return q.normalized()
+
+    def __mul__(self, other):
+        # Композиция поворотов: (a * b) поворачивает сначала на b, потом на a
+        aw, ax, ay, az = self.w, self.x, self.y, self.z
+        bw, bx, by, bz = other.w, other.x, other.y, other.z
+        return Quaternion(
+            aw * bw - ax * bx - ay * by - az * bz,
+            aw * bx + ax * bw + ay * bz - az * by,
+            aw * by - ax * bz + ay * bw + az * bx,
+            aw * bz + ax * by - ay * bx + az * bw,
+        )
+
+    def __eq__(self, other):
+        if not isinstance(other, Quaternion):
+            return False
+        return self.components() == other.components()
+
+    def __repr__(self):
+        return f"Quaternion({self.w}, {self.x}, {self.y}, {self.z})"
+
+    def components(self):
+        return self.w, self.x, self.y, self.z
+
+    def conjugate(self):
+        return Quaternion(self.w, -self.x, -self.y, -self.z)
+
+    def norm(self):
+        return math.sqrt(self.w**2 + self.x**2 + self.y**2 + self.z**2)
+
+    def normalized(self):
+        n = self.norm()
+        if n == 0:
+            return Quaternion()
+        return Quaternion(self.w / n, self.x / n, self.y / n, self.z / n)
+
+    def rotate(self, vector):
+        """Поворачивает вектор или точку (w сохраняется)"""
+        # v + 2w (u x v) + 2 u x (u x v), u - векторная часть
+        w, x, y, z = self.w, self.x, self.y, self.z
+        vx, vy, vz = vector.x, vector.y, vector.z
+        tx = 2 * (y * vz - z * vy)
+        ty = 2 * (z * vx - x * vz)
+        tz = 2 * (x * vy - y * vx)
+        return Vector3D(
+            vx + w * tx + y * tz - z * ty,
+            vy + w * ty + z * tx - x * tz,
+            vz + w * tz + x * ty - y * tx,
+            vector.w,
+        )
+
+    def to_matrix(self):
+        w, x, y, z = self.w, self.x, self.y, self.z
+        xx, yy, zz = x * x, y * y, z * z
+        xy, xz, yz = x * y, x * z, y * z
+        wx, wy, wz = w * x, w * y, w * z
+        return Matrix4x4(
+            (
+                1 - 2 * (yy + zz), 2 * (xy - wz), 2 * (xz + wy), 0.0,
+                2 * (xy + wz), 1 - 2 * (xx + zz), 2 * (yz - wx), 0.0,
+                2 * (xz - wy), 2 * (yz + wx), 1 - 2 * (xx + yy), 0.0,
+                0.0, 0.0, 0.0, 1.0,
+            ),
+            True,
+        )  # fmt: skip
+
+
+_IDENTITY = (
+    1.0, 0.0, 0.0, 0.0,
+    0.0, 1.0, 0.0, 0.0,
+    0.0, 0.0, 1.0, 0.0,
+    0.0, 0.0, 0.0, 1.0,
+)  # fmt: skip
+
 
 class Matrix4x4:
-    def __init__(self):
-        # Создаем единичную матрицу (Identity)
-        self.m = [[0.0] * 4 for _ in range(4)]
-        for i in range(4):
-            self.m[i][i] = 1.0
+    """
+    Матрица 4x4 в плоском списке из 16 чисел по строкам: элемент (i, j)
+    лежит в values[4 * i + j]. Флаг affine означает, что нижняя строка
+    равна (0, 0, 0, 1): тогда w-строку можно не считать.
+    """
+
+    __slots__ = ("values", "affine")
+
+    def __init__(self, values=None, affine=None):
+        # Без аргументов - единичная матрица (Identity)
+        self.values = list(_IDENTITY if values is None else values)
+        if affine is None:
+            affine = self.values[12:] == [0, 0, 0, 1]
+        self.affine = affine
+
+    @classmethod
+    def from_rows(cls, rows):
+        return cls([value for row in rows for value in row])
+
+    def rows(self):
+        v = self.values
+        return [v[0:4], v[4:8], v[8:12], v[12:16]]
+
+    def __getitem__(self, index):
+        i, j = index
+        return self.values[4 * i + j]
+
+    def __eq__(self, other):
+        return isinstance(other, Matrix4x4) and self.values == other.values
+
+    def __repr__(self):
+        return f"Matrix4x4({self.rows()})"
+
+    def to_numpy(self):
+        return np.array(self.values, dtype=np.float64).reshape(4, 4)
 
     def __mul__(self, other):
+        v = self.values
         if isinstance(other, Vector3D):
             # Полноценное умножение 4x4 на 1x4
             # Заметь: теперь везде умножаем на other.w!
-            x = (
-                self.m[0][0] * other.x
-                + self.m[0][1] * other.y
-                + self.m[0][2] * other.z
-                + self.m[0][3] * other.w
-            )
-
-            y = (
-                self.m[1][0] * other.x
-                + self.m[1][1] * other.y
-                + self.m[1][2] * other.z
-                + self.m[1][3] * other.w
-            )
-
-            z = (
-                self.m[2][0] * other.x
-                + self.m[2][1] * other.y
-                + self.m[2][2] * other.z
-                + self.m[2][3] * other.w
-            )
-
-            w = (
-                self.m[3][0] * other.x
-                + self.m[3][1] * other.y
-                + self.m[3][2] * other.z
-                + self.m[3][3] * other.w
-            )
+            ox, oy, oz, ow = other.x, other.y, other.z, other.w
+            x = v[0] * ox + v[1] * oy + v[2] * oz + v[3] * ow
+            y = v[4] * ox + v[5] * oy + v[6] * oz + v[7] * ow
+            z = v[8] * ox + v[9] * oy + v[10] * oz + v[11] * ow
+            if self.affine:
+                # Нижняя строка (0, 0, 0, 1): w не меняется
+                w = ow
+            else:
+                w = v[12] * ox + v[13] * oy + v[14] * oz + v[15] * ow
 
             # Делаем перспективное деление только если w не 1 и не 0
             if w != 0 and w != 1:
@@ -89,52 +338,212 @@ class Matrix4x4:
 
         elif isinstance(other, Matrix4x4):
             # Склеивание двух трансформаций в одну
-            res = Matrix4x4()
-            for i in range(4):
-                for j in range(4):
-                    res.m[i][j] = sum(self.m[i][k] * other.m[k][j] for k in range(4))
-            return res
+            b = other.values
+            if self.affine and other.affine:
+                # У обеих нижняя строка (0, 0, 0, 1): считаются только
+                # три верхние строки, а нулевые слагаемые пропускаются
+                values = []
+                for i in (0, 4, 8):
+                    a0, a1, a2, a3 = v[i], v[i + 1], v[i + 2], v[i + 3]
+                    values += (
+                        a0 * b[0] + a1 * b[4] + a2 * b[8],
+                        a0 * b[1] + a1 * b[5] + a2 * b[9],
+                        a0 * b[2] + a1 * b[6] + a2 * b[10],
+                        a0 * b[3] + a1 * b[7] + a2 * b[11] + a3,
+                    )
+                values += (0.0, 0.0, 0.0, 1.0)
+                return Matrix4x4(values, True)
+            return Matrix4x4(
+                [
+                    v[i] * b[j]
+                    + v[i + 1] * b[j + 4]
+                    + v[i + 2] * b[j + 8]
+                    + v[i + 3] * b[j + 12]
+                    for i in (0, 4, 8, 12)
+                    for j in range(4)
+                ]
+            )
+
+        elif isinstance(other, Vector3DArray):
+            return other.transform(self)
+
+        elif isinstance(other, np.ndarray):
+            return self.transform_points(other)
+
+        return NotImplemented
+
+    def transform_points(self, points, w=1):
+        """Умножение на массив точек (N, 3) (w = 1) или векторов (w = 0)"""
+        return Vector3DArray(points, w).transform(self).data
+
+    def inverse(self):
+        """Обратная матрица; для аффинной обращается только блок 3x3"""
+        m = self.to_numpy()
+        if not self.affine:
+            return Matrix4x4(np.linalg.inv(m).ravel().tolist(), False)
+        # (R | t)^-1 = (R^-1 | -R^-1 t)
+        result = np.eye(4)
+        result[:3, :3] = np.linalg.inv(m[:3, :3])
+        result[:3, 3] = -result[:3, :3] @ m[:3, 3]
+        return Matrix4x4(result.ravel().tolist(), True)
+
+    def inverse_transpose(self):
+        """
+        Матрица для нормалей: (M^-1)^T верхнего блока 3x3. В отличие от
+        самой M, сохраняет перпендикулярность нормали к грани при
+        неравномерном масштабе.
+        """
+        result = np.eye(4)
+        result[:3, :3] = np.linalg.inv(self.to_numpy()[:3, :3]).T
+        return Matrix4x4(result.ravel().tolist(), True)
 
     @staticmethod
     def translation(x, y, z):
-        mat = Matrix4x4()
-        mat.m[0][3] = x  # Тот самый "оранжевый столбец"
-        mat.m[1][3] = y
-        mat.m[2][3] = z
-        return mat
+        return Matrix4x4(
+            (
+                1.0, 0.0, 0.0, x,  # Тот самый "оранжевый столбец"
+                0.0, 1.0, 0.0, y,
+                0.0, 0.0, 1.0, z,
+                0.0, 0.0, 0.0, 1.0,
+            ),
+            True,
+        )  # fmt: skip
 
     @staticmethod
     def rotation_x(angle):
-        mat = Matrix4x4()
         rad = math.radians(angle)
         c, s = math.cos(rad), math.sin(rad)
         # Ось X остается неподвижной (1, 0, 0), меняются Y и Z
-        mat.m[1][1], mat.m[1][2] = c, -s
-        mat.m[2][1], mat.m[2][2] = s, c
-        return mat
+        return Matrix4x4(
+            (
+                1.0, 0.0, 0.0, 0.0,
+                0.0, c, -s, 0.0,
+                0.0, s, c, 0.0,
+                0.0, 0.0, 0.0, 1.0,
+            ),
+            True,
+        )  # fmt: skip
 
     @staticmethod
     def rotation_y(angle):
-        mat = Matrix4x4()
         rad = math.radians(angle)
         c, s = math.cos(rad), math.sin(rad)
         # Ось Y остается неподвижной (0, 1, 0), меняются X и Z
-        mat.m[0][0], mat.m[0][2] = c, s
-        mat.m[2][0], mat.m[2][2] = -s, c
-        return mat
+        return Matrix4x4(
+            (
+                c, 0.0, s, 0.0,
+                0.0, 1.0, 0.0, 0.0,
+                -s, 0.0, c, 0.0,
+                0.0, 0.0, 0.0, 1.0,
+            ),
+            True,
+        )  # fmt: skip
 
     @staticmethod
     def rotation_z(angle):
-        mat = Matrix4x4()
         rad = math.radians(angle)
         c, s = math.cos(rad), math.sin(rad)
         # Ось Z остается неподвижной (0, 0, 1), меняются X и Y
-        mat.m[0][0], mat.m[0][1] = c, -s
-        mat.m[1][0], mat.m[1][1] = s, c
-        return mat
+        return Matrix4x4(
+            (
+                c, -s, 0.0, 0.0,
+                s, c, 0.0, 0.0,
+                0.0, 0.0, 1.0, 0.0,
+                0.0, 0.0, 0.0, 1.0,
+            ),
+            True,
+        )  # fmt: skip
 
     @staticmethod
     def scaling(sx, sy, sz):
-        mat = Matrix4x4()
-        mat.m[0][0], mat.m[1][1], mat.m[2][2] = sx, sy, sz
-        return mat
+        return Matrix4x4(
+            (
+                sx, 0.0, 0.0, 0.0,
+                0.0, sy, 0.0, 0.0,
+                0.0, 0.0, sz, 0.0,
+                0.0, 0.0, 0.0, 1.0,
+            ),
+            True,
+        )  # fmt: skip
+
+    @staticmethod
+    def from_trs(translation, rotation, scale=(1.0, 1.0, 1.0)):
+        """
+        Матрица T * R * S: масштаб по осям (отрицательный - отражение),
+        затем поворот кватернионом и перенос.
+        """
+        r = rotation.to_matrix().values
+        sx, sy, sz = scale
+        tx, ty, tz = translation.x, translation.y, translation.z
+        return Matrix4x4(
+            (
+                r[0] * sx, r[1] * sy, r[2] * sz, tx,
+                r[4] * sx, r[5] * sy, r[6] * sz, ty,
+                r[8] * sx, r[9] * sy, r[10] * sz, tz,
+                0.0, 0.0, 0.0, 1.0,
+            ),
+            True,
+        )  # fmt: skip
+
+    def decompose(self):
+        """
+        Обратное к from_trs для аффинной матрицы без сдвига: возвращает
+        (перенос, кватернион, масштаб). Отражение (det < 0) уходит в знак
+        масштаба по X.
+        """
+        v = self.values
+        columns = [(v[j], v[4 + j], v[8 + j]) for j in range(3)]
+        scale = [math.sqrt(a * a + b * b + c * c) for a, b, c in columns]
+        if np.linalg.det(self.to_numpy()[:3, :3]) < 0:
+            scale[0] = -scale[0]
+        rotation = [0.0] * 16
+        for j, (column, s) in enumerate(zip(columns, scale)):
+            for i in range(3):
+                rotation[4 * i + j] = column[i] / s if s else float(i == j)
+        rotation[15] = 1.0
+        return (
+            Vector3D(v[3], v[7], v[11], 0),
+            Quaternion.from_matrix(Matrix4x4(rotation, True)),
+            tuple(scale),
+        )
+
+    @staticmethod
+    def look_at(eye, target, up=None):
+        """
+        Матрица вида: камера в eye смотрит на target. Как и в сцене,
+        взгляд идет вдоль +Z камеры, X - вправо, Y - вверх.
+        """
+        if up is None:
+            up = Vector3D(0, 1, 0, 0)
+        forward = (target - eye).normalized()
+        right = up.cross(forward).normalized()
+        true_up = forward.cross(right)
+        rotation = Matrix4x4(
+            (
+                right.x, right.y, right.z, 0.0,
+                true_up.x, true_up.y, true_up.z, 0.0,
+                forward.x, forward.y, forward.z, 0.0,
+                0.0, 0.0, 0.0, 1.0,
+            ),
+            True,
+        )  # fmt: skip
+        return rotation * Matrix4x4.translation(-eye.x, -eye.y, -eye.z)
+
+    @staticmethod
+    def perspective(fov_y, aspect, near, far):
+        """
+        Перспективная проекция для камеры, смотрящей вдоль +Z:
+        после деления на w = z видимый объем переходит в куб [-1, 1].
+        """
+        f = 1 / math.tan(math.radians(fov_y) / 2)
+        a = (far + near) / (far - near)
+        b = -2 * far * near / (far - near)
+        return Matrix4x4(
+            (
+                f / aspect, 0.0, 0.0, 0.0,
+                0.0, f, 0.0, 0.0,
+                0.0, 0.0, a, b,
+                0.0, 0.0, 1.0, 0.0,
+            ),
+            False,
+        )  # fmt: skip
@@ -1,11 +1,20 @@
 from enum import Enum
 
-from PySide6.QtCore import Qt, QPoint, QPointF
+import numpy as np
+from PySide6.QtCore import Qt, QPoint, QPointF, QLineF
 from PySide6.QtGui import QColor, QPainter, QPen, QBrush, QPolygonF
 from PySide6.QtWidgets import QWidget
 
-from lab2_math import Vector3D, Matrix4x4
+from lab2_math import Vector3D, Vector3DArray, Matrix4x4
 from lab2_letters import Letter3D
+from lab2_geometry import Frustum
+from lab2_clipping import clip_polygons, clip_segments, points_inside
+from lab2_depth_sort import DepthSorter
+
+# Ближняя плоскость отсечения в координатах камеры
+NEAR_PLANE = 1.0
+# Запас за краями экрана при отсечении граней, в пикселях
+CLIP_MARGIN = 2
 
 
 class DisplayMode(Enum):
@@ -20,6 +29,69 @@ class ShadingMode(Enum):
     PHONG = "Phong"
 
 
+class StageCache:
+    """
+    Кэш одного этапа конвейера: значение, ключ состояния, от которого
+    оно зависит, и собственный флаг устаревания. Значение пересчитывается,
+    если флаг поднят или ключ изменился; version растет при каждом пересчете,
+    чтобы следующие этапы могли включить его в свой ключ.
+    """
+
+    def __init__(self):
+        self.value = None
+        self.key = None
+        self.dirty = True
+        self.version = 0
+
+    def get(self, key, compute):
+        if self.dirty or key != self.key:
+            self.value = compute()
+            self.key = key
+            self.dirty = False
+            self.version += 1
+        return self.value
+
+    def invalidate(self):
+        self.dirty = True
+
+
+def _matrix_key(matrix):
+    return tuple(matrix.values)
+
+
+def _vector_key(vector):
+    return (vector.x, vector.y, vector.z)
+
+
+def _face_means(corners):
+    """
+    Центры граней (F, k, 3) -> (F, 3). Вершины складываются по порядку,
+    как при суммировании Vector3D, чтобы результат совпадал до бита.
+    """
+    total = corners[:, 0].copy()
+    for j in range(1, corners.shape[1]):
+        total += corners[:, j]
+    return total / corners.shape[1]
+
+
+def _color_groups(colors):
+    """
+    Номера элементов по цветам (N, 3): пары (QColor, номера) в порядке
+    первого появления цвета, чтобы рисовать каждую группу одним вызовом.
+    """
+    if not len(colors):
+        return []
+    colors = np.asarray(colors, dtype=np.int64)
+    packed = colors[:, 0] << 16 | colors[:, 1] << 8 | colors[:, 2]
+    _, first, inverse = np.unique(packed, return_index=True, return_inverse=True)
+    order = np.argsort(inverse, kind="stable")
+    groups = np.split(order, np.cumsum(np.bincount(inverse))[:-1])
+    return [
+        (QColor(*colors[first[number]].tolist()), groups[number])
+        for number in np.argsort(first).tolist()
+    ]
+
+
 class SceneWidget(QWidget):
     def __init__(self):
         super().__init__()
@@ -30,6 +102,7 @@ class SceneWidget(QWidget):
 
         self.d_letter = Letter3D(100, 60, 30, offset_x=-60, letter_type="Д")
         self.b_letter = Letter3D(100, 60, 30, offset_x=60, letter_type="Б")
+        self.letters = [self.d_letter, self.b_letter]
 
         self.camera_pos = Vector3D(0, 0, -500, 1)
         self.camera_rot = [0, 0, 0]  # углы Эйлера
@@ -37,17 +110,27 @@ class SceneWidget(QWidget):
 
         self.display_mode = DisplayMode.FILLED
         self.shading_mode = ShadingMode.MONO
-        self.cache_valid = False
+
+        # Кэши этапов: модель -> мир для каждой буквы,
+        # мир -> камера/экран (с сортировкой), освещение граней
+        # и точки/ребра для режимов точек и каркаса
+        self.world_caches = {}
+        self.projection_cache = StageCache()
+        self.shading_cache = StageCache()
+        self.batch_cache = StageCache()
         self.cached_faces = []
+        # Порядок букв по глубине, чинится от кадра к кадру
+        self.depth_sorter = DepthSorter()
+        # Сколько букв отброшено пирамидой видимости в последнем кадре
+        self.culled_count = 0
 
     def reset_view(self):
         self.camera_pos = Vector3D(0, 0, -500, 1)
         self.camera_rot = [0, 0, 0]
 
-        self.d_letter.transform = Matrix4x4()
-        self.b_letter.transform = Matrix4x4()
-        self.d_letter.scale = 1.0
-        self.b_letter.scale = 1.0
+        for letter in self.letters:
+            letter.reset_transform()
+            letter.scale = 1.0
 
         self.light_pos = Vector3D(200, 200, -300, 1)
 
@@ -58,7 +141,49 @@ class SceneWidget(QWidget):
         self.update()
 
     def invalidate_cache(self):
-        self.cache_valid = False
+        """Сбрасывает все этапы"""
+        for cache in self.world_caches.values():
+            cache.invalidate()
+        self.projection_cache.invalidate()
+        self.shading_cache.invalidate()
+        self.batch_cache.invalidate()
+
+    def invalidate_letter(self, letter):
+        """Изменилась геометрия или трансформация одной буквы"""
+        self._world_cache(letter).invalidate()
+
+    def invalidate_camera(self):
+        """Изменилась камера: мировые координаты граней остаются в силе"""
+        self.projection_cache.invalidate()
+        self.batch_cache.invalidate()
+
+    def invalidate_shading(self):
+        """Изменился свет: пересчитывается только освещение"""
+        self.shading_cache.invalidate()
+
+    def _world_cache(self, letter):
+        cache = self.world_caches.get(letter)
+        if cache is None:
+            cache = self.world_caches[letter] = StageCache()
+        return cache
+
+    def world_geometry(self, letter):
+        """
+        Этап модель -> мир: вершины буквы в мировых координатах,
+        индексы граней, сами грани и знак определителя матрицы буквы
+        (-1 после отражения: обход вершин граней меняется на обратный).
+        """
+        key = (letter.geometry_version, _matrix_key(letter.transform), letter.scale)
+        return self._world_cache(letter).get(
+            key, lambda: self._transform_letter(letter)
+        )
+
+    @staticmethod
+    def _transform_letter(letter):
+        positions = letter.get_world_positions()
+        faces = letter.get_transformed_faces(positions)
+        orientation = np.sign(np.linalg.det(letter.world_matrix().to_numpy()[:3, :3]))
+        return positions, letter.face_indices, faces, orientation
 
     def _camera_matrix(self):
         rot_x = Matrix4x4.rotation_x(self.camera_rot[0])
@@ -71,123 +196,361 @@ class SceneWidget(QWidget):
         return rotation * translation
 
     def prepare_faces_cache(self):
+        """
+        Возвращает грани в порядке вывода (от дальних к ближним),
+        пересчитывая только устаревшие этапы.
+        """
+        letters, world, key = self._world_stage()
+        self.cached_faces = self.projection_cache.get(
+            key, lambda: self._project_faces(letters, world)
+        )
+        return self.cached_faces
+
+    def prepare_batches(self):
+        """
+        Точки или ребра видимых граней, сгруппированные по цвету
+        (режимы точек и каркаса), с тем же ключом, что и у граней.
+        """
+        letters, world, key = self._world_stage()
+        return self.batch_cache.get(
+            key + (self.display_mode,),
+            lambda: self._project_batches(letters, world),
+        )
+
+    def _world_stage(self):
+        """Видимые буквы, их мировая геометрия и ключ этапа проекции"""
+        # Буквы вне пирамиды видимости отбрасываются до перевода вершин в мир
+        letters = self.visible_letters()
+        self.culled_count = len(self.letters) - len(letters)
+        world = [self.world_geometry(letter) for letter in letters]
+        # Кэши удаленных из сцены букв больше не нужны
+        for letter in list(self.world_caches):
+            if letter not in self.letters:
+                del self.world_caches[letter]
+
+        key = (
+            _vector_key(self.camera_pos),
+            tuple(self.camera_rot),
+            self.width(),
+            self.height(),
+            tuple(
+                (id(letter), self._world_cache(letter).version) for letter in letters
+            ),
+        )
+        return letters, world, key
+
+    def view_frustum(self):
+        """
+        Пирамида видимости для проекции из _project_faces: на экран попадает
+        |x| <= z * (width / 2) * aspect / 500 и |y| <= z * (height / 2) / 500
+        при z >= NEAR_PLANE. Края взяты с запасом CLIP_MARGIN пикселей, чтобы
+        ребра, появившиеся при отсечении, не попадали в кадр.
+        """
         width, height = self.width(), self.height()
-        self.cached_faces = []
+        if width <= 0 or height <= 0:
+            return None
+        aspect = width / height
+        return Frustum.from_slopes(
+            (width / 2 + CLIP_MARGIN) * aspect / 500,
+            (height / 2 + CLIP_MARGIN) / 500,
+            NEAR_PLANE,
+        )
 
+    def _clip_planes(self):
+        frustum = self.view_frustum()
+        if frustum is None:
+            return np.array([(0.0, 0.0, 1.0, -NEAR_PLANE)])
+        return frustum.planes
+
+    def visible_letters(self):
+        """
+        Буквы, чьи ограничивающие сфера и AABB задевают пирамиду видимости.
+        Проверка идет по матрицам букв, без перевода вершин.
+        """
+        frustum = self.view_frustum()
+        if frustum is None or not self.letters:
+            return list(self.letters)
         camera_mat = self._camera_matrix()
-        aspect = width / height if height != 0 else 1
-
-        for letter in [self.d_letter, self.b_letter]:
-            faces = letter.get_transformed_faces()
-            for face in faces:
-                if not face.is_visible(self.camera_pos):
-                    continue
-
-                screen_points = []
-                face_vertices = face.vertices
-                face_vertices_cam = []
-
-                for v in face_vertices:
-                    v_cam = camera_mat * v
-                    face_vertices_cam.append(v_cam)
-                    if v_cam.z <= 0:
-                        continue  # Отсекаем то, что за камерой
-
-                    factor = 500 / v_cam.z
-                    px = (v_cam.x * factor) / aspect + width / 2
-                    # px = v_cam.x * factor + width / 2
-                    py = -v_cam.y * factor + height / 2  # Инвертируем Y для экрана
-                    screen_points.append(QPointF(px, py))
-
-                if len(screen_points) < 3:
-                    continue
-
-                center_cam = Vector3D(0, 0, 0, 1)
-                for v_cam in face_vertices_cam:
-                    center_cam += v_cam
-                center_cam = Vector3D(
-                    center_cam.x / len(face_vertices_cam),
-                    center_cam.y / len(face_vertices_cam),
-                    center_cam.z / len(face_vertices_cam),
-                    1,
-                )
-                avg_z = center_cam.z
-                self.cached_faces.append(
-                    {
-                        "depth": avg_z,
-                        "face": face,
-                        "polygon": QPolygonF(screen_points),
-                        "center": center_cam,
-                    }
-                )
-
-        self.cached_faces.sort(key=lambda x: x["depth"])
+        matrices = np.stack(
+            [(camera_mat * letter.world_matrix()).to_numpy() for letter in self.letters]
+        )
+        outside = frustum.cull(
+            matrices,
+            np.array([letter.bounding_center for letter in self.letters]),
+            np.array([letter.bounding_radius for letter in self.letters]),
+            np.array([letter.aabb_min for letter in self.letters]),
+            np.array([letter.aabb_max for letter in self.letters]),
+        )
+        return [
+            letter for letter, out in zip(self.letters, outside.tolist()) if not out
+        ]
+
+    def _frame_arrays(self, world):
+        """
+        Все буквы кадра в общих массивах: индексы граней со сдвигом на вершины
+        предыдущих букв, маска граней, смотрящих на камеру, и вершины
+        в координатах камеры.
+        """
+        camera_mat = self._camera_matrix()
+        offsets = np.cumsum([0] + [len(geometry[0]) for geometry in world])
+        positions = Vector3DArray(
+            np.concatenate([geometry[0].data for geometry in world])
+        )
+        face_indices = np.concatenate(
+            [geometry[1] + offset for geometry, offset in zip(world, offsets)]
+        )
+        orientation = np.concatenate(
+            [np.full(len(geometry[1]), geometry[3]) for geometry in world]
+        )
 
-    def paintEvent(self, event):
-        painter = QPainter(self)
-        painter.setRenderHint(QPainter.Antialiasing)
+        # Отсечение невидимых граней (Back-face culling) сразу для всего кадра:
+        # грань видна, если нормаль смотрит против направления взгляда.
+        # У отраженных букв нормаль по обходу вершин смотрит внутрь
+        corners = positions.data[face_indices]
+        normals = (
+            Vector3DArray(corners[:, 1] - corners[:, 0], 0)
+            .cross(corners[:, 2] - corners[:, 0])
+            .normalized()
+        )
+        view_dirs = (Vector3DArray(_face_means(corners)) - self.camera_pos).normalized()
+        visible = normals.dot(view_dirs) * orientation < 0
 
-        painter.fillRect(self.rect(), QColor(30, 30, 30))
+        vertices_cam = positions.transform(camera_mat).data
+        return offsets, face_indices, visible, vertices_cam
 
-        if not self.cache_valid:
-            self.prepare_faces_cache()
-            self.cache_valid = True
+    def _project_points(self, points):
+        """Проекция точек камеры (..., 3) на экран (..., 2)"""
+        width, height = self.width(), self.height()
+        aspect = width / height if height != 0 else 1
+        factor = 500 / points[..., 2]
+        screen = np.empty(points.shape[:-1] + (2,))
+        screen[..., 0] = (points[..., 0] * factor) / aspect + width / 2
+        # Инвертируем Y для экрана
+        screen[..., 1] = -points[..., 1] * factor + height / 2
+        return screen
+
+    def _project_faces(self, letters, world):
+        """
+        Этап мир -> камера/экран: порядок вывода, отсечение и проекция.
+
+        Грани не сортируются по глубине: BSP-дерево каждой буквы обходится
+        от дальних кусков граней к ближним из положения камеры в координатах
+        дерева, куски, повернутые к камере спиной, при этом пропускаются.
+        По глубине центра упорядочиваются только сами буквы - они не
+        проникают друг в друга; порядок прошлого кадра при этом чинится,
+        а не строится заново.
+        """
+        if not world:
+            return []
+        camera_mat = self._camera_matrix()
+        faces = [face for geometry in world for face in geometry[2]]
+        orientation = [geometry[3] for geometry in world for _ in geometry[2]]
+        face_offsets = np.cumsum([0] + [len(geometry[1]) for geometry in world])
+
+        pieces, depths = [], []
+        for letter, face_offset in zip(letters, face_offsets.tolist()):
+            tree = letter.bsp_tree()
+            matrix = (camera_mat * letter.world_matrix()).to_numpy()
+            rotation, translation = matrix[:3, :3], matrix[:3, 3]
+            depths.append(rotation[2] @ letter.bounding_center + translation[2])
+            # Дерево - в координатах относительно bsp_origin буквы
+            translation = translation + rotation @ letter.bsp_origin()
+            # Камера (начало координат) в координатах дерева
+            order = tree.back_to_front(np.linalg.solve(rotation, -translation))
+            pieces.append(
+                (
+                    tree.polygons[order] @ rotation.T + translation,
+                    tree.counts[order],
+                    tree.faces[order] + face_offset,
+                )
+            )
+
+        ordered = [pieces[i] for i in self.depth_sorter.sort(depths).tolist()]
+        size = max(polygons.shape[1] for polygons, _, _ in ordered)
+        polygons = np.concatenate(
+            [
+                np.concatenate(
+                    (part, np.repeat(part[:, :1], size - part.shape[1], axis=1)),
+                    axis=1,
+                )
+                for part, _, _ in ordered
+            ]
+        )
+        counts = np.concatenate([part for _, part, _ in ordered])
+        sources = np.concatenate([part for _, _, part in ordered])
+
+        # Куски обрезаются по ближней плоскости и краям экрана в координатах
+        # камеры с сохранением порядка; целиком вне кадра - отбрасываются
+        polygons, counts, kept = clip_polygons(polygons, counts, self._clip_planes())
+        sources = sources[kept]
+
+        # Центр исходной грани в координатах камеры - для освещения
+        # и глубины куска, как у целых граней
+        vertex_offsets = np.cumsum([0] + [len(geometry[0]) for geometry in world])
+        face_indices = np.concatenate(
+            [geometry[1] + offset for geometry, offset in zip(world, vertex_offsets)]
+        )
+        positions = np.concatenate([geometry[0].data for geometry in world])
+        vertices_cam = Vector3DArray(positions).transform(camera_mat).data
+        centers_cam = _face_means(vertices_cam[face_indices[sources]]).tolist()
+
+        screen = self._project_points(polygons)
+        cached_faces = []
+        rows = zip(sources.tolist(), screen.tolist(), counts.tolist(), centers_cam)
+        for i, polygon, count, (x, y, z) in rows:
+            screen_points = [QPointF(*point) for point in polygon[:count]]
+            cached_faces.append(
+                {
+                    "depth": z,
+                    "face": faces[i],
+                    "polygon": QPolygonF(screen_points),
+                    "center": Vector3D(x, y, z, 1),
+                    "orientation": orientation[i],
+                }
+            )
+        return cached_faces
+
+    def _project_batches(self, letters, world):
+        """
+        Вершины (режим точек) или ребра (каркас) граней, смотрящих на камеру.
+        Списки ребер без повторов строятся в сетке буквы один раз; здесь
+        только отбираются ребра видимых граней, обрезаются и группируются
+        по цвету для одного вызова drawPoints / drawLines на цвет.
+        """
+        if not world:
+            return []
+        offsets, face_indices, visible, vertices_cam = self._frame_arrays(world)
+        face_offsets = np.cumsum([0] + [len(letter.face_indices) for letter in letters])
+        face_colors = np.concatenate([letter.face_colors for letter in letters])
+        visible = np.flatnonzero(visible)
+
+        if self.display_mode == DisplayMode.POINTS:
+            used = np.zeros(len(vertices_cam), dtype=bool)
+            used[face_indices[visible]] = True
+            ids = np.flatnonzero(used)
+            ids = ids[points_inside(vertices_cam[ids], self._clip_planes())]
+            point_faces = np.concatenate(
+                [
+                    letter.point_faces + offset
+                    for letter, offset in zip(letters, face_offsets)
+                ]
+            )
+            screen = self._project_points(vertices_cam[ids]).tolist()
+            return [
+                (color, QPolygonF([QPointF(*screen[i]) for i in group.tolist()]))
+                for color, group in _color_groups(face_colors[point_faces[ids]])
+            ]
+
+        edge_offsets = np.cumsum([0] + [len(letter.edges) for letter in letters])
+        edges = np.concatenate(
+            [letter.edges + offset for letter, offset in zip(letters, offsets)]
+        )
+        face_edges = np.concatenate(
+            [
+                np.where(letter.face_edges >= 0, letter.face_edges + offset, -1)
+                for letter, offset in zip(letters, edge_offsets)
+            ]
+        )
+        edge_faces = np.concatenate(
+            [
+                letter.edge_faces + offset
+                for letter, offset in zip(letters, face_offsets)
+            ]
+        )
+        used = np.zeros(len(edges), dtype=bool)
+        sides = face_edges[visible].ravel()
+        used[sides[sides >= 0]] = True
+        ids = np.flatnonzero(used)
+        starts, ends, kept = clip_segments(
+            vertices_cam[edges[ids, 0]],
+            vertices_cam[edges[ids, 1]],
+            self._clip_planes(),
+        )
+        lines = np.concatenate(
+            (self._project_points(starts), self._project_points(ends)), axis=1
+        ).tolist()
+        return [
+            (color, [QLineF(*lines[i]) for i in group.tolist()])
+            for color, group in _color_groups(face_colors[edge_faces[ids[kept]]])
+        ]
+
+    def shade_faces(self):
+        """Цвета граней с освещением, пересчитываются при смене света"""
+        key = (
+            _vector_key(self.light_pos),
+            self.shading_mode,
+            self.projection_cache.version,
+        )
+        return self.shading_cache.get(key, self._shade_faces)
 
+    def _shade_faces(self):
+        colors = []
         for item in self.cached_faces:
             face = item["face"]
-            poly = item["polygon"]
-
-            if self.display_mode == DisplayMode.POINTS:
-                painter.setPen(QPen(face.color, 1))
-                painter.setBrush(QBrush(face.color))
-
-                for i in range(poly.count()):
-                    point = poly.at(i)
-                    painter.drawEllipse(point, 2, 2)
-
-            elif self.display_mode == DisplayMode.WIREFRAME:
-                painter.setPen(QPen(face.color, 1))
-                painter.setBrush(Qt.NoBrush)
-                painter.drawPolygon(poly)
-
-            elif self.display_mode == DisplayMode.FILLED:
-                normal = face.calculate_normal()
-                light_dir = (self.light_pos - item["center"]).normalized()
-                diffuse = max(0.2, normal.dot(light_dir))
-
-                base = face.color
-                if self.shading_mode == ShadingMode.MONO:
-                    k = diffuse
-                elif self.shading_mode == ShadingMode.GOURAUD:
-                    k = 0.5 + 0.5 * diffuse
-                else:  # PHONG
-                    k = 0.3 + 0.7 * diffuse * diffuse
-
-                k = max(0.0, min(1.0, k))
-                bright_color = QColor(
+            # Нормаль по обходу вершин, у отраженной буквы - развернутая
+            normal = face.calculate_normal() * item["orientation"]
+            light_dir = (self.light_pos - item["center"]).normalized()
+            diffuse = max(0.2, normal.dot(light_dir))
+
+            base = face.color
+            if self.shading_mode == ShadingMode.MONO:
+                k = diffuse
+            elif self.shading_mode == ShadingMode.GOURAUD:
+                k = 0.5 + 0.5 * diffuse
+            else:  # PHONG
+                k = 0.3 + 0.7 * diffuse * diffuse
+
+            k = max(0.0, min(1.0, k))
+            colors.append(
+                QColor(
                     int(base.red() * k),
                     int(base.green() * k),
                     int(base.blue() * k),
                 )
+            )
+        return colors
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.Antialiasing)
+
+        painter.fillRect(self.rect(), QColor(30, 30, 30))
 
-                painter.setPen(QPen(bright_color, 1))
-                painter.setBrush(QBrush(bright_color))
-                painter.drawPolygon(poly)
+        if self.display_mode != DisplayMode.FILLED:
+            self._draw_batches(painter)
+            return
+
+        cached_faces = self.prepare_faces_cache()
+        colors = self.shade_faces()
+        for i, item in enumerate(cached_faces):
+            bright_color = colors[i]
+            painter.setPen(QPen(bright_color, 1))
+            painter.setBrush(QBrush(bright_color))
+            painter.drawPolygon(item["polygon"])
+
+    def _draw_batches(self, painter):
+        """Точки и каркас: каждая вершина и каждое ребро рисуются один раз"""
+        points = self.display_mode == DisplayMode.POINTS
+        for color, items in self.prepare_batches():
+            if points:
+                # Круглое перо толщиной 5 - та же точка радиусом 2 с обводкой
+                painter.setPen(QPen(color, 5, Qt.SolidLine, Qt.RoundCap))
+                painter.drawPoints(items)
+            else:
+                painter.setPen(QPen(color, 1))
+                painter.drawLines(items)
 
     def rotate_scene(self, ax, angle):
-        self.d_letter.rotate(ax, angle)
-        self.b_letter.rotate(ax, angle)
-        self.cache_valid = False
+        for letter in self.letters:
+            letter.rotate(ax, angle)
+            self.invalidate_letter(letter)
         self.update()
 
     def set_mirror(self, axis):
-        if axis == 0:
-            mirror = Matrix4x4.scaling(-1, 1, 1)
-        else:
-            mirror = Matrix4x4.scaling(1, -1, 1)
-        self.d_letter.transform = mirror * self.d_letter.transform
-        self.b_letter.transform = mirror * self.b_letter.transform
-        self.invalidate_cache()
+        signs = (-1, 1, 1) if axis == 0 else (1, -1, 1)
+        for letter in self.letters:
+            letter.mirror(*signs)
+            self.invalidate_letter(letter)
         self.update()
 
     def set_display_mode(self, mode):
@@ -200,10 +563,10 @@ class SceneWidget(QWidget):
 
     def rotate_letter(self, letter_obj, axis, angle):
         letter_obj.rotate(axis, angle)
-        self.invalidate_cache()
+        self.invalidate_letter(letter_obj)
         self.update()
 
     def scale_letter(self, letter_obj, scale_factor):
         letter_obj.set_scale(scale_factor)
-        self.invalidate_cache()
+        self.invalidate_letter(letter_obj)
         self.update()
@@ -292,19 +292,19 @@ class MainWindow(QMainWindow):
 
     def rotate_camera(self, axis, angle):
         self.scene.camera_rot[axis] += angle
-        self.scene.invalidate_cache()
+        self.scene.invalidate_camera()
         self.scene.update()
 
     def zoom_camera(self, value):
         t = (value - 50) / 150.0
         self.scene.camera_pos.z = -(800 - 600 * t)
-        self.scene.invalidate_cache()
+        self.scene.invalidate_camera()
         self.scene.update()
 
     def translate_camera(self, dx, dy):
         self.scene.camera_pos.x += dx
         self.scene.camera_pos.y += dy
-        self.scene.invalidate_cache()
+        self.scene.invalidate_camera()
         self.scene.update()
 
     def rotate_letter(self, letter_obj, axis, angle):
@@ -317,7 +317,7 @@ class MainWindow(QMainWindow):
     def update_letter_param(self, letter_obj, param, value):
         setattr(letter_obj, param, value)
         letter_obj.update_geometry()
-        self.scene.invalidate_cache()
+        self.scene.invalidate_letter(letter_obj)
         self.scene.update()
 
     def update_display(self, mode):
@@ -334,7 +334,7 @@ class MainWindow(QMainWindow):
 
     def update_light_position(self, axis, value):
         setattr(self.scene.light_pos, axis, float(value))
-        self.scene.invalidate_cache()
+        self.scene.invalidate_shading()
         self.scene.update()
 
     def reset_view(self):
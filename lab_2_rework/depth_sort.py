@@ -0,0 +1,42 @@
+import numpy as np
+
+# Доля соседних пар не по порядку, до которой прошлый порядок чинится,
+# а не сортируется заново: дальше адаптивная сортировка проигрывает полной
+REPAIR_LIMIT = 0.25
+# С этого числа ключей полная сортировка - быстрая неустойчивая (quicksort
+# numpy), меньше - устойчивая, чтобы равные глубины не менялись местами
+LARGE_SORT = 4096
+
+
+class DepthSorter:
+    # Порядок от дальних к ближним (глубина по убыванию) с памятью о прошлом
+    # кадре. При плавном движении камеры порядок почти не меняется: прошлая
+    # перестановка проверяется за O(n) и при необходимости чинится
+    # адаптивной сортировкой (timsort в numpy почти линеен на почти
+    # упорядоченных данных). Ключи - float32: для порядка точности хватает,
+    # а памяти и сравнений вдвое меньше
+    def __init__(self):
+        self.order = None
+        # Как получен последний порядок: "kept", "repaired" или "sorted"
+        self.method = None
+
+    def reset(self):
+        self.order = None
+
+    def sort(self, depths):
+        keys = -np.asarray(depths, dtype=np.float32)
+        previous = self.order
+        if previous is not None and len(previous) == len(keys):
+            ordered = keys[previous]
+            descents = np.count_nonzero(ordered[1:] < ordered[:-1])
+            if not descents:
+                self.method = "kept"
+                return previous
+            if descents <= REPAIR_LIMIT * len(keys):
+                self.order = previous[np.argsort(ordered, kind="stable")]
+                self.method = "repaired"
+                return self.order
+        kind = "quicksort" if len(keys) >= LARGE_SORT else "stable"
+        self.order = np.argsort(keys, kind=kind)
+        self.method = "sorted"
+        return self.order
@@ -3,9 +3,13 @@ from enum import Enum
 
 class ShadingMode(Enum):
     MONOTONE = "Монотонное"
+    GOURAUD = "Гуро"
+    PHONG = "Фонг"
 
 
 class DisplayMode(Enum):
     FILLED = "Заливка"
     POINTS = "Точки"
     WIREFRAME = "Каркас"
+    HIDDEN_LINE = "Видимые ребра"
+    ZBUFFER = "Z-буфер"
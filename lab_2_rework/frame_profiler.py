@@ -0,0 +1,84 @@
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+class FrameTiming:
+    # Замеры одного кадра: время этапов в мс (в порядке выполнения)
+    # и счетчики (грани, вершины, ...)
+    def __init__(self, start):
+        self.start = start
+        self.total_ms = 0.0
+        self.stages = {}
+        self.counts = {}
+
+    def as_dict(self):
+        return {
+            "start": self.start,
+            "total_ms": self.total_ms,
+            "stages": dict(self.stages),
+            "counts": dict(self.counts),
+        }
+
+
+class FrameProfiler:
+    # Именованные этапы кадра на perf_counter; хранит последние history кадров
+    def __init__(self, history=240):
+        self.frames = deque(maxlen=history)
+        self._current = None
+
+    def begin_frame(self):
+        self._current = FrameTiming(time.perf_counter())
+
+    def end_frame(self):
+        frame = self._current
+        if frame is None:
+            return None
+        frame.total_ms = (time.perf_counter() - frame.start) * 1000
+        self.frames.append(frame)
+        self._current = None
+        return frame
+
+    @contextmanager
+    def stage(self, name):
+        # Вне кадра (например, вызов из бенчмарка) этап не записывается
+        frame = self._current
+        if frame is None:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            frame.stages[name] = frame.stages.get(name, 0.0) + elapsed
+
+    def count(self, name, value):
+        if self._current is not None:
+            self._current.counts[name] = value
+
+    def frame_timings(self, n=None):
+        frames = list(self.frames)
+        if n is not None:
+            frames = frames[-n:] if n > 0 else []
+        return [frame.as_dict() for frame in frames]
+
+    def last_frame(self):
+        return self.frames[-1] if self.frames else None
+
+    def average_stages(self, n=30):
+        frames = list(self.frames)[-n:]
+        totals = {}
+        for frame in frames:
+            for name, ms in frame.stages.items():
+                totals[name] = totals.get(name, 0.0) + ms
+        return {name: ms / len(frames) for name, ms in totals.items()}
+
+    def fps(self, n=30):
+        # Частота по интервалам между началами кадров, а не по длительности
+        # отрисовки: учитывает и время, когда Qt не вызывал paintEvent
+        frames = list(self.frames)[-n:]
+        if len(frames) < 2:
+            return 0.0
+        elapsed = frames[-1].start - frames[0].start
+        return (len(frames) - 1) / elapsed if elapsed > 0 else 0.0
@@ -0,0 +1,145 @@
+import numpy as np
+
+from rasterizer import _attribute_planes, _setup_triangles
+
+# Размер ячейки грубого буфера глубины в пикселях
+CELL_SIZE = 2
+# Допуск сравнения 1/z: ребро не прячется за соседнюю грань на той же глубине.
+# Кроме доли 1/z, допуск растет с наклоном грани в ячейке (как смещение
+# глубины в теневых картах): центр ячейки лежит в стороне от ребра
+DEPTH_BIAS = 0.005
+# Предел числа проверок на одно ребро
+MAX_SAMPLES = 256
+# Сколько ячеек перебирается за один векторный шаг растеризации
+_CHUNK_CELLS = 1 << 20
+
+
+def feature_edges(
+    camera_vertices, face_indices, edge_adjacent, edge_creases, edge_flips
+):
+    # Ребра-кандидаты кадра: острые и граничные - всегда, гладкие - только
+    # на силуэте, где одна из соседних граней смотрит на камеру, а другая
+    # от нее. Камера в начале координат; сравнивается сторона двух граней,
+    # поэтому общий обход сетки (и отражение) не важен, а несогласованный
+    # обход пары (edge_flips) меняет сравнение на обратное
+    p = camera_vertices[face_indices[:, :3]]
+    normals = np.cross(p[:, 1] - p[:, 0], p[:, 2] - p[:, 0])
+    facing = np.einsum("ij,ij->i", normals, p[:, 0]) < 0
+    turned = facing[edge_adjacent[:, 0]] != facing[edge_adjacent[:, 1]]
+    return np.flatnonzero(edge_creases | (turned != edge_flips))
+
+
+class CoarseDepthBuffer:
+    # Буфер глубины в CELL_SIZE раз грубее окна: в ячейке - наибольшая 1/z
+    # в ее центре, номер грани, которой принадлежит эта точка (-1 - пусто),
+    # и изменение 1/z этой грани на одну ячейку
+    def __init__(self, width, height, cell=CELL_SIZE):
+        self.cell = cell
+        self.width = max(1, -(-width // cell))
+        self.height = max(1, -(-height // cell))
+        self.depth = np.zeros(self.width * self.height)
+        self.faces = np.full(self.width * self.height, -1, dtype=np.int64)
+        self.slopes = np.zeros(self.width * self.height)
+
+    def draw_triangles(self, points, inv_depth, faces):
+        # points (T, 3, 2) - экранные координаты, inv_depth (T, 3) - 1/z,
+        # faces (T,) - номер грани каждого треугольника. Треугольники
+        # группируются по размеру охватывающего квадрата (степени двойки),
+        # каждая группа растеризуется одним векторным проходом
+        if not len(points):
+            return
+        coefficients, boxes = _setup_triangles(
+            points / self.cell, inv_depth, self.width, self.height
+        )
+        planes = _attribute_planes(coefficients, inv_depth, None)
+        slopes = np.hypot(planes[:, 0], planes[:, 1])
+        spans = np.maximum(boxes[:, 1] - boxes[:, 0], boxes[:, 3] - boxes[:, 2])
+        drawn = np.flatnonzero(spans > 0)
+        levels = np.ceil(np.log2(spans[drawn])).astype(np.int64)
+
+        cells, values, owners, owner_slopes = [], [], [], []
+        for level in np.flatnonzero(np.bincount(levels)).tolist():
+            group = drawn[levels == level]
+            side = 1 << level
+            step = max(1, _CHUNK_CELLS // (side * side))
+            offsets = np.arange(side)
+            for start in range(0, len(group), step):
+                ids = group[start : start + step]
+                xs = boxes[ids, 0, None, None] + offsets[None, None, :]
+                ys = boxes[ids, 2, None, None] + offsets[None, :, None]
+                inside = (xs < boxes[ids, 1, None, None]) & (
+                    ys < boxes[ids, 3, None, None]
+                )
+                cx = (xs + 0.5).astype(np.float32)
+                cy = (ys + 0.5).astype(np.float32)
+                weights = coefficients[ids].astype(np.float32)
+                for corner in range(3):
+                    inside &= (
+                        weights[:, corner, 0, None, None] * cx
+                        + weights[:, corner, 1, None, None] * cy
+                        + weights[:, corner, 2, None, None]
+                        >= -1e-6
+                    )
+                triangle, row, column = np.nonzero(inside)
+                x = xs[triangle, 0, column]
+                y = ys[triangle, row, 0]
+                plane = planes[ids[triangle]]
+                cells.append(y * self.width + x)
+                values.append(
+                    plane[:, 0] * (x + 0.5) + plane[:, 1] * (y + 0.5) + plane[:, 2]
+                )
+                owners.append(faces[ids][triangle])
+                owner_slopes.append(slopes[ids][triangle])
+        if not cells:
+            return
+
+        cells = np.concatenate(cells)
+        values = np.concatenate(values)
+        owners = np.concatenate(owners)
+        np.maximum.at(self.depth, cells, values)
+        nearest = np.flatnonzero(values >= self.depth[cells])
+        self.faces[cells[nearest]] = owners[nearest]
+        self.slopes[cells[nearest]] = np.concatenate(owner_slopes)[nearest]
+
+    def visible_segments(self, starts, ends, inv_starts, inv_ends, adjacent):
+        # Отрезки (N, 2) на экране проверяются по ячейкам вдоль них: часть
+        # отрезка видна, если ячейка пуста, занята одной из граней ребра
+        # adjacent (N, 2) или лежит не ближе отрезка. 1/z линейна на экране.
+        # Возвращает начала и концы видимых участков и номера их отрезков
+        count = len(starts)
+        if not count:
+            empty = np.zeros((0, 2))
+            return empty, empty, np.zeros(0, dtype=np.int64)
+        direction = ends - starts
+        lengths = np.sqrt(np.sum(direction**2, axis=1)) / self.cell
+        steps = np.clip(np.ceil(lengths).astype(np.int64), 1, MAX_SAMPLES)
+        segment = np.repeat(np.arange(count), steps)
+        first = np.cumsum(steps) - steps
+        step = np.arange(len(segment)) - first[segment]
+        t = (step + 0.5) / steps[segment]
+
+        points = starts[segment] + t[:, None] * direction[segment]
+        inv_depth = inv_starts[segment] + t * (inv_ends - inv_starts)[segment]
+        xs = np.clip((points[:, 0] // self.cell).astype(np.int64), 0, self.width - 1)
+        ys = np.clip((points[:, 1] // self.cell).astype(np.int64), 0, self.height - 1)
+        cells = ys * self.width + xs
+        owner = self.faces[cells]
+        visible = (
+            (owner < 0)
+            | (owner == adjacent[segment, 0])
+            | (owner == adjacent[segment, 1])
+            | (inv_depth >= self.depth[cells] * (1 - DEPTH_BIAS) - self.slopes[cells])
+        )
+
+        # Видимые участки: от первого видимого шага подряд до последнего
+        last = step == steps[segment] - 1
+        previous = np.concatenate(([False], visible[:-1])) & (step > 0)
+        following = np.concatenate((visible[1:], [False])) & ~last
+        opened = np.flatnonzero(visible & ~previous)
+        closed = np.flatnonzero(visible & ~following)
+        runs = segment[opened]
+        t0 = step[opened] / steps[runs]
+        t1 = (step[closed] + 1) / steps[runs]
+        run_starts = starts[runs] + t0[:, None] * direction[runs]
+        run_ends = starts[runs] + t1[:, None] * direction[runs]
+        return run_starts, run_ends, runs
@@ -0,0 +1,198 @@
+import numpy as np
+
+from math_utils import Matrix4x4
+from letter3d import Letter3D
+
+
+class LetterInstance:
+    # Экземпляр общей сетки буквы: своя матрица, оттенок цвета (множители
+    # R, G, B) и отражение по осям. Вершины сетки не копируются
+    __slots__ = ("mesh", "transform", "tint", "mirror")
+
+    def __init__(self, mesh, transform=None, tint=(1.0, 1.0, 1.0), mirror=None):
+        self.mesh = mesh
+        self.transform = transform if transform is not None else Matrix4x4()
+        self.tint = tint
+        self.mirror = mirror if mirror is not None else (False, False, False)
+
+    def matrix(self):
+        # Сначала отражение в координатах сетки, затем transform
+        if not any(self.mirror):
+            return self.transform
+        sx, sy, sz = (-1 if flag else 1 for flag in self.mirror)
+        return self.transform * Matrix4x4.scaling(sx, sy, sz)
+
+
+class MeshLibrary:
+    # Одна Letter3D на тип буквы и набор параметров, сколько бы
+    # экземпляров ее ни использовало
+    def __init__(self):
+        self.meshes = {}
+
+    def get(self, letter_type, height=100, width=60, depth=30, font_family=None):
+        key = (letter_type, height, width, depth, font_family)
+        mesh = self.meshes.get(key)
+        if mesh is None:
+            mesh = Letter3D(
+                height, width, depth, 0, letter_type, font_family=font_family
+            )
+            self.meshes[key] = mesh
+        return mesh
+
+
+class InstanceGeometry:
+    # Все экземпляры одной сетки после трансформации: массивы (I * V, 3)
+    # вершин и (I * F, ...) граней, индексы граней - внутри этого блока
+    def __init__(
+        self,
+        camera_vertices,
+        face_indices,
+        colors,
+        normals,
+        corner_normals,
+        edges,
+        face_edges,
+        edge_faces,
+        point_faces,
+        edge_adjacent,
+        edge_creases,
+        edge_flips,
+        face_orientation,
+        matrices,
+        culled=0,
+    ):
+        self.camera_vertices = camera_vertices
+        self.face_indices = face_indices
+        self.face_colors = colors
+        self.face_normals = normals
+        self.corner_normals = corner_normals
+        # Ребра и грани для цвета ребер и вершин, индексы - внутри блока
+        self.edges = edges
+        self.face_edges = face_edges
+        self.edge_faces = edge_faces
+        self.point_faces = point_faces
+        self.edge_adjacent = edge_adjacent
+        self.edge_creases = edge_creases
+        self.edge_flips = edge_flips
+        # -1 у граней экземпляров с отражением (det < 0)
+        self.face_orientation = face_orientation
+        # Матрицы (I, 4, 4) из координат сетки в координаты камеры
+        # (обход BSP-дерева сетки)
+        self.matrices = matrices
+        # Сколько экземпляров отброшено: вне пирамиды видимости
+        # или с вырожденной матрицей
+        self.culled = culled
+
+
+def group_instances(instances):
+    # Экземпляры по общей сетке, в порядке первого появления сетки
+    groups = {}
+    for instance in instances:
+        groups.setdefault(id(instance.mesh), (instance.mesh, []))[1].append(instance)
+    return list(groups.values())
+
+
+def transform_instances(mesh, instances, frame_matrix, frustum=None):
+    # Один пакетный проход на сетку: матрицы экземпляров (I, 4, 4)
+    # умножаются на матрицу кадра и применяются ко всем вершинам сразу.
+    # С frustum экземпляры вне пирамиды видимости отбрасываются по
+    # ограничивающим объемам сетки до работы с вершинами
+    local = np.stack([instance.matrix().to_numpy() for instance in instances])
+    world = frame_matrix.to_numpy() @ local
+    tints = np.array([instance.tint for instance in instances], dtype=np.float64)
+
+    culled = 0
+    if frustum is not None:
+        count = len(instances)
+        outside = frustum.cull(
+            world,
+            np.broadcast_to(mesh.bounding_center, (count, 3)),
+            np.full(count, mesh.bounding_radius),
+            np.broadcast_to(mesh.aabb_min, (count, 3)),
+            np.broadcast_to(mesh.aabb_max, (count, 3)),
+        )
+        culled = int(np.count_nonzero(outside))
+        if culled:
+            local, world, tints = local[~outside], world[~outside], tints[~outside]
+
+    # Экземпляр с вырожденной матрицей (нулевой масштаб по оси) сплющен
+    # и не виден, а обратной матрицы для нормалей у него нет: он отбрасывается
+    # вместе с вершинами и гранями
+    blocks = local[:, :3, :3]
+    volume = np.abs(np.linalg.det(blocks))
+    degenerate = volume <= 1e-9 * np.prod(np.linalg.norm(blocks, axis=1), axis=1)
+    if degenerate.any():
+        culled += int(np.count_nonzero(degenerate))
+        local, world, tints = local[~degenerate], world[~degenerate], tints[~degenerate]
+
+    rotation = world[:, :3, :3].transpose(0, 2, 1)
+    camera_vertices = mesh.positions @ rotation + world[:, None, :3, 3]
+
+    count = len(local)
+    face_count, k = mesh.face_indices.shape
+    numbers = np.arange(count, dtype=np.int32)
+    vertex_offsets = numbers * len(mesh.positions)
+    face_offsets = numbers * face_count
+    face_indices = mesh.face_indices[None] + vertex_offsets[:, None, None]
+    edges = mesh.edges[None] + vertex_offsets[:, None, None]
+    # -1 у вырожденных сторон остается -1
+    face_edges = np.where(
+        mesh.face_edges[None] >= 0,
+        mesh.face_edges[None] + (numbers * len(mesh.edges))[:, None, None],
+        -1,
+    )
+    edge_adjacent = np.where(
+        mesh.edge_adjacent[None] >= 0,
+        mesh.edge_adjacent[None] + face_offsets[:, None, None],
+        -1,
+    )
+
+    colors = np.minimum(255, mesh.face_colors[None] * tints[:, None, :])
+
+    # Нормали - в координаты сцены (до object_transform), как у обычных букв:
+    # обратная транспонированная матрица экземпляра. Не нормируются:
+    # освещение все равно нормирует их после object_transform
+    normal_matrices = np.linalg.inv(local[:, :3, :3])
+    normals = mesh.face_normals @ normal_matrices
+    corners = mesh.corner_normals.reshape(-1, 3) @ normal_matrices
+    corner_normals = corners.reshape(count * face_count, k, 3)
+
+    return InstanceGeometry(
+        camera_vertices.reshape(-1, 3),
+        face_indices.reshape(-1, k),
+        colors.reshape(-1, 3).astype(np.uint8),
+        normals.reshape(-1, 3),
+        corner_normals,
+        edges.reshape(-1, 2),
+        face_edges.reshape(-1, k),
+        (mesh.edge_faces[None] + face_offsets[:, None]).ravel(),
+        (mesh.point_faces[None] + face_offsets[:, None]).ravel(),
+        edge_adjacent.reshape(-1, 2),
+        np.tile(mesh.edge_creases, count),
+        np.tile(mesh.edge_flips, count),
+        np.repeat(np.sign(np.linalg.det(world[:, :3, :3])), face_count),
+        world,
+        culled,
+    )
+
+
+def signage_wall(library, text, rows, columns, spacing=(90, 130), tint=None):
+    # Стена из rows x columns букв text (по кругу) в плоскости XY с центром
+    # в начале координат; как и буквы сцены, строка идет от +X к -X, чтобы
+    # после поворота сцены на 180 градусов читаться слева направо.
+    # tint(row, column) задает оттенок буквы
+    instances = []
+    dx, dy = spacing
+    for row in range(rows):
+        for column in range(columns):
+            letter = text[(row * columns + column) % len(text)]
+            x = ((columns - 1) / 2 - column) * dx
+            y = ((rows - 1) / 2 - row) * dy
+            instances.append(
+                LetterInstance(
+                    library.get(letter),
+                    Matrix4x4.translation(x, y, 0),
+                    tint(row, column) if tint else (1.0, 1.0, 1.0),
+                )
+            )
+    return instances
@@ -0,0 +1,70 @@
+import time
+
+from PySide6.QtCore import QObject, QTimer, Qt
+
+from math_utils import Quaternion
+
+DEFAULT_FPS = 60
+
+
+class InteractionScheduler(QObject):
+    # Ввод и анимация применяются не чаще одного раза за кадр:
+    # смещения мыши между тиками таймера складываются и дают один поворот.
+    # Когда нечего применять, таймер останавливается
+    def __init__(self, scene, fps=None):
+        super().__init__(scene)
+        self.scene = scene
+        self.pending_dx = 0.0
+        self.pending_dy = 0.0
+        self.turntable = False
+        self.turntable_speed = 30.0  # градусов в секунду
+        self._last_tick = None
+        self.timer = QTimer(self)
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.timeout.connect(self.tick)
+        self.set_target_fps(fps or DEFAULT_FPS)
+
+    def set_target_fps(self, fps):
+        self.fps = fps
+        self.timer.setInterval(max(1, round(1000 / fps)))
+
+    def add_drag(self, dx, dy):
+        self.pending_dx += dx
+        self.pending_dy += dy
+        self._wake()
+
+    def set_turntable(self, enabled, speed=None):
+        self.turntable = enabled
+        if speed is not None:
+            self.turntable_speed = speed
+        if enabled:
+            self._wake()
+
+    def _wake(self):
+        if not self.timer.isActive():
+            self._last_tick = time.perf_counter()
+            self.timer.start()
+
+    def tick(self):
+        now = time.perf_counter()
+        dt = now - self._last_tick
+        self._last_tick = now
+
+        rotation = None
+        if self.pending_dx or self.pending_dy:
+            speed = self.scene.rotation_speed
+            rot_x = Quaternion.rotation_x(-self.pending_dy * speed)
+            rot_y = Quaternion.rotation_y(self.pending_dx * speed)
+            rotation = rot_y * rot_x
+            self.pending_dx = 0.0
+            self.pending_dy = 0.0
+        if self.turntable:
+            # Поворот по времени, а не по числу тиков: скорость не зависит
+            # от того, успевает ли кадр за таймером
+            spin = Quaternion.rotation_y(self.turntable_speed * dt)
+            rotation = spin if rotation is None else spin * rotation
+
+        if rotation is None:
+            self.timer.stop()
+            return
+        self.scene.rotate_object(rotation)
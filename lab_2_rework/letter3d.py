@@ -1,17 +1,66 @@
-from math_utils import Vector3D
+import numpy as np
+from math_utils import Vector3D, normalize_rows
 from face import Face
+from glyph_mesh import CAP, text_meshes
+from frustum import bounding_volumes
+from bsp import shared_tree
 from PySide6.QtGui import QColor
 
 
 class Letter3D:
-    def __init__(self, height, width, depth, offset_x, letter_type):
+    def __init__(
+        self,
+        height,
+        width,
+        depth,
+        offset_x,
+        letter_type,
+        crease_angle=60.0,
+        font_family=None,
+    ):
         self.height = height
         self.width = width
         self.depth = depth
         self.offset_x = offset_x
+        # "D" и "B" строятся вручную, любая другая строка - по контурам шрифта
         self.letter_type = letter_type
+        self.font_family = font_family
+        # Ребра с углом между гранями больше порога остаются острыми
+        self.crease_angle = crease_angle
         self.vertices = []
         self.faces = []
+        self.positions = np.zeros((0, 3))
+        self.face_indices = np.zeros((0, 4), dtype=np.int32)
+        self.face_colors = np.zeros((0, 3), dtype=np.uint8)
+        self.face_normals = np.zeros((0, 3))
+        self.face_areas = np.zeros(0)
+        self.vertex_face_offsets = np.zeros(1, dtype=np.int32)
+        self.vertex_faces = np.zeros(0, dtype=np.int32)
+        self.vertex_normals = np.zeros((0, 3))
+        self.corner_normals = np.zeros((0, 4, 3))
+        # Уникальные ребра (E, 2), номер ребра у каждой стороны грани (F, k)
+        # и грани, чей цвет получают ребра и вершины в режимах точек и каркаса
+        self.edges = np.zeros((0, 2), dtype=np.int32)
+        self.face_edges = np.zeros((0, 4), dtype=np.int32)
+        self.edge_faces = np.zeros(0, dtype=np.int32)
+        self.point_faces = np.zeros(0, dtype=np.int32)
+        # Для каркаса без невидимых линий: две грани ребра (-1, если грань
+        # одна), острые ребра и ребра, которые соседние грани обходят
+        # в одном направлении (несогласованный обход)
+        self.edge_adjacent = np.zeros((0, 2), dtype=np.int32)
+        self.edge_creases = np.zeros(0, dtype=bool)
+        self.edge_flips = np.zeros(0, dtype=bool)
+        # Ограничивающие объемы в локальных координатах (пересчитываются
+        # вместе с сеткой): AABB и описанная сфера
+        self.aabb_min = np.zeros(3)
+        self.aabb_max = np.zeros(3)
+        self.bounding_center = np.zeros(3)
+        self.bounding_radius = 0.0
+        # Растет при каждой перестройке сетки (ключ кэша кадра в сцене)
+        self.geometry_version = 0
+        # BSP-дерево граней строится при первом запросе и сбрасывается
+        # вместе с сеткой
+        self._bsp_tree = None
         self.update_geometry()
 
     def update_geometry(self):
@@ -24,45 +73,174 @@ class Letter3D:
             self._create_letter_D(h, w, d, ox, bar_thickness)
         elif self.letter_type == "B":
             self._create_letter_B(h, w, d, ox, bar_thickness)
+        else:
+            self._create_text(h, d, ox)
+        self._build_mesh()
+        self._bsp_tree = None
+        self.geometry_version += 1
 
-    def _create_letter_T1(self, h, w, d, ox, bar_thickness):
-        hw = w / 2
-        hd = d / 2
-        vw = w / 6
-        front_top = [
-            Vector3D(ox - hw, h, -hd),
-            Vector3D(ox + hw, h, -hd),
-            Vector3D(ox + hw, h - bar_thickness, -hd),
-            Vector3D(ox - hw, h - bar_thickness, -hd),
-        ]
-        back_top = [
-            Vector3D(ox - hw, h, hd),
-            Vector3D(ox + hw, h, hd),
-            Vector3D(ox + hw, h - bar_thickness, hd),
-            Vector3D(ox - hw, h - bar_thickness, hd),
-        ]
-        front_vert = [
-            Vector3D(ox - vw, h - bar_thickness, -hd),
-            Vector3D(ox + vw, h - bar_thickness, -hd),
-            Vector3D(ox + vw, 0, -hd),
-            Vector3D(ox - vw, 0, -hd),
-        ]
-        back_vert = [
-            Vector3D(ox - vw, h - bar_thickness, hd),
-            Vector3D(ox + vw, h - bar_thickness, hd),
-            Vector3D(ox + vw, 0, hd),
-            Vector3D(ox - vw, 0, hd),
-        ]
-        self.vertices = front_top + back_top + front_vert + back_vert
-        colors = [QColor(255, 140, 0), QColor(255, 165, 0), QColor(255, 127, 80)]
-        self._create_faces_for_part(front_top, back_top, colors)
-        self._create_faces_for_part(front_vert, back_vert, colors)
-        self.faces.append(
-            Face([front_top[2], front_top[3], front_vert[0], front_vert[1]], colors[1])
+    def bsp_tree(self):
+        # Дерево строится в координатах относительно bsp_origin и общее
+        # у букв одной формы с разным offset_x
+        if self._bsp_tree is None:
+            key = (
+                self.letter_type,
+                self.height,
+                self.width,
+                self.depth,
+                self.font_family,
+            )
+            self._bsp_tree = shared_tree(
+                key,
+                self.positions - self.bsp_origin(),
+                self.face_indices,
+                self.face_normals,
+            )
+        return self._bsp_tree
+
+    def bsp_origin(self):
+        return np.array([self.offset_x, 0.0, 0.0])
+
+    def _build_mesh(self):
+        # Индексированная сетка: уникальные позиции (N, 3) и индексы граней (F, k)
+        index_of = {}
+        positions = []
+        face_indices = []
+        for face in self.faces:
+            indices = []
+            for v in face.vertices:
+                key = (v.x, v.y, v.z)
+                if key not in index_of:
+                    index_of[key] = len(positions)
+                    positions.append(key)
+                indices.append(index_of[key])
+            face_indices.append(indices)
+
+        self.positions = np.array(positions, dtype=np.float64).reshape(-1, 3)
+        (
+            self.aabb_min,
+            self.aabb_max,
+            self.bounding_center,
+            self.bounding_radius,
+        ) = bounding_volumes(self.positions)
+        self.face_indices = (
+            np.array(face_indices, dtype=np.int32)
+            if face_indices
+            else np.zeros((0, 4), dtype=np.int32)
         )
-        self.faces.append(
-            Face([back_top[2], back_top[3], back_vert[0], back_vert[1]], colors[1])
+        self.face_colors = np.array(
+            [(f.color.red(), f.color.green(), f.color.blue()) for f in self.faces],
+            dtype=np.uint8,
+        ).reshape(-1, 3)
+
+        # Нормаль Ньюэлла: направление - нормаль грани, длина - удвоенная площадь
+        p = self.positions[self.face_indices]
+        area_normals = np.cross(p, np.roll(p, -1, axis=1)).sum(axis=1)
+        lengths = np.linalg.norm(area_normals, axis=1, keepdims=True)
+        self.face_areas = lengths[:, 0] / 2
+        normals = np.cross(p[:, 1] - p[:, 0], p[:, 2] - p[:, 0])
+        self.face_normals = normalize_rows(normals)
+
+        self._build_adjacency()
+        self._build_edges()
+        self._build_smooth_normals(area_normals)
+
+    def _build_adjacency(self):
+        # Таблица вершина -> грани в CSR-виде: грани вершины v лежат
+        # в vertex_faces[vertex_face_offsets[v]:vertex_face_offsets[v + 1]]
+        face_count, k = self.face_indices.shape
+        corner_vertices = self.face_indices.ravel()
+        corner_faces = np.repeat(np.arange(face_count, dtype=np.int32), k)
+        order = np.argsort(corner_vertices, kind="stable")
+        counts = np.bincount(corner_vertices, minlength=len(self.positions))
+        self.vertex_face_offsets = np.concatenate(([0], np.cumsum(counts))).astype(
+            np.int32
+        )
+        self.vertex_faces = corner_faces[order]
+
+    def _build_edges(self):
+        # Общая сторона соседних граней - одно ребро, в порядке первого
+        # появления; у вырожденных крышек (a, b, c, c) сторона c-c не ребро
+        face_count, k = self.face_indices.shape
+        starts = self.face_indices.ravel()
+        ends = np.roll(self.face_indices, -1, axis=1).ravel()
+        low = np.minimum(starts, ends).astype(np.int64)
+        high = np.maximum(starts, ends).astype(np.int64)
+        keys = np.where(starts != ends, low * len(self.positions) + high, -1)
+        unique, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+        real = unique >= 0
+        order = np.argsort(first[real], kind="stable")
+        first = first[real][order]
+        # Номер ребра для каждой стороны грани, -1 для вырожденных
+        numbers = np.full(len(unique), -1, dtype=np.int32)
+        numbers[np.flatnonzero(real)[order]] = np.arange(len(first), dtype=np.int32)
+
+        self.edges = np.stack((starts[first], ends[first]), axis=1).astype(np.int32)
+        self.face_edges = numbers[inverse].reshape(face_count, k)
+        self.edge_faces = (first // k).astype(np.int32)
+        # Грани вершины отсортированы по номеру: берется первая
+        self.point_faces = self.vertex_faces[self.vertex_face_offsets[:-1]]
+        self._build_edge_adjacency(starts, ends, self.face_edges.ravel())
+
+    def _build_edge_adjacency(self, starts, ends, side_edges):
+        # Первые две стороны граней у каждого ребра. Граничные ребра и ребра
+        # больше чем двух граней считаются острыми, как и ребра с углом
+        # между нормалями больше crease_angle
+        k = self.face_indices.shape[1]
+        edge_count = len(self.edges)
+        sides = np.flatnonzero(side_edges >= 0)
+        sides = sides[np.argsort(side_edges[sides], kind="stable")]
+        counts = np.bincount(side_edges[sides], minlength=edge_count)
+        first = np.cumsum(counts) - counts
+        second = np.where(counts > 1, first + 1, first)
+        first_sides, second_sides = sides[first], sides[second]
+
+        forward = starts < ends
+        self.edge_flips = (counts > 1) & (forward[first_sides] == forward[second_sides])
+        self.edge_adjacent = np.stack(
+            (first_sides // k, np.where(counts > 1, second_sides // k, -1)), axis=1
+        ).astype(np.int32)
+
+        # При несогласованном обходе нормаль второй грани развернута
+        similarity = np.sum(
+            self.face_normals[first_sides // k] * self.face_normals[second_sides // k],
+            axis=1,
         )
+        similarity = np.where(self.edge_flips, -similarity, similarity)
+        cos_crease = np.cos(np.radians(self.crease_angle))
+        self.edge_creases = (counts != 2) | (similarity < cos_crease - 1e-9)
+
+    def _build_smooth_normals(self, area_normals):
+        face_count, k = self.face_indices.shape
+
+        # Сглаженные нормали вершин (без учета порога), взвешенные по площади
+        vertex_sum = np.zeros_like(self.positions)
+        np.add.at(vertex_sum, self.face_indices, area_normals[:, None, :])
+        self.vertex_normals = normalize_rows(vertex_sum)
+
+        # Нормали углов граней: усредняются только соседние грани,
+        # отклоняющиеся от своей грани не больше чем на crease_angle
+        corner_vertices = self.face_indices.ravel()
+        corner_faces = np.repeat(np.arange(face_count), k)
+        starts = self.vertex_face_offsets[corner_vertices]
+        degrees = self.vertex_face_offsets[corner_vertices + 1] - starts
+        pair_corners = np.repeat(np.arange(len(corner_vertices)), degrees)
+        pair_offsets = np.arange(len(pair_corners)) - np.repeat(
+            np.cumsum(degrees) - degrees, degrees
+        )
+        neighbours = self.vertex_faces[np.repeat(starts, degrees) + pair_offsets]
+
+        cos_crease = np.cos(np.radians(self.crease_angle))
+        similarity = np.sum(
+            self.face_normals[corner_faces[pair_corners]]
+            * self.face_normals[neighbours],
+            axis=1,
+        )
+        keep = similarity >= cos_crease - 1e-9
+
+        corner_sum = np.zeros((len(corner_vertices), 3))
+        np.add.at(corner_sum, pair_corners[keep], area_normals[neighbours[keep]])
+        self.corner_normals = normalize_rows(corner_sum).reshape(face_count, k, 3)
 
     def _create_letter_B(self, h, w, d, ox, bar_thickness):
         hw = w / 2
@@ -204,62 +382,39 @@ class Letter3D:
         self._create_faces_for_part(f_right_leg, b_right_leg, colors)
         self._create_faces_for_part(f_top_bar, b_top_bar, colors)
 
-    def _create_letter_V1(self, h, w, d, ox, bar_thickness):
-        hw = w / 2
-        hd = d / 2
-        front_left = [
-            Vector3D(ox - hw, h, -hd),
-            Vector3D(ox - hw + bar_thickness, h, -hd),
-            Vector3D(ox, 0, -hd),
-            Vector3D(ox - bar_thickness, 0, -hd),
-        ]
-        back_left = [
-            Vector3D(ox - hw, h, hd),
-            Vector3D(ox - hw + bar_thickness, h, hd),
-            Vector3D(ox, 0, hd),
-            Vector3D(ox - bar_thickness, 0, hd),
-        ]
-        front_right = [
-            Vector3D(ox + hw - bar_thickness, h, -hd),
-            Vector3D(ox + hw, h, -hd),
-            Vector3D(ox + bar_thickness, 0, -hd),
-            Vector3D(ox, 0, -hd),
-        ]
-        back_right = [
-            Vector3D(ox + hw - bar_thickness, h, hd),
-            Vector3D(ox + hw, h, hd),
-            Vector3D(ox + bar_thickness, 0, hd),
-            Vector3D(ox, 0, hd),
-        ]
-        self.vertices = front_left + back_left + front_right + back_right
-        colors = [QColor(255, 140, 0), QColor(255, 165, 0), QColor(255, 127, 80)]
-        self._create_faces_for_part(front_left, back_left, colors)
-        self._create_faces_for_part(front_right, back_right, colors)
+    def _create_text(self, h, d, ox):
+        # Строка выдавливается из контуров шрифта с центром в ox.
+        # Как и D/B, строится зеркально по X: поворот сцены на 180 градусов
+        # возвращает ее в читаемый вид
+        placed, total = text_meshes(self.letter_type, h, d, self.font_family)
+        colors = [QColor(0, 102, 204), QColor(0, 72, 143)]
+        start = ox - total / 2
+        for mesh, x in placed:
+            points = mesh.positions.copy()
+            points[:, 0] = 2 * ox - (start + x + points[:, 0])
+            vertices = [Vector3D(*p) for p in points.tolist()]
+            self.vertices += vertices
+            for (a, b, c, e), kind in zip(mesh.faces.tolist(), mesh.kinds.tolist()):
+                # Отражение меняет обход граней: (a, b, c, e) -> (c, b, a, e)
+                face = [vertices[c], vertices[b], vertices[a], vertices[e]]
+                self.faces.append(Face(face, colors[0 if kind == CAP else 1]))
 
     def _create_faces_for_part(self, front_vertices, back_vertices, colors):
+        # Контур front_vertices обходится против часовой стрелки, если
+        # смотреть с передней стороны (-Z); задняя крышка - в обратном
+        # порядке, боковые грани - так, чтобы все нормали смотрели наружу.
+        # У прямоугольной части боковые грани 0 и 2 - верх и низ, они
+        # получают свой цвет colors[2]
         self.faces.append(Face(front_vertices, colors[0]))
-        self.faces.append(Face(back_vertices, colors[0]))
-        for i in range(len(front_vertices)):
-            next_i = (i + 1) % len(front_vertices)
+        self.faces.append(Face(back_vertices[::-1], colors[0]))
+        count = len(front_vertices)
+        for i in range(count):
+            next_i = (i + 1) % count
             side_face = [
                 front_vertices[i],
-                front_vertices[next_i],
-                back_vertices[next_i],
                 back_vertices[i],
+                back_vertices[next_i],
+                front_vertices[next_i],
             ]
-            self.faces.append(Face(side_face, colors[1]))
-        if len(front_vertices) >= 4:
-            top_face = [
-                front_vertices[0],
-                front_vertices[1],
-                back_vertices[1],
-                back_vertices[0],
-            ]
-            bottom_face = [
-                front_vertices[2],
-                front_vertices[3],
-                back_vertices[3],
-                back_vertices[2],
-            ]
-            self.faces.append(Face(top_face, colors[2]))
-            self.faces.append(Face(bottom_face, colors[2]))
+            cap = count >= 4 and i in (0, 2)
+            self.faces.append(Face(side_face, colors[2] if cap else colors[1]))
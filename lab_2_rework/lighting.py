@@ -0,0 +1,48 @@
+from functools import lru_cache
+
+import numpy as np
+
+AMBIENT_STRENGTH = 0.2
+DIFFUSE_STRENGTH = 0.8
+SPECULAR_STRENGTH = 0.5
+SHININESS = 32
+SPECULAR_TABLE_SIZE = 1024
+
+
+@lru_cache(maxsize=8)
+def specular_table(shininess, size=SPECULAR_TABLE_SIZE):
+    # Таблица x ** shininess на [0, 1] вместо pow для каждого пикселя
+    table = np.linspace(0, 1, size, dtype=np.float32) ** shininess
+    table.setflags(write=False)
+    return table
+
+
+def phong_intensity(normals, view_dirs, light_dir, use_table=False):
+    # Модель Фонга. Массивы хранятся по компонентам: единичные нормали
+    # и направления на камеру - (3, N), так операции идут по непрерывной памяти
+    cos_theta = light_dir @ normals
+
+    diffuse = DIFFUSE_STRENGTH * cos_theta
+
+    # R = L - 2 (N . L) N, поэтому R . V = L . V - 2 (N . L) (N . V)
+    n_dot_v = np.einsum("ij,ij->j", normals, view_dirs)
+    r_dot_v = light_dir @ view_dirs - 2 * cos_theta * n_dot_v
+    np.clip(r_dot_v, 0, 1, out=r_dot_v)
+    if use_table:
+        table = specular_table(SHININESS)
+        highlight = table[(r_dot_v * (len(table) - 1)).astype(np.intp)]
+    else:
+        highlight = r_dot_v**SHININESS
+    specular = SPECULAR_STRENGTH * highlight
+
+    intensity = np.where(
+        cos_theta < 0, AMBIENT_STRENGTH, AMBIENT_STRENGTH + diffuse + specular
+    )
+
+    return np.clip(intensity, 0.2, 1.0)
+
+
+def normalize_columns(vectors):
+    # Нормирование векторов, хранящихся по компонентам (3, N)
+    lengths = np.sqrt(np.einsum("ij,ij->j", vectors, vectors))
+    return vectors / np.where(lengths > 0, lengths, 1)
@@ -1,3 +1,5 @@
+import os
+
 from PySide6.QtWidgets import (
     QMainWindow,
     QWidget,
@@ -8,6 +10,7 @@ from PySide6.QtWidgets import (
     QLabel,
     QCheckBox,
     QSlider,
+    QSpinBox,
 )
 from PySide6.QtCore import Qt
 from scene_widget import SceneWidget
@@ -55,6 +58,23 @@ class MainWindow(QMainWindow):
         shading_combo.currentTextChanged.connect(self.on_shading_mode_changed)
         control_layout.addWidget(shading_combo)
 
+        # Процессы для растеризации по тайлам (режим Z-буфера)
+        workers_label = QLabel("Процессы растеризации:")
+        control_layout.addWidget(workers_label)
+
+        workers_spin = QSpinBox()
+        workers_spin.setRange(1, os.cpu_count() or 1)
+        workers_spin.valueChanged.connect(self.scene_widget.set_render_workers)
+        control_layout.addWidget(workers_spin)
+
+        turntable_check = QCheckBox("Автовращение")
+        turntable_check.toggled.connect(self.scene_widget.set_turntable)
+        control_layout.addWidget(turntable_check)
+
+        profiler_check = QCheckBox("Профилировщик")
+        profiler_check.toggled.connect(self.scene_widget.set_show_profiler)
+        control_layout.addWidget(profiler_check)
+
         # Зеркальное отображение
         mirror_label = QLabel("Зеркальное отображение:")
         control_layout.addWidget(mirror_label)
@@ -1,6 +1,24 @@
 import math
 
+import numpy as np
+
+_IDENTITY = (
+    1.0, 0.0, 0.0, 0.0,
+    0.0, 1.0, 0.0, 0.0,
+    0.0, 0.0, 1.0, 0.0,
+    0.0, 0.0, 0.0, 1.0,
+)
+
+
+def normalize_rows(vectors):
+    lengths = np.sqrt(np.einsum("...i,...i->...", vectors, vectors))[..., None]
+    return np.divide(vectors, lengths, out=np.zeros_like(vectors), where=lengths > 0)
+
+
 class Vector3D:
+    # Без __dict__: меньше памяти и быстрее доступ к полям
+    __slots__ = ("x", "y", "z")
+
     def __init__(self, x, y, z):
         self.x = x
         self.y = y
@@ -27,74 +45,407 @@ class Vector3D:
     def dot(self, other):
         return self.x * other.x + self.y * other.y + self.z * other.z
 
+    def cross(self, other):
+        return Vector3D(
+            self.y * other.z - self.z * other.y,
+            self.z * other.x - self.x * other.z,
+            self.x * other.y - self.y * other.x
+        )
+
+    def __repr__(self):
+        return f"Vector3D({self.x}, {self.y}, {self.z})"
+
+
+class Vector3DArray:
+    # Набор векторов в одном массиве (N, 3): операции над всем набором сразу,
+    # без объекта Vector3D на вершину
+    __slots__ = ("data",)
+
+    def __init__(self, data):
+        self.data = np.asarray(data, dtype=np.float64).reshape(-1, 3)
+
+    @classmethod
+    def from_vectors(cls, vectors):
+        return cls([(v.x, v.y, v.z) for v in vectors])
+
+    def to_vectors(self):
+        return [Vector3D(x, y, z) for x, y, z in self.data.tolist()]
+
+    def __len__(self):
+        return len(self.data)
+
+    def __getitem__(self, index):
+        if isinstance(index, (int, np.integer)):
+            return Vector3D(*self.data[index].tolist())
+        return Vector3DArray(self.data[index])
+
+    def __add__(self, other):
+        return Vector3DArray(self.data + _components(other))
+
+    def __sub__(self, other):
+        return Vector3DArray(self.data - _components(other))
+
+    def __mul__(self, scalar):
+        # Число или массив (N,) - свой множитель для каждого вектора
+        scalar = np.asarray(scalar)
+        if scalar.ndim == 1:
+            scalar = scalar[:, None]
+        return Vector3DArray(self.data * scalar)
+
+    def lengths(self):
+        return np.sqrt(np.einsum("ij,ij->i", self.data, self.data))
+
+    def normalized(self):
+        return Vector3DArray(normalize_rows(self.data))
+
+    def dot(self, other):
+        other = _components(other)
+        if other.ndim == 1:
+            return self.data @ other
+        return np.einsum("ij,ij->i", self.data, other)
+
+    def cross(self, other):
+        return Vector3DArray(np.cross(self.data, _components(other)))
+
+    def transform(self, matrix):
+        return Vector3DArray(matrix.transform_points(self.data))
+
+
+def _components(other):
+    if isinstance(other, Vector3DArray):
+        return other.data
+    if isinstance(other, Vector3D):
+        return np.array([other.x, other.y, other.z])
+    return np.asarray(other, dtype=np.float64)
+
+
+class Quaternion:
+    # Единичный кватернион поворота (w, x, y, z). Накопленный поворот хранится
+    # так, а не матрицей: после каждого умножения его достаточно нормировать,
+    # и ошибки округления не превращают поворот в сдвиг или масштаб
+    __slots__ = ("w", "x", "y", "z")
+
+    def __init__(self, w=1.0, x=0.0, y=0.0, z=0.0):
+        self.w = w
+        self.x = x
+        self.y = y
+        self.z = z
+
+    @staticmethod
+    def from_axis_angle(axis, angle):
+        axis = axis.normalized()
+        half = math.radians(angle) / 2
+        s = math.sin(half)
+        return Quaternion(math.cos(half), axis.x * s, axis.y * s, axis.z * s)
+
+    @staticmethod
+    def rotation_x(angle):
+        half = math.radians(angle) / 2
+        return Quaternion(math.cos(half), math.sin(half), 0.0, 0.0)
+
+    @staticmethod
+    def rotation_y(angle):
+        half = math.radians(angle) / 2
+        return Quaternion(math.cos(half), 0.0, math.sin(half), 0.0)
+
+    @staticmethod
+    def rotation_z(angle):
+        half = math.radians(angle) / 2
+        return Quaternion(math.cos(half), 0.0, 0.0, math.sin(half))
+
+    @staticmethod
+    def from_matrix(matrix):
+        # Поворот из ортонормированного блока 3x3 (метод Шеппарда: делим
+        # на наибольшую из четырех величин, без потери точности)
+        v = matrix.values
+        m00, m01, m02 = v[0], v[1], v[2]
+        m10, m11, m12 = v[4], v[5], v[6]
+        m20, m21, m22 = v[8], v[9], v[10]
+        trace = m00 + m11 + m22
+        if trace > 0:
+            s = 2 * math.sqrt(trace + 1)
+            q = Quaternion(s / 4, (m21 - m12) / s, (m02 - m20) / s, (m10 - m01) / s)
+        elif m00 > m11 and m00 > m22:
+            s = 2 * math.sqrt(1 + m00 - m11 - m22)
+            q = Quaternion((m21 - m12) / s, s / 4, (m01 + m10) / s, (m02 + m20) / s)
+        elif m11 > m22:
+            s = 2 * math.sqrt(1 + m11 - m00 - m22)
+            q = Quaternion((m02 - m20) / s, (m01 + m10) / s, s / 4, (m12 + m21) / s)
+        else:
+            s = 2 * math.sqrt(1 + m22 - m00 - m11)
+            q = Quaternion((m10 - m01) / s, (m02 + m20) / s, (m12 + m21) / s, s / 4)
+        return q.normalized()
+
+    def __mul__(self, other):
+        # Композиция поворотов: (a * b) поворачивает сначала на b, потом на a
+        aw, ax, ay, az = self.w, self.x, self.y, self.z
+        bw, bx, by, bz = other.w, other.x, other.y, other.z
+        return Quaternion(
+            aw * bw - ax * bx - ay * by - az * bz,
+            aw * bx + ax * bw + ay * bz - az * by,
+            aw * by - ax * bz + ay * bw + az * bx,
+            aw * bz + ax * by - ay * bx + az * bw
+        )
+
+    def __eq__(self, other):
+        if not isinstance(other, Quaternion):
+            return False
+        return self.components() == other.components()
+
+    def __repr__(self):
+        return f"Quaternion({self.w}, {self.x}, {self.y}, {self.z})"
+
+    def components(self):
+        return self.w, self.x, self.y, self.z
+
+    def conjugate(self):
+        return Quaternion(self.w, -self.x, -self.y, -self.z)
+
+    def norm(self):
+        return math.sqrt(self.w ** 2 + self.x ** 2 + self.y ** 2 + self.z ** 2)
+
+    def normalized(self):
+        n = self.norm()
+        if n == 0:
+            return Quaternion()
+        return Quaternion(self.w / n, self.x / n, self.y / n, self.z / n)
+
+    def rotate(self, vector):
+        # v + 2w (u x v) + 2 u x (u x v), u - векторная часть
+        w, x, y, z = self.w, self.x, self.y, self.z
+        vx, vy, vz = vector.x, vector.y, vector.z
+        tx = 2 * (y * vz - z * vy)
+        ty = 2 * (z * vx - x * vz)
+        tz = 2 * (x * vy - y * vx)
+        return Vector3D(
+            vx + w * tx + y * tz - z * ty,
+            vy + w * ty + z * tx - x * tz,
+            vz + w * tz + x * ty - y * tx
+        )
+
+    def to_matrix(self):
+        w, x, y, z = self.w, self.x, self.y, self.z
+        xx, yy, zz = x * x, y * y, z * z
+        xy, xz, yz = x * y, x * z, y * z
+        wx, wy, wz = w * x, w * y, w * z
+        return Matrix4x4((
+            1 - 2 * (yy + zz), 2 * (xy - wz), 2 * (xz + wy), 0.0,
+            2 * (xy + wz), 1 - 2 * (xx + zz), 2 * (yz - wx), 0.0,
+            2 * (xz - wy), 2 * (yz + wx), 1 - 2 * (xx + yy), 0.0,
+            0.0, 0.0, 0.0, 1.0,
+        ), True)
+
+
 class Matrix4x4:
-    def __init__(self):
-        self.m = [[0] * 4 for _ in range(4)]
-        self.m[0][0] = 1
-        self.m[1][1] = 1
-        self.m[2][2] = 1
-        self.m[3][3] = 1
+    # 16 чисел по строкам: элемент (i, j) - values[4 * i + j].
+    # affine: нижняя строка (0, 0, 0, 1), w-строку можно не считать
+    __slots__ = ("values", "affine")
+
+    def __init__(self, values=None, affine=None):
+        self.values = list(_IDENTITY if values is None else values)
+        if affine is None:
+            affine = self.values[12:] == [0, 0, 0, 1]
+        self.affine = affine
+
+    @classmethod
+    def from_rows(cls, rows):
+        return cls([value for row in rows for value in row])
+
+    def rows(self):
+        v = self.values
+        return [v[0:4], v[4:8], v[8:12], v[12:16]]
+
+    def __getitem__(self, index):
+        i, j = index
+        return self.values[4 * i + j]
+
+    def __eq__(self, other):
+        return isinstance(other, Matrix4x4) and self.values == other.values
+
+    def __repr__(self):
+        return f"Matrix4x4({self.rows()})"
 
     def __mul__(self, other):
+        v = self.values
         if isinstance(other, Vector3D):
-            x = self.m[0][0] * other.x + self.m[0][1] * other.y + self.m[0][2] * other.z + self.m[0][3]
-            y = self.m[1][0] * other.x + self.m[1][1] * other.y + self.m[1][2] * other.z + self.m[1][3]
-            z = self.m[2][0] * other.x + self.m[2][1] * other.y + self.m[2][2] * other.z + self.m[2][3]
-            w = self.m[3][0] * other.x + self.m[3][1] * other.y + self.m[3][2] * other.z + self.m[3][3]
+            ox, oy, oz = other.x, other.y, other.z
+            x = v[0] * ox + v[1] * oy + v[2] * oz + v[3]
+            y = v[4] * ox + v[5] * oy + v[6] * oz + v[7]
+            z = v[8] * ox + v[9] * oy + v[10] * oz + v[11]
+            if self.affine:
+                return Vector3D(x, y, z)
+            w = v[12] * ox + v[13] * oy + v[14] * oz + v[15]
             if w != 0:
                 x /= w
                 y /= w
                 z /= w
             return Vector3D(x, y, z)
         elif isinstance(other, Matrix4x4):
-            result = Matrix4x4()
-            for i in range(4):
-                for j in range(4):
-                    result.m[i][j] = sum(self.m[i][k] * other.m[k][j] for k in range(4))
+            b = other.values
+            if self.affine and other.affine:
+                # Нижние строки (0, 0, 0, 1): только три строки, без нулевых слагаемых
+                values = []
+                for i in (0, 4, 8):
+                    a0, a1, a2, a3 = v[i], v[i + 1], v[i + 2], v[i + 3]
+                    values += (
+                        a0 * b[0] + a1 * b[4] + a2 * b[8],
+                        a0 * b[1] + a1 * b[5] + a2 * b[9],
+                        a0 * b[2] + a1 * b[6] + a2 * b[10],
+                        a0 * b[3] + a1 * b[7] + a2 * b[11] + a3,
+                    )
+                values += (0.0, 0.0, 0.0, 1.0)
+                return Matrix4x4(values, True)
+            return Matrix4x4([
+                v[i] * b[j] + v[i + 1] * b[j + 4] + v[i + 2] * b[j + 8] + v[i + 3] * b[j + 12]
+                for i in (0, 4, 8, 12)
+                for j in range(4)
+            ])
+        elif isinstance(other, Vector3DArray):
+            return other.transform(self)
+        elif isinstance(other, np.ndarray):
+            return self.transform_points(other)
+        return NotImplemented
+
+    def to_numpy(self):
+        return np.array(self.values, dtype=np.float64).reshape(4, 4)
+
+    def transform_points(self, points):
+        # Пакетное умножение: (N, 3) точек за одно матричное произведение
+        m = self.to_numpy()
+        result = points @ m[:3, :3].T + m[:3, 3]
+        if self.affine:
             return result
+        w = points @ m[3, :3] + m[3, 3]
+        if np.any(w != 1):
+            w = np.where(w != 0, w, 1)
+            result /= w[:, None]
+        return result
+
+    def inverse(self):
+        m = self.to_numpy()
+        if not self.affine:
+            return Matrix4x4(np.linalg.inv(m).ravel().tolist(), False)
+        # (R | t)^-1 = (R^-1 | -R^-1 t)
+        result = np.eye(4)
+        result[:3, :3] = np.linalg.inv(m[:3, :3])
+        result[:3, 3] = -result[:3, :3] @ m[:3, 3]
+        return Matrix4x4(result.ravel().tolist(), True)
+
+    def inverse_transpose(self):
+        # Матрица для нормалей: (M^-1)^T блока 3x3, сохраняет перпендикулярность
+        # нормали к грани при отражении и неравномерном масштабе
+        result = np.eye(4)
+        result[:3, :3] = np.linalg.inv(self.to_numpy()[:3, :3]).T
+        return Matrix4x4(result.ravel().tolist(), True)
 
     @staticmethod
     def translation(x, y, z):
-        mat = Matrix4x4()
-        mat.m[0][3] = x
-        mat.m[1][3] = y
-        mat.m[2][3] = z
-        return mat
+        return Matrix4x4((
+            1.0, 0.0, 0.0, x,
+            0.0, 1.0, 0.0, y,
+            0.0, 0.0, 1.0, z,
+            0.0, 0.0, 0.0, 1.0,
+        ), True)
 
     @staticmethod
     def rotation_x(angle):
-        mat = Matrix4x4()
         rad = math.radians(angle)
-        mat.m[1][1] = math.cos(rad)
-        mat.m[1][2] = -math.sin(rad)
-        mat.m[2][1] = math.sin(rad)
-        mat.m[2][2] = math.cos(rad)
-        return mat
+        c, s = math.cos(rad), math.sin(rad)
+        return Matrix4x4((
+            1.0, 0.0, 0.0, 0.0,
+            0.0, c, -s, 0.0,
+            0.0, s, c, 0.0,
+            0.0, 0.0, 0.0, 1.0,
+        ), True)
 
     @staticmethod
     def rotation_y(angle):
-        mat = Matrix4x4()
         rad = math.radians(angle)
-        mat.m[0][0] = math.cos(rad)
-        mat.m[0][2] = math.sin(rad)
-        mat.m[2][0] = -math.sin(rad)
-        mat.m[2][2] = math.cos(rad)
-        return mat
+        c, s = math.cos(rad), math.sin(rad)
+        return Matrix4x4((
+            c, 0.0, s, 0.0,
+            0.0, 1.0, 0.0, 0.0,
+            -s, 0.0, c, 0.0,
+            0.0, 0.0, 0.0, 1.0,
+        ), True)
 
     @staticmethod
     def rotation_z(angle):
-        mat = Matrix4x4()
         rad = math.radians(angle)
-        mat.m[0][0] = math.cos(rad)
-        mat.m[0][1] = -math.sin(rad)
-        mat.m[1][0] = math.sin(rad)
-        mat.m[1][1] = math.cos(rad)
-        return mat
+        c, s = math.cos(rad), math.sin(rad)
+        return Matrix4x4((
+            c, -s, 0.0, 0.0,
+            s, c, 0.0, 0.0,
+            0.0, 0.0, 1.0, 0.0,
+            0.0, 0.0, 0.0, 1.0,
+        ), True)
 
     @staticmethod
     def scaling(sx, sy, sz):
-        mat = Matrix4x4()
-        mat.m[0][0] = sx
-        mat.m[1][1] = sy
-        mat.m[2][2] = sz
-        return mat 
\ No newline at end of file
+        return Matrix4x4((
+            sx, 0.0, 0.0, 0.0,
+            0.0, sy, 0.0, 0.0,
+            0.0, 0.0, sz, 0.0,
+            0.0, 0.0, 0.0, 1.0,
+        ), True)
+
+    @staticmethod
+    def from_trs(translation, rotation, scale=(1.0, 1.0, 1.0)):
+        # T * R * S: масштаб по осям (знак - отражение), поворот, перенос
+        r = rotation.to_matrix().values
+        sx, sy, sz = scale
+        return Matrix4x4((
+            r[0] * sx, r[1] * sy, r[2] * sz, translation.x,
+            r[4] * sx, r[5] * sy, r[6] * sz, translation.y,
+            r[8] * sx, r[9] * sy, r[10] * sz, translation.z,
+            0.0, 0.0, 0.0, 1.0,
+        ), True)
+
+    def decompose(self):
+        # Обратно к (перенос, поворот, масштаб) для аффинной матрицы без сдвига;
+        # отражение (det < 0) уходит в знак масштаба по X
+        v = self.values
+        columns = [(v[j], v[4 + j], v[8 + j]) for j in range(3)]
+        scale = [math.sqrt(a * a + b * b + c * c) for a, b, c in columns]
+        if np.linalg.det(self.to_numpy()[:3, :3]) < 0:
+            scale[0] = -scale[0]
+        rotation = [0.0] * 16
+        for j, (column, s) in enumerate(zip(columns, scale)):
+            for i in range(3):
+                rotation[4 * i + j] = column[i] / s if s else float(i == j)
+        rotation[15] = 1.0
+        return (
+            Vector3D(v[3], v[7], v[11]),
+            Quaternion.from_matrix(Matrix4x4(rotation, True)),
+            tuple(scale),
+        )
+
+    @staticmethod
+    def look_at(eye, target, up=None):
+        # Матрица вида: как и в сцене, камера смотрит вдоль +Z
+        if up is None:
+            up = Vector3D(0, 1, 0)
+        forward = (target - eye).normalized()
+        right = up.cross(forward).normalized()
+        true_up = forward.cross(right)
+        rotation = Matrix4x4((
+            right.x, right.y, right.z, 0.0,
+            true_up.x, true_up.y, true_up.z, 0.0,
+            forward.x, forward.y, forward.z, 0.0,
+            0.0, 0.0, 0.0, 1.0,
+        ), True)
+        return rotation * Matrix4x4.translation(-eye.x, -eye.y, -eye.z)
+
+    @staticmethod
+    def perspective(fov_y, aspect, near, far):
+        # Проекция для камеры вдоль +Z: после деления на w = z
+        # видимый объем переходит в куб [-1, 1]
+        f = 1 / math.tan(math.radians(fov_y) / 2)
+        a = (far + near) / (far - near)
+        b = -2 * far * near / (far - near)
+        return Matrix4x4((
+            f / aspect, 0.0, 0.0, 0.0,
+            0.0, f, 0.0, 0.0,
+            0.0, 0.0, a, b,
+            0.0, 0.0, 1.0, 0.0,
+        ), False)
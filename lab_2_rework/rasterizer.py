@@ -0,0 +1,276 @@
+import numpy as np
+from PySide6.QtGui import QImage
+
+from lighting import normalize_columns, phong_intensity
+
+
+class TriangleBatch:
+    # Треугольники кадра в экранных координатах и их атрибуты:
+    # points (T, 3, 2), inv_depth (T, 3) - 1/z вершин, colors (T, 3),
+    # intensities (T, 3) - освещенность вершин для закраски Гуро,
+    # normals и positions (T, 3, 3) - для попиксельного освещения
+    def __init__(
+        self, points, inv_depth, colors, intensities=None, normals=None, positions=None
+    ):
+        self.points = points
+        self.inv_depth = inv_depth
+        self.colors = colors
+        self.intensities = intensities
+        self.normals = normals
+        self.positions = positions
+
+    def __len__(self):
+        return len(self.points)
+
+    def subset(self, ids, offset=(0, 0)):
+        # Часть треугольников, экранные координаты сдвинуты на -offset
+        def take(values):
+            return None if values is None else values[ids]
+
+        return TriangleBatch(
+            self.points[ids] - np.asarray(offset, dtype=self.points.dtype),
+            self.inv_depth[ids],
+            self.colors[ids],
+            take(self.intensities),
+            take(self.normals),
+            take(self.positions),
+        )
+
+
+class Rasterizer:
+    # Программный растеризатор с буфером глубины.
+    # Буфер глубины хранит 1/z: эта величина линейна в экранных координатах,
+    # 0 означает "бесконечно далеко". Цвет хранится упакованным 0xFFRRGGBB.
+    # color и depth можно передать готовыми (например, окно в общей памяти)
+    def __init__(self, width, height, color=None, depth=None):
+        self.width = 0
+        self.height = 0
+        self.color = None
+        self.depth = None
+        # Буфер видимости для попиксельного освещения: номер треугольника
+        # в пикселе; атрибуты интерполируются уже после растеризации
+        self.triangle = None
+        self._deferred = []
+        self._deferred_count = 0
+        if color is None:
+            self.resize(width, height)
+        else:
+            self.width = width
+            self.height = height
+            self.color = color
+            self.depth = depth
+            self.triangle = np.full((height, width), -1, dtype=np.int32)
+
+    def resize(self, width, height):
+        if (width, height) == (self.width, self.height):
+            return
+        self.width = width
+        self.height = height
+        self.color = np.zeros((height, width), dtype=np.uint32)
+        self.depth = np.zeros((height, width), dtype=np.float32)
+        self.triangle = np.full((height, width), -1, dtype=np.int32)
+
+    def clear(self, background):
+        self.color.fill(pack_rgb(background))
+        self.depth.fill(0)
+        if self._deferred:
+            self.triangle.fill(-1)
+            self._deferred = []
+            self._deferred_count = 0
+
+    def render(self, batch, background, light_dir=None, camera_pos=None):
+        self.clear(background)
+        self.draw_batch(batch)
+        if batch.normals is not None:
+            self.shade_phong(light_dir, camera_pos)
+
+    def draw_batch(self, batch):
+        if len(batch):
+            self.draw_triangles(
+                batch.points,
+                batch.inv_depth,
+                batch.colors,
+                batch.intensities,
+                batch.normals,
+                batch.positions,
+            )
+
+    def draw_triangles(
+        self,
+        points,
+        inv_depth,
+        colors,
+        intensities=None,
+        normals=None,
+        positions=None,
+    ):
+        # points (T, 3, 2) - экранные координаты вершин,
+        # inv_depth (T, 3) - 1/z вершин, colors (T, 3) - цвет треугольника,
+        # intensities (T, 3) - освещенность вершин для закраски Гуро,
+        # normals и positions (T, 3, 3) - для попиксельного освещения (shade_phong)
+        coefficients, boxes = _setup_triangles(
+            points, inv_depth, self.width, self.height
+        )
+        depth_planes = _attribute_planes(coefficients, inv_depth, None)
+        deferred = normals is not None
+        if deferred:
+            first_id = self._deferred_count
+            # Плоскости атрибутов хранятся по компонентам (3, C, T):
+            # выборка по номерам треугольников дает непрерывные строки
+            self._deferred.append(
+                (
+                    _attribute_planes(coefficients, inv_depth, normals).transpose(
+                        1, 2, 0
+                    ),
+                    _attribute_planes(coefficients, inv_depth, positions).transpose(
+                        1, 2, 0
+                    ),
+                    np.asarray(colors, dtype=np.float32).T,
+                )
+            )
+            self._deferred_count += len(points)
+        elif intensities is not None:
+            intensity_planes = _attribute_planes(coefficients, inv_depth, intensities)
+            colors = np.asarray(colors, dtype=np.float32)
+        else:
+            packed = pack_rgb(colors)
+
+        for i in np.flatnonzero(boxes[:, 0] < boxes[:, 1]).tolist():
+            x0, x1, y0, y1 = boxes[i].tolist()
+            xs = np.arange(x0, x1) + 0.5
+            ys = np.arange(y0, y1)[:, None] + 0.5
+            inside = _inside(coefficients[i], xs, ys)
+            z = _evaluate(depth_planes[i], xs, ys).astype(np.float32)
+
+            depth = self.depth[y0:y1, x0:x1]
+            mask = inside & (z > depth)
+            if not mask.any():
+                continue
+            depth[mask] = z[mask]
+
+            if deferred:
+                # Только номер треугольника, освещение - в shade_phong
+                self.triangle[y0:y1, x0:x1][mask] = first_id + i
+                continue
+
+            if self._deferred:
+                # Пиксель перекрыт гранью без попиксельного освещения
+                self.triangle[y0:y1, x0:x1][mask] = -1
+            if intensities is None:
+                self.color[y0:y1, x0:x1][mask] = packed[i]
+            else:
+                intensity = _evaluate(intensity_planes[i], xs, ys)[mask] / z[mask]
+                self.color[y0:y1, x0:x1][mask] = pack_rgb(
+                    intensity[:, None] * colors[i]
+                )
+
+    def shade_phong(self, light_dir, camera_pos):
+        # Отложенное освещение: один векторный проход по всем пикселям
+        # из буфера видимости; степень блика берется из таблицы
+        if not self._deferred:
+            return
+        rows, cols = np.nonzero(self.triangle >= 0)
+        triangles = self.triangle[rows, cols]
+        normal_planes, position_planes, colors = (
+            np.concatenate(parts, axis=-1).astype(np.float32)
+            for parts in zip(*self._deferred)
+        )
+
+        xs = cols.astype(np.float32) + 0.5
+        ys = rows.astype(np.float32) + 0.5
+        # Нормаль нормируется, поэтому делить ее на 1/z не нужно
+        pixel_normals = normalize_columns(
+            _evaluate(np.take(normal_planes, triangles, axis=-1), xs, ys)
+        )
+        pixel_positions = _evaluate(
+            np.take(position_planes, triangles, axis=-1), xs, ys
+        )
+        pixel_positions /= self.depth[rows, cols]
+
+        view_dirs = normalize_columns(
+            camera_pos.astype(np.float32)[:, None] - pixel_positions
+        )
+        intensity = phong_intensity(
+            pixel_normals, view_dirs, light_dir.astype(np.float32), use_table=True
+        )
+        self.color[rows, cols] = pack_rgb(
+            (np.take(colors, triangles, axis=-1) * intensity).T
+        )
+
+    def to_qimage(self):
+        # QImage ссылается на массив без копирования: массив должен жить,
+        # пока изображение рисуется
+        return QImage(
+            self.color.data,
+            self.width,
+            self.height,
+            4 * self.width,
+            QImage.Format_RGB32,
+        )
+
+
+def pack_rgb(rgb):
+    # (..., 3) -> 0xFFRRGGBB
+    rgb = np.minimum(255, np.asarray(rgb)).astype(np.uint32)
+    return np.uint32(0xFF000000) | rgb[..., 0] << 16 | rgb[..., 1] << 8 | rgb[..., 2]
+
+
+def triangulate(face_indices):
+    # Веерная триангуляция выпуклых граней (F, k) -> (F * (k - 2), 3).
+    # Возвращает вершины треугольников, номер исходной грани
+    # и номера углов грани в плоском массиве (F * k) для атрибутов углов
+    face_count, k = face_indices.shape
+    fan = np.array([(0, i, i + 1) for i in range(1, k - 1)])
+    triangles = face_indices[:, fan].reshape(-1, 3)
+    source_faces = np.repeat(np.arange(face_count), k - 2)
+    corners = (np.arange(face_count)[:, None, None] * k + fan).reshape(-1, 3)
+    return triangles, source_faces, corners
+
+
+def _setup_triangles(points, inv_depth, width, height):
+    # Коэффициенты барицентрических координат: w_i(x, y) = a_i * x + b_i * y + c_i
+    x = points[:, :, 0]
+    y = points[:, :, 1]
+    nxt = [1, 2, 0]
+    prv = [2, 0, 1]
+    # Вес вершины i - функция ребра, противолежащего ей
+    a = y[:, nxt] - y[:, prv]
+    b = x[:, prv] - x[:, nxt]
+    c = x[:, nxt] * y[:, prv] - x[:, prv] * y[:, nxt]
+    area = c.sum(axis=1)
+
+    valid = (np.abs(area) > 1e-9) & np.all(inv_depth > 0, axis=1)
+    area = np.where(valid, area, 1)
+    coefficients = np.stack([a, b, c], axis=2) / area[:, None, None]
+
+    boxes = np.empty((len(points), 4), dtype=np.int64)
+    boxes[:, 0] = np.clip(np.floor(x.min(axis=1)), 0, width)
+    boxes[:, 1] = np.clip(np.ceil(x.max(axis=1)) + 1, 0, width)
+    boxes[:, 2] = np.clip(np.floor(y.min(axis=1)), 0, height)
+    boxes[:, 3] = np.clip(np.ceil(y.max(axis=1)) + 1, 0, height)
+    empty = ~valid | (boxes[:, 2] >= boxes[:, 3])
+    boxes[empty, 1] = boxes[empty, 0]
+    return coefficients, boxes
+
+
+def _attribute_planes(coefficients, inv_depth, values):
+    # Плоскость A / z = a * x + b * y + c для атрибута вершин: с делением
+    # на z интерполяция остается линейной в экране (перспективная коррекция).
+    # values (T, 3) или (T, 3, C) -> (T, 3) или (T, 3, C); None - плоскость 1/z
+    if values is None:
+        return np.einsum("tkj,tk->tj", coefficients, inv_depth)
+    if values.ndim == 2:
+        return np.einsum("tkj,tk->tj", coefficients, inv_depth * values)
+    return np.einsum("tkj,tkc->tjc", coefficients, inv_depth[..., None] * values)
+
+
+def _evaluate(plane, xs, ys):
+    return plane[0] * xs + plane[1] * ys + plane[2]
+
+
+def _inside(coefficients, xs, ys):
+    # Пиксель внутри, если все три барицентрических веса неотрицательны
+    inside = _evaluate(coefficients[0], xs, ys) >= -1e-7
+    inside &= _evaluate(coefficients[1], xs, ys) >= -1e-7
+    inside &= _evaluate(coefficients[2], xs, ys) >= -1e-7
+    return inside
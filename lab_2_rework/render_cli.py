@@ -0,0 +1,143 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+# Без дисплейного сервера: Qt рисует в память
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PySide6.QtWidgets import QApplication
+from PySide6.QtGui import QImage
+
+from math_utils import Vector3D, Matrix4x4, Quaternion
+from enums import DisplayMode, ShadingMode
+from scene_widget import SceneWidget
+
+# Файл параметров:
+# {
+#     "width": 800, "height": 600,
+#     "defaults": {"display_mode": "ZBUFFER", "shading_mode": "PHONG"},
+#     "frames": [
+#         {"output": "frame_{index:05d}.png", "rotation": [0, 30, 0]},
+#         ...
+#     ]
+# }
+# Ключи кадра: output, camera_pos, camera_rot, rotation (градусы по X, Y, Z
+# поверх исходного поворота сцены) или transform (матрица 4x4 по строкам),
+# light, mirror ([x, y, z]), display_mode, shading_mode, scale.
+# Кадр наследует ключи из defaults; кадры не зависят друг от друга.
+
+DEFAULT_OUTPUT = "frame_{index:05d}.png"
+
+
+def parse_mode(enum, name):
+    for mode in enum:
+        if name.upper() == mode.name or name == mode.value:
+            return mode
+    raise ValueError(f"Неизвестный режим {name!r}: {[mode.name for mode in enum]}")
+
+
+def object_pose(params):
+    # Перенос, поворот и масштаб объекта, как их хранит сцена
+    if "transform" in params:
+        return Matrix4x4.from_rows(params["transform"]).decompose()
+    rx, ry, rz = params.get("rotation", (0, 0, 0))
+    rotation = (
+        Quaternion.rotation_z(rz)
+        * Quaternion.rotation_y(ry)
+        * Quaternion.rotation_x(rx)
+        * Quaternion.rotation_z(180)
+    )
+    return Vector3D(0, 0, 0), rotation.normalized(), (1.0, 1.0, 1.0)
+
+
+def apply_frame(scene, params):
+    # Сцена приводится к состоянию кадра целиком, чтобы порядок кадров
+    # в файле не влиял на результат
+    scene.camera_pos = Vector3D(*params.get("camera_pos", (0, 0, -400)))
+    scene.camera_rot = list(params.get("camera_rot", (0, 0, 0)))
+    pose = object_pose(params)
+    scene.object_translation, scene.object_rotation, scene.object_scale = pose
+    scene.light_dir = Vector3D(*params.get("light", (0.5, 0.5, -1))).normalized()
+    scene.light_pos = scene.light_dir * 150
+    scene.mirror_x, scene.mirror_y, scene.mirror_z = (
+        bool(flag) for flag in params.get("mirror", (False, False, False))
+    )
+    scene.display_mode = parse_mode(DisplayMode, params.get("display_mode", "FILLED"))
+    scene.shading_mode = parse_mode(ShadingMode, params.get("shading_mode", "MONOTONE"))
+    if "scale" in params:
+        scene.base_scale = params["scale"]
+    else:
+        scene.auto_scale_view()
+
+
+def render_frames(config, output_dir, workers=0):
+    width = config.get("width", 800)
+    height = config.get("height", 600)
+    defaults = config.get("defaults", {})
+
+    scene = SceneWidget()
+    scene.resize(width, height)
+    scene.set_render_workers(workers)
+    image = QImage(width, height, QImage.Format_RGB32)
+
+    render_time = 0.0
+    outputs = []
+    for index, frame in enumerate(config.get("frames", [{}])):
+        params = {**defaults, **frame}
+        apply_frame(scene, params)
+
+        start = time.perf_counter()
+        scene.render(image)
+        render_time += time.perf_counter() - start
+
+        path = os.path.join(
+            output_dir, params.get("output", DEFAULT_OUTPUT).format(index=index)
+        )
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        if not image.save(path):
+            raise OSError(f"Не удалось сохранить {path}")
+        outputs.append(path)
+
+    scene.set_render_workers(0)
+    return outputs, render_time
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Рендер сцены в PNG без окна по файлу параметров"
+    )
+    parser.add_argument("params", help="JSON-файл с параметрами кадров")
+    parser.add_argument(
+        "-o", "--output-dir", default=".", help="каталог для изображений"
+    )
+    parser.add_argument("--width", type=int, help="ширина кадра")
+    parser.add_argument("--height", type=int, help="высота кадра")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=0,
+        help="процессы растеризации по тайлам для режима Z-буфера",
+    )
+    args = parser.parse_args(argv)
+
+    with open(args.params, encoding="utf-8") as file:
+        config = json.load(file)
+    if args.width:
+        config["width"] = args.width
+    if args.height:
+        config["height"] = args.height
+
+    # Ссылка держит приложение Qt живым до конца рендера
+    _app = QApplication.instance() or QApplication(sys.argv[:1])
+    outputs, render_time = render_frames(config, args.output_dir, args.workers)
+    print(
+        f"Кадров: {len(outputs)}, рендер: {render_time:.3f} с, "
+        f"{render_time / max(1, len(outputs)) * 1000:.2f} мс/кадр"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,106 @@
+import numpy as np
 from PySide6.QtWidgets import QWidget
 from PySide6.QtGui import QPainter, QPen, QBrush, QColor, QPolygonF, QLinearGradient
-from PySide6.QtCore import Qt, QPoint, QPointF
-from math_utils import Vector3D, Matrix4x4
+from PySide6.QtCore import Qt, QPoint, QPointF, QLineF
+from math_utils import Vector3D, Vector3DArray, Matrix4x4, Quaternion, normalize_rows
 from letter3d import Letter3D
 from enums import DisplayMode, ShadingMode
+from rasterizer import Rasterizer, TriangleBatch, triangulate
+from tile_renderer import TileRenderer
+from lighting import phong_intensity
+from frame_profiler import FrameProfiler
+from interaction import InteractionScheduler
+from instancing import group_instances, transform_instances
+from depth_sort import DepthSorter
+from frustum import Frustum
+from clipping import clip_polygons, clip_segments, fan_triangles, points_inside
+from hidden_line import CoarseDepthBuffer, feature_edges
+
+# Ближняя плоскость отсечения в координатах камеры
+NEAR_PLANE = 1.0
+# Запас за краями окна при отсечении, в пикселях: новые ребра на границе
+# области отсечения не попадают в кадр
+CLIP_MARGIN = 2
+
+
+class FrameData:
+    # Геометрия кадра после трансформации: все буквы в общих массивах
+    def __init__(
+        self,
+        face_indices,
+        face_colors,
+        face_normals,
+        corner_normals,
+        camera_vertices,
+        edges,
+        face_edges,
+        edge_faces,
+        point_faces,
+        edge_adjacent,
+        edge_creases,
+        edge_flips,
+        face_orientation,
+        objects,
+    ):
+        self.face_indices = face_indices
+        self.face_colors = face_colors
+        self.face_normals = face_normals
+        self.corner_normals = corner_normals
+        self.camera_vertices = camera_vertices
+        # Уникальные ребра кадра, номера ребер сторон граней и грани,
+        # дающие цвет ребрам и вершинам (режимы точек и каркаса)
+        self.edges = edges
+        self.face_edges = face_edges
+        self.edge_faces = edge_faces
+        self.point_faces = point_faces
+        # Соседние грани ребер, острые ребра и несогласованный обход
+        # (каркас без невидимых линий)
+        self.edge_adjacent = edge_adjacent
+        self.edge_creases = edge_creases
+        self.edge_flips = edge_flips
+        # -1 у граней, чья матрица отражает (det < 0): обход вершин после
+        # трансформации меняется, и нормаль по обходу надо развернуть
+        self.face_orientation = face_orientation
+        # Сетки кадра для обхода BSP-деревьев: (сетка, матрицы (n, 4, 4)
+        # из ее координат в координаты камеры, номер первой грани сетки
+        # в кадре); у экземпляров грани идут блоками по экземплярам
+        self.objects = objects
+        # Лицевые грани кадра (считаются при первом использовании)
+        self.front_faces = None
+        # Пирамида видимости кадра и результаты отсечения по ней,
+        # считаются при первом использовании
+        self.frustum = None
+        self.clipped_faces = None
+        self.clipped_triangles = None
+        # Готовые к выводу точки и линии, сгруппированные по цвету
+        self.point_batches = None
+        self.line_batches = None
+        self.hidden_line_batches = None
+
+
+def _color_groups(colors):
+    # Номера элементов по цветам (N, 3): пары (QColor, номера) в порядке
+    # первого появления цвета
+    if not len(colors):
+        return []
+    colors = np.asarray(colors, dtype=np.int64)
+    packed = colors[:, 0] << 16 | colors[:, 1] << 8 | colors[:, 2]
+    _, first, inverse = np.unique(packed, return_index=True, return_inverse=True)
+    order = np.argsort(inverse, kind="stable")
+    groups = np.split(order, np.cumsum(np.bincount(inverse))[:-1])
+    return [
+        (QColor(*colors[first[number]].tolist()), groups[number])
+        for number in np.argsort(first).tolist()
+    ]
+
+
+def _line_groups(starts, ends, colors):
+    # Отрезки на экране (N, 2) -> пары (QColor, список QLineF)
+    lines = np.concatenate((starts, ends), axis=1).tolist()
+    return [
+        (color, [QLineF(*lines[i]) for i in group.tolist()])
+        for color, group in _color_groups(colors)
+    ]
 
 
 class SceneWidget(QWidget):
@@ -15,9 +112,20 @@ class SceneWidget(QWidget):
         self.setPalette(p)
         self.d_letter = Letter3D(100, 60, 30, offset_x=60, letter_type="D")
         self.b_letter = Letter3D(100, 60, 30, offset_x=-60, letter_type="B")
+        self.letters = [self.b_letter, self.d_letter]
+        # Экземпляры общих сеток (instancing.LetterInstance) рисуются вместе
+        # с буквами; после изменения экземпляров на месте - invalidate_frame()
+        self.instances = []
         self.camera_pos = Vector3D(0, 0, -400)
         self.camera_rot = [0, 0, 0]
-        self.object_transform = Matrix4x4.rotation_z(180)
+        # Положение объекта хранится раздельно: перенос, кватернион поворота
+        # и масштаб по осям; матрица object_transform собирается из них
+        # один раз после изменения, а не накапливается умножениями
+        self.object_translation = Vector3D(0, 0, 0)
+        self.object_rotation = Quaternion.rotation_z(180)
+        self.object_scale = (1.0, 1.0, 1.0)
+        self._object_matrix = None
+        self._object_matrix_key = None
         self.scale = 1.0
         self.base_scale = 1.4
         self.auto_scale = True
@@ -31,175 +139,668 @@ class SceneWidget(QWidget):
         self.last_mouse_pos = None
         self.is_rotating = False
         self.rotation_speed = 0.5
+        self.rasterizer = None
+        self.tile_renderer = None
+        self.render_workers = 0
+        self.profiler = FrameProfiler()
+        self.show_profiler = False
+        self.scheduler = InteractionScheduler(self)
+        # Геометрия кадра и порядок граней не зависят от света:
+        # при смене света пересчитывается только освещение
+        self._frame = None
+        self._frame_key = None
+        self._sorted = None
+        # Порядок букв и экземпляров по глубине, чинится от кадра к кадру
+        self._depth_sorter = DepthSorter()
+        # Число букв и экземпляров вне пирамиды видимости в последнем кадре
+        self.culled_count = 0
+
+    @property
+    def object_transform(self):
+        t, q = self.object_translation, self.object_rotation
+        key = (t.x, t.y, t.z, *q.components(), *self.object_scale)
+        if key != self._object_matrix_key:
+            self._object_matrix = Matrix4x4.from_trs(t, q, self.object_scale)
+            self._object_matrix_key = key
+        return self._object_matrix
+
+    @object_transform.setter
+    def object_transform(self, matrix):
+        # Произвольная аффинная матрица раскладывается обратно на части
+        translation, rotation, scale = matrix.decompose()
+        self.object_translation = translation
+        self.object_rotation = rotation
+        self.object_scale = scale
+
+    def compute_phong_lighting(self, normals, positions):
+        # Пакетный расчет интенсивности для массивов нормалей и позиций (N, 3)
+        camera_pos = np.array([self.camera_pos.x, self.camera_pos.y, self.camera_pos.z])
+        view_dir = normalize_rows(camera_pos - positions)
+        world_normals = Vector3DArray(normals).transform(self._normal_matrix())
+        return phong_intensity(
+            world_normals.normalized().data.T, view_dir.T, self._light_vector()
+        )
 
-    def compute_phong_lighting(self, normal, position):
-        ambient_strength = 0.2
-        diffuse_strength = 0.8
-        specular_strength = 0.5
-        shininess = 32
-
-        light_dir = self.light_dir
-        view_dir = (self.camera_pos - position).normalized()
-
-        world_normal = self.object_transform * normal
-        world_normal = world_normal.normalized()
-
-        cos_theta = world_normal.dot(light_dir)
-
-        if cos_theta < 0:
-            return ambient_strength
-
-        diffuse = diffuse_strength * cos_theta
-
-        reflect_dir = (
-            light_dir - world_normal * (2 * world_normal.dot(light_dir))
-        ).normalized()
-
-        specular = specular_strength * max(0, reflect_dir.dot(view_dir)) ** shininess
-
-        intensity = ambient_strength + diffuse + specular
-
-        return min(1.0, max(0.2, intensity))
+    def _light_vector(self):
+        return np.array([self.light_dir.x, self.light_dir.y, self.light_dir.z])
 
     def paintEvent(self, event):
+        profiler = self.profiler
+        profiler.begin_frame()
         painter = QPainter(self)
         painter.setRenderHint(QPainter.Antialiasing)
         painter.fillRect(self.rect(), QColor(50, 50, 50))
         # self.draw_axes(painter)
 
-        all_faces = []
+        if self.display_mode == DisplayMode.ZBUFFER:
+            self._draw_zbuffer(painter)
+        else:
+            self._draw_painter(painter)
+
+        with profiler.stage("draw"):
+            self.draw_light_source(painter)
+        profiler.end_frame()
+
+        if self.show_profiler:
+            self.draw_profiler_overlay(painter)
+
+    def _draw_painter(self, painter):
+        if self.display_mode in (
+            DisplayMode.POINTS,
+            DisplayMode.WIREFRAME,
+            DisplayMode.HIDDEN_LINE,
+        ):
+            self._draw_batched(painter)
+            return
+        prepared = self._prepare_frame()
+        with self.profiler.stage("draw"):
+            self._draw_prepared(painter, prepared)
 
-        t_faces = self._prepare_letter_faces(self.b_letter)
-        all_faces.extend(t_faces)
+    def _draw_prepared(self, painter, prepared):
+        for depth, color, screen_points, intensities in prepared:
+            if len(screen_points) >= 3:
+                self._draw_filled_face(painter, color, screen_points, intensities)
+
+    def _draw_batched(self, painter):
+        # Каждая вершина и каждое ребро рисуются один раз: один вызов
+        # drawPoints / drawLines на цвет вместо setPen и вывода на грань
+        frame = self._cached_frame()
+        if frame is None:
+            return
+        points = self.display_mode == DisplayMode.POINTS
+        with self.profiler.stage("sort"):
+            if points:
+                batches = self._point_batches(frame)
+            elif self.display_mode == DisplayMode.HIDDEN_LINE:
+                batches = self._hidden_line_batches(frame)
+            else:
+                batches = self._line_batches(frame)
+        with self.profiler.stage("draw"):
+            for color, items in batches:
+                if points:
+                    painter.setPen(QPen(color, 5))
+                    painter.drawPoints(items)
+                else:
+                    painter.setPen(QPen(color, 2))
+                    painter.drawLines(items)
+
+    def _point_batches(self, frame):
+        # Вершины внутри пирамиды видимости: QPolygonF на цвет
+        if frame.point_batches is None:
+            inside = np.flatnonzero(
+                points_inside(frame.camera_vertices, self._clip_planes(frame))
+            )
+            screen = self._project(frame.camera_vertices[inside])[0].tolist()
+            colors = frame.face_colors[frame.point_faces[inside]]
+            frame.point_batches = [
+                (color, QPolygonF([QPointF(*screen[i]) for i in group.tolist()]))
+                for color, group in _color_groups(colors)
+            ]
+        return frame.point_batches
+
+    def _line_batches(self, frame):
+        # Ребра, обрезанные по пирамиде видимости: список QLineF на цвет
+        if frame.line_batches is None:
+            vertices = frame.camera_vertices
+            starts, ends, kept = clip_segments(
+                vertices[frame.edges[:, 0]],
+                vertices[frame.edges[:, 1]],
+                self._clip_planes(frame),
+            )
+            frame.line_batches = _line_groups(
+                self._project(starts)[0],
+                self._project(ends)[0],
+                frame.face_colors[frame.edge_faces[kept]],
+            )
+        return frame.line_batches
+
+    def _hidden_line_batches(self, frame):
+        # Каркас без невидимых линий. Рисуются только силуэтные и острые
+        # ребра (по соседству граней, без перебора пар), а их видимость
+        # проверяется по грубому буферу глубины из уже обрезанных граней
+        if frame.hidden_line_batches is None:
+            candidates = feature_edges(
+                frame.camera_vertices,
+                frame.face_indices,
+                frame.edge_adjacent,
+                frame.edge_creases,
+                frame.edge_flips,
+            )
+            vertices = frame.camera_vertices
+            edges = frame.edges[candidates]
+            starts, ends, kept = clip_segments(
+                vertices[edges[:, 0]], vertices[edges[:, 1]], self._clip_planes(frame)
+            )
+            kept = candidates[kept]
+            starts, inv_starts = self._project(starts)
+            ends, inv_ends = self._project(ends)
+
+            depth = CoarseDepthBuffer(self.width(), self.height())
+            polygons, counts, faces = self._clip_faces(frame)
+            triangles, polygon = fan_triangles(polygons, counts)
+            depth.draw_triangles(*self._project(triangles), faces[polygon])
+            starts, ends, runs = depth.visible_segments(
+                starts, ends, inv_starts, inv_ends, frame.edge_adjacent[kept]
+            )
+            frame.hidden_line_batches = _line_groups(
+                starts, ends, frame.face_colors[frame.edge_faces[kept[runs]]]
+            )
+        return frame.hidden_line_batches
+
+    def _draw_zbuffer(self, painter):
+        # Вместо сортировки граней - буфер глубины, кадр выводится одним QImage
+        backend = self._zbuffer_backend()
+        batch = self._triangle_batch()
+        camera_pos = self.camera_pos
+        with self.profiler.stage("raster"):
+            backend.render(
+                batch,
+                (50, 50, 50),
+                self._light_vector(),
+                np.array([camera_pos.x, camera_pos.y, camera_pos.z]),
+            )
+        with self.profiler.stage("draw"):
+            painter.drawImage(0, 0, backend.to_qimage())
+
+    def _zbuffer_backend(self):
+        if self.render_workers > 1:
+            if self.tile_renderer is None:
+                self.tile_renderer = TileRenderer(
+                    self.width(), self.height(), workers=self.render_workers
+                )
+            self.tile_renderer.resize(self.width(), self.height())
+            return self.tile_renderer
+        if self.rasterizer is None:
+            self.rasterizer = Rasterizer(self.width(), self.height())
+        self.rasterizer.resize(self.width(), self.height())
+        return self.rasterizer
+
+    def set_render_workers(self, workers):
+        # 0 или 1 - растеризация в этом процессе, больше - по тайлам в пуле
+        if self.tile_renderer is not None and workers != self.render_workers:
+            self.tile_renderer.close()
+            self.tile_renderer = None
+        self.render_workers = workers
+        self.update()
 
-        v_faces = self._prepare_letter_faces(self.d_letter)
-        all_faces.extend(v_faces)
+    def _triangle_batch(self):
+        frame = self._cached_frame()
+        if frame is None:
+            return TriangleBatch(
+                np.zeros((0, 3, 2)), np.zeros((0, 3)), np.zeros((0, 3))
+            )
+        with self.profiler.stage("cull"):
+            self._front_faces(frame)
+        with self.profiler.stage("lighting"):
+            batch = self._shade_triangles(frame)
+        self.profiler.count("faces", len(frame.face_indices))
+        self.profiler.count("vertices", len(frame.camera_vertices))
+        self.profiler.count("triangles", len(batch))
+        return batch
+
+    def _shade_triangles(self, frame):
+        # Освещаются только лицевые грани; углы и номера граней
+        # треугольников - в списке лицевых граней
+        front = self._front_faces(frame)
+        vertices, weights, corners, source_faces = self._clip_triangles(frame)
+        points, inv_depth = self._project(vertices)
+        face_colors = frame.face_colors[front]
+        if self.shading_mode == ShadingMode.GOURAUD:
+            # Освещенность считается один раз для всех вершин кадра
+            # и интерполируется внутри треугольников
+            intensities = self._corner_intensities(frame, front).ravel()
+            return TriangleBatch(
+                points,
+                inv_depth,
+                face_colors[source_faces],
+                intensities=np.einsum("tkj,tj->tk", weights, intensities[corners]),
+            )
+        if self.shading_mode == ShadingMode.PHONG:
+            # Нормали и позиции интерполируются по пикселям,
+            # освещение считается одним проходом по всему кадру
+            corner_normals = frame.corner_normals[front].reshape(-1, 3)
+            world_normals = normalize_rows(
+                self._normal_matrix().transform_points(corner_normals)
+            )
+            return TriangleBatch(
+                points,
+                inv_depth,
+                face_colors[source_faces],
+                normals=np.einsum("tkj,tjc->tkc", weights, world_normals[corners]),
+                positions=vertices,
+            )
+        intensity = self._flat_intensities(frame.face_normals[front])
+        colors = np.minimum(255, face_colors * intensity[:, None])
+        return TriangleBatch(points, inv_depth, colors[source_faces])
+
+    def _front_faces(self, frame):
+        # Отсечение нелицевых граней одним проходом по массивам кадра:
+        # нормаль по обходу вершин (развернутая у отраженных граней)
+        # и центр грани в координатах камеры. Камера в начале координат,
+        # грань лицевая, если нормаль смотрит против направления на центр
+        if frame.front_faces is None:
+            p = frame.camera_vertices[frame.face_indices]
+            normals = np.cross(p[:, 1] - p[:, 0], p[:, 2] - p[:, 0])
+            centers = p.mean(axis=1)
+            facing = np.einsum("ij,ij->i", normals, centers) * frame.face_orientation
+            frame.front_faces = np.flatnonzero(facing < 0)
+        self.profiler.count(
+            "back faces", len(frame.face_indices) - len(frame.front_faces)
+        )
+        return frame.front_faces
+
+    def _clip_planes(self, frame):
+        if frame.frustum is not None:
+            return frame.frustum.planes
+        return np.array([(0.0, 0.0, 1.0, -NEAR_PLANE)])
+
+    def _clip_faces(self, frame):
+        # Лицевые грани, обрезанные по ближней плоскости и краям окна:
+        # (F', K, 3) в координатах камеры, число вершин и номер исходной
+        # грани. Грани целиком вне пирамиды сюда не попадают
+        if frame.clipped_faces is None:
+            front = self._front_faces(frame)
+            polygons, counts, kept = clip_polygons(
+                frame.camera_vertices[frame.face_indices[front]],
+                np.full(len(front), frame.face_indices.shape[1]),
+                self._clip_planes(frame),
+            )
+            frame.clipped_faces = polygons, counts, front[kept]
+        return frame.clipped_faces
+
+    def _clip_triangles(self, frame):
+        # Треугольники для Z-буфера после отсечения. Вместе с координатами
+        # обрезаются барицентрические веса углов исходного треугольника:
+        # атрибуты вершин (освещенность, нормали) потом получаются из весов,
+        # и отсечение не зависит от света. Возвращает вершины (T, 3, 3),
+        # веса (T, 3, 3), углы граней (T, 3) и номера граней (T,)
+        # в списке лицевых граней
+        if frame.clipped_triangles is None:
+            front = self._front_faces(frame)
+            triangles, source_faces, corners = triangulate(frame.face_indices[front])
+            count = len(triangles)
+            weights = np.broadcast_to(np.eye(3), (count, 3, 3))
+            polygons, counts, kept = clip_polygons(
+                np.concatenate((frame.camera_vertices[triangles], weights), axis=2),
+                np.full(count, 3),
+                self._clip_planes(frame),
+            )
+            pieces, polygon = fan_triangles(polygons, counts)
+            source = kept[polygon]
+            frame.clipped_triangles = (
+                pieces[..., :3],
+                pieces[..., 3:],
+                corners[source],
+                source_faces[source],
+            )
+        return frame.clipped_triangles
 
-        all_faces.sort(reverse=True, key=lambda x: x[0])
+    def _flat_intensities(self, face_normals):
+        world_normals = Vector3DArray(face_normals).transform(self._normal_matrix())
+        return np.maximum(0.3, world_normals.normalized().dot(self.light_dir))
 
-        for (
-            depth,
-            face,
-            screen_points,
-            intensities,
-            positions,
-            face_normals,
-        ) in all_faces:
-            if len(screen_points) >= 3:
-                if self.display_mode == DisplayMode.POINTS:
-                    painter.setPen(QPen(face.color, 5))
-                    for point in screen_points:
-                        if point.x() != -1000 and point.y() != -1000:
-                            painter.drawPoint(point)
-                elif self.display_mode == DisplayMode.WIREFRAME:
-                    polygon = QPolygonF(screen_points)
-                    painter.setPen(QPen(face.color, 2))
-                    painter.setBrush(Qt.NoBrush)
-                    painter.drawPolygon(polygon)
-                elif self.display_mode == DisplayMode.FILLED:
-                    self._draw_filled_face(
-                        painter,
-                        face,
-                        screen_points,
-                        intensities,
-                        positions,
-                        face_normals,
-                    )
-
-        self.draw_light_source(painter)
-
-    def _prepare_letter_faces(self, letter):
-        faces_with_depth = []
-        transformed_vertices = []
-        vertex_normals = []
-
-        mirror_matrix = Matrix4x4.scaling(
+    def _normal_matrix(self):
+        # Нормали переводятся обратной транспонированной матрицей того же
+        # mirror -> object_transform, что и вершины
+        return (self.object_transform * self._mirror_matrix()).inverse_transpose()
+
+    def _mirror_matrix(self):
+        return Matrix4x4.scaling(
             -1 if self.mirror_x else 1,
             -1 if self.mirror_y else 1,
             -1 if self.mirror_z else 1,
         )
 
-        for v in letter.vertices:
-            v_mirrored = mirror_matrix * v
-            v_transformed = self.object_transform * v_mirrored
-            v_camera = self.apply_camera_transform(v_transformed)
-            transformed_vertices.append(v_camera)
-
-            normal_sum = Vector3D(0, 0, 0)
-            count = 0
-            for face in letter.faces:
-                if v in face.vertices:
-                    normal_sum = normal_sum + face.normal
-                    count += 1
-            vertex_normals.append(
-                normal_sum.normalized() if count > 0 else Vector3D(0, 0, 1)
+    def _frame_matrix(self):
+        # mirror -> object_transform -> camera, одна матрица 4x4 на кадр
+        return self._camera_matrix() * self.object_transform * self._mirror_matrix()
+
+    def _transform_frame(self):
+        frame_matrix = self._frame_matrix()
+        orientation = np.sign(np.linalg.det(frame_matrix.to_numpy()[:3, :3]))
+        frustum = self._view_frustum()
+        letters = self._visible_letters(frame_matrix, frustum)
+        culled = len(self.letters) - len(letters)
+        parts = [
+            (
+                frame_matrix.transform_points(letter.positions),
+                letter.face_indices,
+                letter.face_colors,
+                letter.face_normals,
+                letter.corner_normals,
+                letter.edges,
+                letter.face_edges,
+                letter.edge_faces,
+                letter.point_faces,
+                letter.edge_adjacent,
+                letter.edge_creases,
+                letter.edge_flips,
+                np.full(len(letter.face_indices), orientation),
+            )
+            for letter in letters
+        ]
+        meshes = [(letter, frame_matrix.to_numpy()[None]) for letter in letters]
+        for mesh, instances in group_instances(self.instances):
+            geometry = transform_instances(mesh, instances, frame_matrix, frustum)
+            culled += geometry.culled
+            # Группа, отсеченная целиком, не дает пустых частей кадра
+            if not len(geometry.matrices):
+                continue
+            meshes.append((mesh, geometry.matrices))
+            parts.append(
+                (
+                    geometry.camera_vertices,
+                    geometry.face_indices,
+                    geometry.face_colors,
+                    geometry.face_normals,
+                    geometry.corner_normals,
+                    geometry.edges,
+                    geometry.face_edges,
+                    geometry.edge_faces,
+                    geometry.point_faces,
+                    geometry.edge_adjacent,
+                    geometry.edge_creases,
+                    geometry.edge_flips,
+                    geometry.face_orientation,
+                )
             )
+        if not parts:
+            self.culled_count = culled
+            return None
+
+        # Все вершины кадра в одном массиве, индексы вершин, граней
+        # и ребер со сдвигом на предыдущие части
+        (
+            vertices,
+            indices,
+            colors,
+            normals,
+            corner_normals,
+            edges,
+            face_edges,
+            edge_faces,
+            point_faces,
+            edge_adjacent,
+            edge_creases,
+            edge_flips,
+            face_orientation,
+        ) = zip(*parts)
+        offsets = np.cumsum([0] + [len(part) for part in vertices])
+        face_offsets = np.cumsum([0] + [len(part) for part in indices])
+        edge_offsets = np.cumsum([0] + [len(part) for part in edges])
+        frame = FrameData(
+            np.concatenate([part + offset for part, offset in zip(indices, offsets)]),
+            np.concatenate(colors),
+            np.concatenate(normals),
+            np.concatenate(corner_normals),
+            np.concatenate(vertices),
+            np.concatenate([part + offset for part, offset in zip(edges, offsets)]),
+            np.concatenate(
+                [
+                    np.where(part >= 0, part + offset, -1)
+                    for part, offset in zip(face_edges, edge_offsets)
+                ]
+            ),
+            np.concatenate(
+                [part + offset for part, offset in zip(edge_faces, face_offsets)]
+            ),
+            np.concatenate(
+                [part + offset for part, offset in zip(point_faces, face_offsets)]
+            ),
+            np.concatenate(
+                [
+                    np.where(part >= 0, part + offset, -1)
+                    for part, offset in zip(edge_adjacent, face_offsets)
+                ]
+            ),
+            np.concatenate(edge_creases),
+            np.concatenate(edge_flips),
+            np.concatenate(face_orientation),
+            [
+                (mesh, matrices, offset)
+                for (mesh, matrices), offset in zip(meshes, face_offsets.tolist())
+            ],
+        )
+        frame.frustum = frustum
+        self.culled_count = culled
+        return frame
+
+    def _view_frustum(self):
+        # Видимая часть экрана после _project (с запасом CLIP_MARGIN):
+        # |x| <= kx * z, |y| <= ky * z, z >= NEAR_PLANE
+        sx, sy = self._projection_scale()
+        if sx <= 0 or sy <= 0:
+            return None
+        return Frustum.from_slopes(
+            (self.width() / 2 + CLIP_MARGIN) / (300 * sx),
+            (self.height() / 2 + CLIP_MARGIN) / (300 * sy),
+            NEAR_PLANE,
+        )
 
-        for face in letter.faces:
-            face_vertices = [
-                transformed_vertices[letter.vertices.index(v)] for v in face.vertices
-            ]
-            face_normals = [
-                vertex_normals[letter.vertices.index(v)] for v in face.vertices
-            ]
+    def _visible_letters(self, frame_matrix, frustum):
+        # Отсечение целых букв по сфере и AABB до работы с вершинами
+        letters = self.letters
+        if frustum is None or not letters:
+            return list(letters)
+        outside = frustum.cull(
+            np.broadcast_to(frame_matrix.to_numpy(), (len(letters), 4, 4)),
+            np.array([letter.bounding_center for letter in letters]),
+            np.array([letter.bounding_radius for letter in letters]),
+            np.array([letter.aabb_min for letter in letters]),
+            np.array([letter.aabb_max for letter in letters]),
+        )
+        return [letter for letter, out in zip(letters, outside.tolist()) if not out]
 
-            avg_depth = sum(v.z for v in face_vertices) / len(face_vertices)
-
-            screen_points = []
-            intensities = []
-            positions = []
-
-            for i, v in enumerate(face_vertices):
-                if v.z > 0:
-                    factor = 300 / v.z
-                    aspect_ratio = self.width() / self.height()
-                    px = (
-                        v.x
-                        * factor
-                        * self.base_scale
-                        * (1 / aspect_ratio if aspect_ratio > 1 else 1)
-                        + self.width() / 2
-                    )
-                    py = (
-                        v.y
-                        * factor
-                        * self.base_scale
-                        * (1 if aspect_ratio > 1 else aspect_ratio)
-                        + self.height() / 2
-                    )
-                    screen_points.append(QPointF(px, py))
-                    intensity = self.compute_phong_lighting(face_normals[i], v)
-                    intensities.append(intensity)
-                    positions.append(v)
-                else:
-                    screen_points.append(QPointF(-1000, -1000))
-                    intensities.append(0)
-                    positions.append(Vector3D(0, 0, 0))
+    def set_instances(self, instances):
+        self.instances = list(instances)
+        self.invalidate_frame()
+        self.update()
 
-            faces_with_depth.append(
-                (avg_depth, face, screen_points, intensities, positions, face_normals)
-            )
+    def add_instances(self, instances):
+        self.instances.extend(instances)
+        self.invalidate_frame()
+        self.update()
 
-        return faces_with_depth
+    def _corner_intensities(self, frame, faces):
+        # Освещение считается по углам граней faces: у острых ребер
+        # свои нормали
+        face_indices = frame.face_indices[faces]
+        corner_normals = frame.corner_normals[faces]
+        k = face_indices.shape[1]
+        corner_vertices = frame.camera_vertices[face_indices].reshape(-1, 3)
+        intensities = self.compute_phong_lighting(
+            corner_normals.reshape(-1, 3), corner_vertices
+        ).reshape(-1, k)
+        return intensities
+
+    def _geometry_key(self):
+        # Все, от чего зависят координаты и порядок граней, но не свет
+        return (
+            tuple(self._frame_matrix().values),
+            self.width(),
+            self.height(),
+            self.base_scale,
+            tuple((id(letter), letter.geometry_version) for letter in self.letters),
+            tuple(
+                (id(mesh), mesh.geometry_version)
+                for mesh, _ in group_instances(self.instances)
+            ),
+        )
 
-    def _draw_filled_face(
-        self, painter, face, screen_points, intensities, positions, face_normals
-    ):
+    def invalidate_frame(self):
+        self._frame_key = None
+
+    def _cached_frame(self):
+        key = self._geometry_key()
+        if key != self._frame_key:
+            with self.profiler.stage("transform"):
+                self._frame = self._transform_frame()
+            self._frame_key = key
+            self._sorted = None
+        frame = self._frame
+        self.profiler.count("culled", self.culled_count)
+        if frame is not None:
+            self.profiler.count("faces", len(frame.face_indices))
+            self.profiler.count("vertices", len(frame.camera_vertices))
+        return frame
+
+    def _prepare_frame(self):
+        profiler = self.profiler
+        frame = self._cached_frame()
+        if frame is None:
+            return []
+        if self._sorted is None:
+            with profiler.stage("depth sort"):
+                objects = self._depth_sorter.sort(self._object_depths(frame))
+            profiler.count("depth order", self._depth_sorter.method)
+            with profiler.stage("sort"):
+                self._sorted = self._bsp_faces(frame, objects)
+        order, faces = self._sorted
+
+        # Освещаются только грани, которые будут нарисованы
+        with profiler.stage("lighting"):
+            if self.shading_mode == ShadingMode.MONOTONE:
+                intensities = self._flat_intensities(frame.face_normals[order])
+                intensities = intensities[:, None]
+            else:
+                intensities = self._corner_intensities(frame, order)
+            return [
+                face + (face_intensities,)
+                for face, face_intensities in zip(faces, intensities.tolist())
+            ]
+
+    def _object_depths(self, frame):
+        # Глубина центра описанной сферы каждой буквы и каждого экземпляра,
+        # в порядке frame.objects
+        depths = [
+            matrices[:, 2, :3] @ mesh.bounding_center + matrices[:, 2, 3]
+            for mesh, matrices, _ in frame.objects
+        ]
+        return np.concatenate(depths) if depths else np.zeros(0)
+
+    def _bsp_faces(self, frame, objects):
+        # Порядок вывода без сортировки граней: BSP-дерево каждой сетки
+        # обходится от дальних кусков граней к ближним из положения камеры
+        # в координатах сетки, нелицевые куски при этом пропускаются.
+        # Сами объекты (буквы и экземпляры) идут в порядке objects - по
+        # глубине центра: объекты не проникают друг в друга
+        pieces, sources = [], []
+        entries, matrices, face_offsets = [], [], []
+        table_size = 0
+        for mesh, meshes_matrices, face_offset in frame.objects:
+            tree = mesh.bsp_tree()
+            rotation = meshes_matrices[:, :3, :3]
+            # Дерево - в координатах относительно bsp_origin сетки
+            meshes_matrices = meshes_matrices.copy()
+            translation = meshes_matrices[:, :3, 3]
+            translation += rotation @ mesh.bsp_origin()
+            # Камера (начало координат) в координатах дерева
+            eyes = np.linalg.solve(rotation, -translation[..., None])[..., 0]
+            entries.extend(order + table_size for order in tree.orders(eyes))
+            matrices.append(meshes_matrices)
+            face_offsets.append(
+                face_offset + np.arange(len(meshes_matrices)) * len(mesh.face_indices)
+            )
+            pieces.append((tree.polygons, tree.counts))
+            sources.append(tree.faces)
+            table_size += len(tree.faces)
+        if not entries:
+            return np.zeros(0, dtype=np.int64), []
+
+        size = max(polygons.shape[1] for polygons, _ in pieces)
+        polygons = np.concatenate(
+            [
+                np.concatenate(
+                    (part, np.repeat(part[:, :1], size - part.shape[1], axis=1)),
+                    axis=1,
+                )
+                for part, _ in pieces
+            ]
+        )
+        counts = np.concatenate([part for _, part in pieces])
+        sources = np.concatenate(sources)
+        matrices = np.concatenate(matrices)
+        face_offsets = np.concatenate(face_offsets)
+
+        ordered = [entries[i] for i in objects.tolist()]
+        lengths = np.array([len(order) for order in ordered], dtype=np.int64)
+        fragments = np.concatenate(ordered)
+        owners = np.repeat(objects, lengths)
+        camera = np.einsum(
+            "fkj,fij->fki", polygons[fragments], matrices[owners, :3, :3]
+        )
+        camera += matrices[owners, None, :3, 3]
+        self.profiler.count("fragments", len(fragments))
+
+        # Отсечение сохраняет порядок кусков
+        camera, counts, kept = clip_polygons(
+            camera, counts[fragments], self._clip_planes(frame)
+        )
+        faces = sources[fragments[kept]] + face_offsets[owners[kept]]
+        depths = camera[..., 2].sum(axis=1) / counts
+        screen = self._project(camera)[0].tolist()
+        face_colors = frame.face_colors[faces].tolist()
+        return faces, [
+            (depth, QColor(*color), [QPointF(x, y) for x, y in points[:count]])
+            for depth, color, points, count in zip(
+                depths.tolist(), face_colors, screen, counts.tolist()
+            )
+        ]
+
+    def _projection_scale(self):
+        aspect_ratio = self.width() / self.height()
+        sx = self.base_scale * (1 / aspect_ratio if aspect_ratio > 1 else 1)
+        sy = self.base_scale * (1 if aspect_ratio > 1 else aspect_ratio)
+        return sx, sy
+
+    def _project(self, camera_points):
+        # Перспективная проекция массива точек (..., 3), уже обрезанных
+        # по ближней плоскости: экранные координаты (..., 2) и 1/z
+        z = camera_points[..., 2]
+        factor = 300 / z
+        sx, sy = self._projection_scale()
+        screen = np.empty(camera_points.shape[:-1] + (2,))
+        screen[..., 0] = camera_points[..., 0] * factor * sx + self.width() / 2
+        screen[..., 1] = camera_points[..., 1] * factor * sy + self.height() / 2
+        return screen, 1 / z
+
+    def _draw_filled_face(self, painter, base_color, screen_points, intensities):
         if len(screen_points) < 3:
             return
 
-        if self.shading_mode == ShadingMode.MONOTONE:
-            world_normal = self.object_transform * face.normal
-            world_normal = world_normal.normalized()
-            intensity = max(0.3, world_normal.dot(self.light_dir))
-            color = QColor(
-                min(255, int(face.color.red() * intensity)),
-                min(255, int(face.color.green() * intensity)),
-                min(255, int(face.color.blue() * intensity)),
-            )
-            painter.setPen(QPen(Qt.black, 1))
-            painter.setBrush(QBrush(color))
-            painter.drawPolygon(QPolygonF(screen_points))
+        # Для монотонной закраски - одна освещенность на грань.
+        # QPainter не интерполирует цвет по многоугольнику, поэтому для Гуро
+        # и Фонга грань получает среднюю освещенность вершин; настоящие
+        # закраски - в режиме Z-буфера
+        intensity = sum(intensities) / len(intensities)
+        color = QColor(
+            min(255, int(base_color.red() * intensity)),
+            min(255, int(base_color.green() * intensity)),
+            min(255, int(base_color.blue() * intensity)),
+        )
+        painter.setPen(QPen(Qt.black, 1))
+        painter.setBrush(QBrush(color))
+        painter.drawPolygon(QPolygonF(screen_points))
 
     def draw_axes(self, painter):
         origin = self.project_point(Vector3D(0, 0, 0))
@@ -216,6 +817,38 @@ class SceneWidget(QWidget):
         painter.drawLine(origin, z_end)
         painter.drawText(z_end + QPoint(5, 5), "Z")
 
+    def draw_profiler_overlay(self, painter):
+        # Время этапов последнего кадра и среднее за последние кадры (одно
+        # значение скачет от кадра к кадру), FPS и размер сцены
+        frame = self.profiler.last_frame()
+        if frame is None:
+            return
+        averages = self.profiler.average_stages()
+        lines = [f"FPS: {self.profiler.fps():.1f}   кадр: {frame.total_ms:.2f} мс"]
+        lines += [
+            f"{name}: {ms:.2f} мс (ср. {averages.get(name, ms):.2f})"
+            for name, ms in frame.stages.items()
+        ]
+        lines += [f"{name}: {value}" for name, value in frame.counts.items()]
+
+        metrics = painter.fontMetrics()
+        line_height = metrics.height()
+        width = max(metrics.horizontalAdvance(line) for line in lines) + 12
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(QColor(0, 0, 0, 160))
+        painter.drawRect(5, 5, width, line_height * len(lines) + 8)
+        painter.setPen(QPen(Qt.white, 1))
+        for i, line in enumerate(lines):
+            painter.drawText(11, 9 + metrics.ascent() + i * line_height, line)
+
+    def frame_timings(self, n=None):
+        # Замеры последних n кадров: total_ms, stages {этап: мс}, counts
+        return self.profiler.frame_timings(n)
+
+    def set_show_profiler(self, show):
+        self.show_profiler = show
+        self.update()
+
     def draw_light_source(self, painter):
         light_pos = self.light_pos
         screen_pos = self.project_point(light_pos)
@@ -229,25 +862,13 @@ class SceneWidget(QWidget):
         v_camera = self.apply_camera_transform(v_transformed)
         if v_camera.z > 0:
             factor = 300 / v_camera.z
-            aspect_ratio = self.width() / self.height()
-            px = (
-                v_camera.x
-                * factor
-                * self.base_scale
-                * (1 / aspect_ratio if aspect_ratio > 1 else 1)
-                + self.width() / 2
-            )
-            py = (
-                v_camera.y
-                * factor
-                * self.base_scale
-                * (1 if aspect_ratio > 1 else aspect_ratio)
-                + self.height() / 2
-            )
+            sx, sy = self._projection_scale()
+            px = v_camera.x * factor * sx + self.width() / 2
+            py = v_camera.y * factor * sy + self.height() / 2
             return QPoint(int(px), int(py))
         return QPoint(-1000, -1000)
 
-    def apply_camera_transform(self, v):
+    def _camera_matrix(self):
         rot_x = Matrix4x4.rotation_x(self.camera_rot[0])
         rot_y = Matrix4x4.rotation_y(self.camera_rot[1])
         rot_z = Matrix4x4.rotation_z(self.camera_rot[2])
@@ -255,8 +876,10 @@ class SceneWidget(QWidget):
         translation = Matrix4x4.translation(
             -self.camera_pos.x, -self.camera_pos.y, -self.camera_pos.z
         )
-        camera_transform = rotation * translation
-        return camera_transform * v
+        return rotation * translation
+
+    def apply_camera_transform(self, v):
+        return self._camera_matrix() * v
 
     def auto_scale_view(self):
         if self.auto_scale:
@@ -300,12 +923,22 @@ class SceneWidget(QWidget):
 
     def mouseMoveEvent(self, event):
         if self.is_rotating and self.last_mouse_pos:
+            # Поворот применит планировщик на ближайшем кадре
             delta = -(event.position() - self.last_mouse_pos)
-            rot_x = Matrix4x4.rotation_x(-delta.y() * self.rotation_speed)
-            rot_y = Matrix4x4.rotation_y(delta.x() * self.rotation_speed)
-            self.object_transform = rot_y * rot_x * self.object_transform
+            self.scheduler.add_drag(delta.x(), delta.y())
             self.last_mouse_pos = event.position()
-            self.update()
+
+    def rotate_object(self, rotation):
+        if isinstance(rotation, Matrix4x4):
+            rotation = Quaternion.from_matrix(rotation)
+        # Нормировка на каждом шаге: сколько бы поворотов ни накопилось,
+        # поворот остается поворотом без масштаба и сдвига
+        self.object_rotation = (rotation * self.object_rotation).normalized()
+        self.object_translation = rotation.rotate(self.object_translation)
+        self.update()
+
+    def set_turntable(self, enabled):
+        self.scheduler.set_turntable(enabled)
 
     def wheelEvent(self, event):
         delta = event.angleDelta().y()
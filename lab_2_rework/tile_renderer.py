@@ -0,0 +1,173 @@
+import os
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context, shared_memory
+
+import numpy as np
+from PySide6.QtGui import QImage
+
+from rasterizer import Rasterizer, pack_rgb
+
+TILE_SIZE = 128
+
+
+class TileRenderer:
+    # Растеризация по экранным тайлам в пуле процессов.
+    # Буферы цвета и глубины лежат в общей памяти: каждый процесс
+    # пишет только в свои тайлы, поэтому сборка кадра не нужна
+    def __init__(self, width, height, tile_size=TILE_SIZE, workers=None):
+        self.tile_size = tile_size
+        self.workers = workers or os.cpu_count() or 1
+        self.width = 0
+        self.height = 0
+        self.color = None
+        self.depth = None
+        self._memory = None
+        # Блоки общей памяти, которые нужно освободить при закрытии
+        self._blocks = []
+        # spawn: дочерние процессы не наследуют состояние Qt
+        self._pool = ProcessPoolExecutor(self.workers, mp_context=get_context("spawn"))
+        self._finalizer = weakref.finalize(self, _release, self._pool, self._blocks)
+        self.resize(width, height)
+
+    def resize(self, width, height):
+        if (width, height) == (self.width, self.height):
+            return
+        self.color = None
+        self.depth = None
+        _free_blocks(self._blocks)
+        self.width = width
+        self.height = height
+        # Цвет (uint32) и глубина (float32) - в одном блоке
+        self._memory = shared_memory.SharedMemory(
+            create=True, size=max(1, 8 * width * height)
+        )
+        self._blocks.append(self._memory)
+        self.color, self.depth = _buffer_views(self._memory, width, height)
+
+    def render(self, batch, background, light_dir=None, camera_pos=None):
+        self.color.fill(pack_rgb(background))
+        self.depth.fill(0)
+
+        jobs = [
+            self._pool.submit(
+                _render_tile,
+                self._memory.name,
+                self.width,
+                self.height,
+                rect,
+                batch.subset(ids, offset=rect[:2]),
+                light_dir,
+                camera_pos,
+            )
+            for rect, ids in self._bin_triangles(batch)
+        ]
+        for job in jobs:
+            job.result()
+
+    def _bin_triangles(self, batch):
+        # Распределение треугольников по тайлам по ограничивающим
+        # прямоугольникам; порядок треугольников внутри тайла сохраняется
+        size = self.tile_size
+        columns = -(-self.width // size)
+        rows = -(-self.height // size)
+        x = batch.points[:, :, 0]
+        y = batch.points[:, :, 1]
+        x0 = np.floor(x.min(axis=1)) // size
+        x1 = np.ceil(x.max(axis=1)) // size
+        y0 = np.floor(y.min(axis=1)) // size
+        y1 = np.ceil(y.max(axis=1)) // size
+        visible = (
+            np.all(batch.inv_depth > 0, axis=1)
+            & (x1 >= 0)
+            & (x0 < columns)
+            & (y1 >= 0)
+            & (y0 < rows)
+        )
+        ids = np.flatnonzero(visible)
+        x0 = np.clip(x0[ids], 0, columns - 1).astype(np.int64)
+        x1 = np.clip(x1[ids], 0, columns - 1).astype(np.int64)
+        y0 = np.clip(y0[ids], 0, rows - 1).astype(np.int64)
+        y1 = np.clip(y1[ids], 0, rows - 1).astype(np.int64)
+
+        # Каждый треугольник повторяется для всех тайлов своего прямоугольника
+        spans = x1 - x0 + 1
+        counts = spans * (y1 - y0 + 1)
+        starts = np.cumsum(counts) - counts
+        local = np.arange(counts.sum()) - np.repeat(starts, counts)
+        spans = np.repeat(spans, counts)
+        tiles = (np.repeat(y0, counts) + local // spans) * columns + (
+            np.repeat(x0, counts) + local % spans
+        )
+        triangles = np.repeat(ids, counts)
+
+        order = np.argsort(tiles, kind="stable")
+        tiles = tiles[order]
+        triangles = triangles[order]
+        tile_ids, bounds = np.unique(tiles, return_index=True)
+        for tile, group in zip(tile_ids.tolist(), np.split(triangles, bounds[1:])):
+            left = tile % columns * size
+            top = tile // columns * size
+            right = min(left + size, self.width)
+            bottom = min(top + size, self.height)
+            yield (left, top, right, bottom), group
+
+    def to_qimage(self):
+        return QImage(
+            self.color.data,
+            self.width,
+            self.height,
+            4 * self.width,
+            QImage.Format_RGB32,
+        )
+
+    def close(self):
+        self.color = None
+        self.depth = None
+        self._memory = None
+        self._finalizer()
+
+
+def _buffer_views(memory, width, height):
+    pixels = width * height
+    color = np.ndarray((height, width), dtype=np.uint32, buffer=memory.buf)
+    depth = np.ndarray(
+        (height, width), dtype=np.float32, buffer=memory.buf, offset=4 * pixels
+    )
+    return color, depth
+
+
+def _free_blocks(blocks):
+    while blocks:
+        memory = blocks.pop()
+        memory.close()
+        memory.unlink()
+
+
+def _release(pool, blocks):
+    pool.shutdown(cancel_futures=True)
+    _free_blocks(blocks)
+
+
+# Блок общей памяти, к которому подключен рабочий процесс
+_attached = {}
+
+
+def _render_tile(name, width, height, rect, batch, light_dir, camera_pos):
+    if name not in _attached:
+        for memory in _attached.values():
+            memory.close()
+        _attached.clear()
+        _attached[name] = shared_memory.SharedMemory(name=name)
+    color, depth = _buffer_views(_attached[name], width, height)
+
+    left, top, right, bottom = rect
+    rasterizer = Rasterizer(
+        right - left,
+        bottom - top,
+        color=color[top:bottom, left:right],
+        depth=depth[top:bottom, left:right],
+    )
+    rasterizer.draw_batch(batch)
+    if batch.normals is not None:
+        rasterizer.shade_phong(light_dir, camera_pos)
@@ -0,0 +1,21 @@
+import os
+import sys
+
+import pytest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Как в benchmarks: имена модулей двух деревьев не пересекаются (кроме
+# main.py), поэтому оба подключаются сразу
+sys.path[:0] = [os.path.join(ROOT, "lab_2"), os.path.join(ROOT, "lab_2_rework")]
+
+from PySide6.QtWidgets import QApplication
+
+# Приложение живет до конца процесса: виджеты тестов не должны пережить его
+_app = QApplication.instance() or QApplication([])
+
+
+@pytest.fixture(scope="session")
+def qapp():
+    return _app
@@ -0,0 +1,128 @@
+import numpy as np
+import pytest
+
+import clipping
+import lab2_clipping
+
+CLIPPING = [lab2_clipping, clipping]
+IDS = ["lab_2", "lab_2_rework"]
+
+# Полупространства x >= 0 и z >= 1
+PLANES = np.array([[1.0, 0.0, 0.0, 0.0], [0.0, 0.0, 1.0, -1.0]])
+
+
+def _square(x, z):
+    # Квадрат 2 x 2 в плоскости z с центром в (x, 0); четвертый столбец -
+    # атрибут, равный x, чтобы проверить интерполяцию
+    corners = np.array([[-1.0, -1.0], [1.0, -1.0], [1.0, 1.0], [-1.0, 1.0]])
+    points = np.column_stack((corners[:, 0] + x, corners[:, 1], np.full(4, z)))
+    return np.column_stack((points, points[:, 0]))
+
+
+def _area(polygon, count):
+    x, y = polygon[:count, 0], polygon[:count, 1]
+    return abs(np.dot(x, np.roll(y, -1)) - np.dot(y, np.roll(x, -1))) / 2
+
+
+@pytest.mark.parametrize("module", CLIPPING, ids=IDS)
+def test_clip_polygons_inside_is_unchanged(module):
+    vertices = np.array([_square(5, 3)])
+
+    result, counts, kept = module.clip_polygons(vertices, [4], PLANES)
+
+    assert np.array_equal(result, vertices)
+    assert counts.tolist() == [4]
+    assert kept.tolist() == [0]
+
+
+@pytest.mark.parametrize("module", CLIPPING, ids=IDS)
+def test_clip_polygons_outside_is_dropped(module):
+    vertices = np.array([_square(-5, 3), _square(5, -3)])
+
+    result, counts, kept = module.clip_polygons(vertices, [4, 4], PLANES)
+
+    assert result.shape == (0, 4, 4)
+    assert len(counts) == len(kept) == 0
+
+
+@pytest.mark.parametrize("module", CLIPPING, ids=IDS)
+def test_clip_polygons_crossing(module):
+    vertices = np.array([_square(5, 3), _square(0, 3), _square(-5, 3)])
+
+    result, counts, kept = module.clip_polygons(vertices, [4, 4, 4], PLANES)
+
+    assert kept.tolist() == [0, 1]
+    assert counts.tolist() == [4, 4]
+    piece = result[1]
+    assert np.all(piece[:, 0] >= -1e-12)
+    assert _area(piece, 4) == pytest.approx(2.0)
+    # Атрибуты интерполируются вместе с координатами
+    assert np.allclose(piece[:, 3], piece[:, 0])
+
+
+@pytest.mark.parametrize("module", CLIPPING, ids=IDS)
+def test_clip_polygons_corner_cut_adds_vertex(module):
+    # Плоскость x + y >= 1.5 отрезает у квадрата угол: из четырех вершин
+    # получается три, а обратная плоскость оставляет пятиугольник
+    vertices = np.array([_square(0, 3)])
+    plane = np.array([[1.0, 1.0, 0.0, -1.5]])
+
+    corner, corner_counts, _ = module.clip_polygons(vertices, [4], plane)
+    rest, rest_counts, _ = module.clip_polygons(vertices, [4], -plane)
+
+    assert corner_counts.tolist() == [3]
+    assert rest_counts.tolist() == [5]
+    assert _area(corner[0], 3) + _area(rest[0], 5) == pytest.approx(4.0)
+    # Свободные слоты повторяют первую вершину
+    assert np.array_equal(corner[0, 3], corner[0, 0])
+
+
+@pytest.mark.parametrize("module", CLIPPING, ids=IDS)
+def test_clip_polygons_empty(module):
+    result, counts, kept = module.clip_polygons(
+        np.zeros((0, 4, 4)), np.zeros(0, dtype=np.int64), PLANES
+    )
+
+    assert result.shape == (0, 4, 4)
+    assert len(counts) == len(kept) == 0
+
+
+def test_fan_triangles_empty():
+    triangles, polygon = clipping.fan_triangles(
+        np.zeros((0, 4, 3)), np.zeros(0, dtype=np.int64)
+    )
+
+    assert triangles.shape == (0, 3, 3)
+    assert len(polygon) == 0
+
+
+@pytest.mark.parametrize("module", CLIPPING, ids=IDS)
+def test_clip_segments(module):
+    starts = np.array(
+        [[1.0, 0.0, 2.0], [-1.0, 0.0, 2.0], [-1.0, 0.0, 2.0], [1.0, 0.0, 0.0]]
+    )
+    ends = np.array(
+        [[2.0, 1.0, 3.0], [-2.0, 1.0, 3.0], [1.0, 0.0, 2.0], [1.0, 0.0, 3.0]]
+    )
+
+    new_starts, new_ends, kept = module.clip_segments(starts, ends, PLANES)
+
+    # Внутри - без изменений, снаружи - отброшен, пересекающие обрезаны
+    # по границе
+    assert kept.tolist() == [0, 2, 3]
+    assert np.array_equal(new_starts[0], starts[0])
+    assert np.array_equal(new_ends[0], ends[0])
+    assert np.allclose(new_starts[1], [0.0, 0.0, 2.0])
+    assert np.array_equal(new_ends[1], ends[2])
+    assert np.allclose(new_starts[2], [1.0, 0.0, 1.0])
+    assert np.array_equal(new_ends[2], ends[3])
+
+
+@pytest.mark.parametrize("module", CLIPPING, ids=IDS)
+def test_clip_segments_empty(module):
+    empty = np.zeros((0, 3))
+
+    new_starts, new_ends, kept = module.clip_segments(empty, empty, PLANES)
+
+    assert new_starts.shape == new_ends.shape == (0, 3)
+    assert len(kept) == 0
@@ -0,0 +1,122 @@
+import numpy as np
+import pytest
+
+import lab2_math
+import math_utils
+
+# Оба дерева дают одинаковый интерфейс матриц и кватернионов
+MATH = [lab2_math, math_utils]
+IDS = ["lab_2", "lab_2_rework"]
+
+
+def _affine(m):
+    # Перенос, поворот вокруг всех осей, неравномерный масштаб с отражением
+    return (
+        m.Matrix4x4.translation(12.0, -3.5, 40.0)
+        * m.Matrix4x4.rotation_z(25)
+        * m.Matrix4x4.rotation_y(-70)
+        * m.Matrix4x4.rotation_x(130)
+        * m.Matrix4x4.scaling(-2.0, 0.5, 3.0)
+    )
+
+
+@pytest.mark.parametrize("m", MATH, ids=IDS)
+def test_inverse_round_trip_affine(m):
+    matrix = _affine(m)
+
+    inverse = matrix.inverse()
+
+    assert np.allclose((matrix * inverse).to_numpy(), np.eye(4))
+    assert np.allclose((inverse * matrix).to_numpy(), np.eye(4))
+    assert np.allclose(inverse.to_numpy(), np.linalg.inv(matrix.to_numpy()))
+
+
+@pytest.mark.parametrize("m", MATH, ids=IDS)
+def test_inverse_round_trip_projective(m):
+    matrix = m.Matrix4x4.perspective(60, 4 / 3, 1, 1000) * _affine(m)
+
+    inverse = matrix.inverse()
+
+    assert np.allclose((matrix * inverse).to_numpy(), np.eye(4))
+    assert np.allclose(inverse.to_numpy(), np.linalg.inv(matrix.to_numpy()))
+
+
+@pytest.mark.parametrize("m", MATH, ids=IDS)
+def test_inverse_transpose_keeps_normals_perpendicular(m):
+    matrix = _affine(m)
+    points = np.array([[0.0, 0.0, 0.0], [1.0, 0.0, 0.0], [0.0, 1.0, 0.0]])
+    normal = np.array([0.0, 0.0, 1.0])
+
+    moved = matrix.transform_points(points)
+    moved_normal = matrix.inverse_transpose().to_numpy()[:3, :3] @ normal
+
+    assert np.allclose((moved[1:] - moved[0]) @ moved_normal, 0)
+
+
+def _quaternion(m):
+    return (
+        m.Quaternion.rotation_z(25)
+        * m.Quaternion.rotation_y(-70)
+        * m.Quaternion.rotation_x(130)
+    )
+
+
+def _same_rotation(a, b):
+    # q и -q задают один поворот
+    a, b = np.array(a.components()), np.array(b.components())
+    return np.allclose(a, b) or np.allclose(a, -b)
+
+
+@pytest.mark.parametrize("m", MATH, ids=IDS)
+@pytest.mark.parametrize("axis", ["x", "y", "z"])
+@pytest.mark.parametrize("angle", [0, 35, -120, 180, 270])
+def test_quaternion_matches_matrix_rotation(m, axis, angle):
+    quaternion = getattr(m.Quaternion, f"rotation_{axis}")(angle)
+    matrix = getattr(m.Matrix4x4, f"rotation_{axis}")(angle)
+
+    assert np.allclose(quaternion.to_matrix().to_numpy(), matrix.to_numpy())
+
+
+@pytest.mark.parametrize("m", MATH, ids=IDS)
+def test_quaternion_composition_and_rotate(m):
+    quaternion = _quaternion(m)
+    matrix = (
+        m.Matrix4x4.rotation_z(25)
+        * m.Matrix4x4.rotation_y(-70)
+        * m.Matrix4x4.rotation_x(130)
+    )
+    vector = m.Vector3D(3.0, -1.0, 2.0)
+
+    rotated = quaternion.rotate(vector)
+
+    assert np.allclose(quaternion.to_matrix().to_numpy(), matrix.to_numpy())
+    assert np.allclose(
+        [rotated.x, rotated.y, rotated.z],
+        matrix.transform_points(np.array([[3.0, -1.0, 2.0]]))[0],
+    )
+    assert _same_rotation(m.Quaternion.from_matrix(matrix), quaternion)
+
+
+@pytest.mark.parametrize("m", MATH, ids=IDS)
+def test_decompose_recovers_trs(m):
+    translation = m.Vector3D(12.0, -3.5, 40.0)
+    rotation = _quaternion(m)
+    scale = (-2.0, 0.5, 3.0)
+
+    t, q, s = m.Matrix4x4.from_trs(translation, rotation, scale).decompose()
+
+    assert np.allclose([t.x, t.y, t.z], [12.0, -3.5, 40.0])
+    assert _same_rotation(q, rotation)
+    assert np.allclose(s, scale)
+
+
+@pytest.mark.parametrize("m", MATH, ids=IDS)
+def test_decompose_moves_mirror_to_x(m):
+    matrix = m.Matrix4x4.from_trs(
+        m.Vector3D(1.0, 2.0, 3.0), _quaternion(m), (2.0, -0.5, 3.0)
+    )
+
+    t, q, s = matrix.decompose()
+
+    assert s[0] < 0 < s[1] and s[2] > 0
+    assert np.allclose(m.Matrix4x4.from_trs(t, q, s).to_numpy(), matrix.to_numpy())
@@ -0,0 +1,29 @@
+import pytest
+
+from enums import DisplayMode
+from instancing import MeshLibrary, signage_wall
+from scene_widget import SceneWidget
+
+
+def _turned_away_scene(letters):
+    scene = SceneWidget()
+    scene.resize(400, 300)
+    scene.set_instances(signage_wall(MeshLibrary(), "DB", 2, 3))
+    if not letters:
+        scene.letters = []
+    # Камера смотрит от сцены: все буквы и экземпляры вне пирамиды видимости
+    scene.camera_rot = [0, 180, 0]
+    return scene
+
+
+@pytest.mark.parametrize("letters", [True, False], ids=["letters", "no-letters"])
+@pytest.mark.parametrize("mode", list(DisplayMode), ids=lambda mode: mode.name)
+def test_everything_culled_renders_empty_frame(qapp, mode, letters):
+    scene = _turned_away_scene(letters)
+    scene.display_mode = mode
+
+    image = scene.grab()
+
+    assert not image.isNull()
+    assert scene._transform_frame() is None
+    assert scene.culled_count == len(scene.letters) + len(scene.instances)